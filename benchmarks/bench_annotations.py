@@ -0,0 +1,54 @@
+from __future__ import annotations
+from inspect import Parameter, Signature
+from pathlib import Path
+from timeit import repeat
+from typing import Literal, Optional
+
+from cleek._parsers import record_signature_arguments
+
+_PK = Parameter.POSITIONAL_OR_KEYWORD
+
+_PARAMETERS = (
+    ('flag', bool, False),
+    ('maybe', bool | None, None),
+    ('count', int, Parameter.empty),
+    ('limit', int | None, None),
+    ('ratio', float, 1.0),
+    ('scale', Optional[float], None),
+    ('name', str, Parameter.empty),
+    ('label', str | None, 'x'),
+    ('path', Path, Parameter.empty),
+    ('output', Path | None, None),
+    ('op', Literal['add', 'sub'], 'add'),
+    ('level', Literal[1, 2, 3], 1),
+)
+
+
+def _signatures(n: int) -> list[Signature]:
+    signatures: list[Signature] = []
+    for i in range(n):
+        rotated = _PARAMETERS[i % 12 :] + _PARAMETERS[: i % 12]
+        parameters = [
+            Parameter(f'{name}_{j}', _PK, annotation=annotation, default=default)
+            for j, (name, annotation, default) in enumerate(rotated[:6])
+        ]
+        parameters.sort(key=lambda param: param.default is not param.empty)
+        signatures.append(Signature(parameters))
+    return signatures
+
+
+def main() -> None:
+    print(f'{"signatures":>10} {"total (ms)":>11} {"per signature (us)":>19}')
+    for n in (100, 1000, 10000):
+        signatures = _signatures(n)
+
+        def build() -> None:
+            for sig in signatures:
+                record_signature_arguments(sig)
+
+        best = min(repeat(build, number=1, repeat=5))
+        print(f'{n:>10} {best * 1e3:>11.3f} {best / n * 1e6:>19.3f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+from __future__ import annotations
+import os
+from pathlib import Path
+import subprocess
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+_TASK = '''
+
+@task
+def task_{i}(x: int, y: int, op: Literal['add', 'sub'] = 'add') -> None: ...
+'''
+
+
+def _complete(env: dict[str, str], line: str) -> float:
+    start = perf_counter()
+    subprocess.run(
+        ('clk',),
+        env={
+            **env,
+            '_ARGCOMPLETE': '1',
+            '_ARGCOMPLETE_STDOUT_FILENAME': os.devnull,
+            'COMP_LINE': line,
+            'COMP_POINT': str(len(line)),
+        },
+        check=True,
+    )
+    return perf_counter() - start
+
+
+def main() -> None:
+    print(f'{"tasks":>6} {"line":>14} {"cached (ms)":>12} {"uncached (ms)":>14}')
+    with TemporaryDirectory() as tmp:
+        path = Path(tmp) / 'cleeks.py'
+        env = {
+            **os.environ,
+            'CLEEKS_PATH': str(path),
+            'XDG_CACHE_HOME': str(Path(tmp) / 'cache'),
+        }
+        for n in (10, 100, 1000):
+            path.write_text(
+                'from typing import Literal\nfrom cleek import task\n'
+                + ''.join(_TASK.format(i=i) for i in range(n))
+            )
+            subprocess.run(('clk',), env=env, stdout=subprocess.DEVNULL)
+            for line in ('clk task-1', 'clk task-1 -'):
+                cached = min(_complete(env, line) for _ in range(5))
+                uncached = min(
+                    _complete({**env, 'CLEEK_NO_CACHE': '1'}, line)
+                    for _ in range(5)
+                )
+                print(
+                    f'{n:>6} {line!r:>14} {cached * 1e3:>12.1f}'
+                    f' {uncached * 1e3:>14.1f}'
+                )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+from __future__ import annotations
+from timeit import repeat
+from typing import Literal
+
+from cleek._parsers import (
+    make_dispatch_parser,
+    make_parser,
+    make_single_parser,
+    parse_dispatch_args,
+)
+from cleek._tasks import Context
+
+
+def _make_context(n: int) -> Context:
+    ctx = Context()
+    for i in range(n):
+
+        def impl(
+            x: int,
+            y: int,
+            op: Literal['add', 'sub'] = 'add',
+            verbose: bool = False,
+        ) -> None:
+            pass
+
+        ctx.task(f'task-{i}')(impl)
+    return ctx
+
+
+def _eager(ctx: Context, argv: list[str]) -> None:
+    make_parser(ctx).parse_args(argv)
+
+
+def _lazy(ctx: Context, argv: list[str]) -> None:
+    ns, args = parse_dispatch_args(make_dispatch_parser(), argv)
+    make_single_parser(ctx.tasks[ns.task]).parse_args(args)
+
+
+def main() -> None:
+    argv = ['task-0', '1', '2', '-o', 'sub']
+    print(f'{"tasks":>6} {"eager (ms)":>12} {"lazy (ms)":>12}')
+    for n in (1, 10, 100, 1000):
+        ctx = _make_context(n)
+        number = max(1, 1000 // n)
+        eager = min(repeat(lambda: _eager(ctx, argv), number=number, repeat=5))
+        lazy = min(repeat(lambda: _lazy(ctx, argv), number=number, repeat=5))
+        print(f'{n:>6} {eager / number * 1e3:>12.3f} {lazy / number * 1e3:>12.3f}')
+
+
+if __name__ == '__main__':
+    main()
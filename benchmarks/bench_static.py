@@ -0,0 +1,45 @@
+from __future__ import annotations
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from timeit import repeat
+
+from cleek._static import discover_static
+
+_HEADER = '''\
+from pathlib import Path
+from typing import Literal
+from cleek import customize, task
+
+grouped = customize('group', style='red')
+'''
+
+_TASK = '''
+
+@task
+def task_{i}(x: int, y: int, op: Literal['add', 'sub'] = 'add') -> None: ...
+
+
+@grouped
+def grouped_{i}(*paths: Path) -> None: ...
+'''
+
+
+def main() -> None:
+    print(f'{"tasks":>6} {"static (ms)":>12}')
+    with TemporaryDirectory() as tmp:
+        path = Path(tmp) / 'cleeks.py'
+        for n in (10, 100, 1000):
+            path.write_text(_HEADER + ''.join(_TASK.format(i=i) for i in range(n)))
+            assert discover_static(path, is_package=False) is not None
+            best = min(
+                repeat(
+                    lambda: discover_static(path, is_package=False),
+                    number=1,
+                    repeat=5,
+                )
+            )
+            print(f'{n * 2:>6} {best * 1e3:>12.3f}')
+
+
+if __name__ == '__main__':
+    main()
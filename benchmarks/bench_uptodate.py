@@ -0,0 +1,56 @@
+from __future__ import annotations
+import os
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from timeit import repeat
+
+from cleek._tasks import Context
+from cleek._uptodate import UpToDate
+
+
+def main() -> None:
+    print(
+        f'{"files":>6} {"stat (ms)":>10} {"hash, cold (ms)":>16}'
+        f' {"hash, warm (ms)":>16}'
+    )
+    with TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        os.environ['XDG_CACHE_HOME'] = str(root / 'cache')
+        ctx = Context()
+
+        @ctx.task(inputs=['src/**/*.py'])
+        def stat() -> None: ...
+
+        @ctx.task(inputs=['src/**/*.py'], hash_inputs=True)
+        def content() -> None: ...
+
+        created = 0
+        for n in (1000, 10000, 30000):
+            for i in range(created, n):
+                path = root / 'src' / f'{i // 1000}' / f'{i}.py'
+                path.parent.mkdir(parents=True, exist_ok=True)
+                path.write_text(f'x = {i}\n' * 20)
+            created = n
+
+            up_to_date = UpToDate(root / 'cleeks.py', root)
+            results = []
+            for task in (ctx.tasks['stat'], ctx.tasks['content']):
+
+                def check() -> None:
+                    up_to_date.check(task, [])
+
+                cold = min(repeat(check, number=1, repeat=1))
+                entry = up_to_date.check(task, [])
+                assert entry is not None
+                up_to_date.record(task, entry)
+                warm = min(repeat(check, number=1, repeat=3))
+                results.append((cold, warm))
+            (_, stat_warm), (hash_cold, hash_warm) = results
+            print(
+                f'{n:>6} {stat_warm * 1e3:>10.1f} {hash_cold * 1e3:>16.1f}'
+                f' {hash_warm * 1e3:>16.1f}'
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,12 @@
 from __future__ import annotations as _annotations
+from cleek._parsers import register_converter
+from cleek._spans import span
 from cleek._tasks import Context as _Context
 
+__version__ = '0.7.1'
+
 _ctx = _Context()
+bench = _ctx.bench
 config = _ctx.config
 customize = _ctx.customize
 task = _ctx.task
@@ -1,22 +1,36 @@
 # PYTHON_ARGCOMPLETE_OK
 from __future__ import annotations as _annotations
+from contextlib import contextmanager as _contextmanager
 import sys as _sys
 from typing import TYPE_CHECKING as _TYPE_CHECKING
 
 if _TYPE_CHECKING:
+    from argparse import Namespace as _Namespace
+    from collections.abc import (
+        Iterable as _Iterable,
+        Iterator as _Iterator,
+        Mapping as _Mapping,
+    )
     from pathlib import Path as _Path
-    from typing import Final as _Final
+    from typing import Final as _Final, NoReturn as _NoReturn, TypeVar
     from types import ModuleType as _ModuleType, TracebackType as _TracebackType
 
+    from argparse import ArgumentParser as _ArgumentParser
+
+    from cleek._manifest import (
+        Manifest as _Manifest,
+        ManifestTask as _ManifestTask,
+    )
+    from cleek._graph import Outcome as _Outcome
     from cleek._tasks import Task as _Task
 
+    _T = TypeVar('_T')
 
-def _try_import(path: '_Path', *, is_package: bool) -> '_ModuleType | None':
+
+def _import_cleeks(path: '_Path', *, is_package: bool) -> '_ModuleType':
     import importlib.util
     import sys
 
-    if not path.exists():
-        return
     module_name = 'cleeks'
     spec = importlib.util.spec_from_file_location(
         module_name,
@@ -24,68 +38,153 @@ def _try_import(path: '_Path', *, is_package: bool) -> '_ModuleType | None':
         submodule_search_locations=[str(path.parent)] if is_package else None,
     )
     if spec is None or spec.loader is None:
-        return
+        raise FileNotFoundError('Cannot find cleeks')
     module = importlib.util.module_from_spec(spec)
     sys.modules[module_name] = module
     spec.loader.exec_module(module)
     return module
 
 
-def _load_tasks() -> None:
-    import os
+def _project_path(path: '_Path', *, is_package: bool) -> '_Path':
+    return path.parent.parent if is_package else path.parent
+
+
+def _collect_sources(project_path: '_Path', before: 'set[str]') -> 'list[str]':
     from pathlib import Path
     import sys
 
-    root_path = os.environ.get('CLEEKS_PATH')
-    if root_path is None:
-        parent_path = Path().resolve(strict=True)
-        root_path = Path('/')
-        while True:
-            cleeks = _try_import(
-                parent_path / 'cleeks.py',
-                is_package=False,
-            ) or _try_import(
-                parent_path / 'cleeks/__init__.py',
-                is_package=True,
-            )
-            if cleeks is not None:
-                break
-            parent_path = parent_path.parent
-            if parent_path == root_path:
-                raise FileNotFoundError('Cannot find cleeks')
-    else:
-        root_path = Path(root_path).resolve(strict=True)
-        cleeks = _try_import(
-            root_path,
-            is_package=False,
-        ) or _try_import(
-            root_path / '__init__.py',
-            is_package=True,
-        )
-        if cleeks is None:
-            raise FileNotFoundError('Cannot find cleeks')
-        parent_path = root_path.parent
+    sources: list[str] = []
+    for name, module in list(sys.modules.items()):
+        if name in before:
+            continue
+        file = getattr(module, '__file__', None)
+        if file is None:
+            continue
+        path = Path(file).resolve()
+        if not path.is_relative_to(project_path):
+            continue
+        if {'site-packages', 'dist-packages'}.intersection(path.parts):
+            continue
+        sources.append(str(path))
+    return sources
+
+
+def _load_tasks(path: '_Path', *, is_package: bool) -> 'list[str]':
+    import sys
+
+    before = set(sys.modules)
+    _import_cleeks(path, is_package=is_package)
+    project_path = _project_path(path, is_package=is_package)
     from cleek import _ctx
 
     if _ctx.prepend_to_path:
-        sys.path.insert(0, str(parent_path))
+        sys.path.insert(0, str(project_path))
+    return _collect_sources(project_path, before)
+
+
+class _Resident:
+    def __init__(
+        self,
+        path: '_Path',
+        sources: 'list[str]',
+        manifest: '_Manifest',
+        parsers: 'dict[str, _ArgumentParser]',
+    ) -> None:
+        self.path: '_Final' = path
+        self.sources: '_Final' = sources
+        self.manifest: '_Final' = manifest
+        self.parsers: '_Final' = parsers
 
 
-def print_tasks(tasks: 'dict[str, _Task]') -> None:
+_resident: _Resident | None = None
+
+
+def _serve(path: '_Path', *, is_package: bool) -> '_NoReturn':
+    global _resident
+
+    from cleek import _ctx as ctx
+    from cleek._daemon import serve
+    from cleek._manifest import manifest_from_context
+    from cleek._parsers import make_single_parser
+
+    sources = _load_tasks(path, is_package=is_package)
+    manifest = manifest_from_context(ctx, sources)
+    _save_manifest(path, manifest)
+    parsers = {
+        name: make_single_parser(task)
+        for name, task in ctx.tasks.items()
+        if manifest.tasks[name].arguments is not None
+    }
+    _resident = _Resident(path, sources, manifest, parsers)
+    serve(path, manifest, main)
+
+
+def _evict_artifacts(
+    path: '_Path',
+    max_size: int,
+    *,
+    is_package: bool,
+) -> '_NoReturn':
+    import os
+    from cleek import _ctx as ctx
+    from cleek._artifacts import artifact_backend
+
+    if not os.environ.get('CLEEK_ARTIFACT_DIR'):
+        _load_tasks(path, is_package=is_package)
+    removed, freed = artifact_backend(ctx).evict(max_size)
+    print(f'Removed {removed} files, freeing {freed} bytes')
+    raise SystemExit()
+
+
+def _bench(
+    path: '_Path',
+    ns: '_Namespace',
+    *,
+    is_package: bool,
+) -> '_NoReturn':
+    from cleek import _ctx as ctx
+    from cleek._bench import run_benches
+    from cleek._spans import span
+
+    with span('exec cleeks'):
+        _load_tasks(path, is_package=is_package)
+    raise SystemExit(
+        run_benches(
+            ctx.benches,
+            ns.bench,
+            output=ns.bench_output,
+            baseline=ns.bench_baseline,
+            threshold=ns.bench_threshold,
+        )
+    )
+
+
+def _report(outcomes: '_Iterable[_Outcome]') -> '_NoReturn':
+    failed = False
+    for outcome in outcomes:
+        if outcome.error is not None:
+            name = outcome.task.full_name
+            print(f'{name}: {outcome.error}', file=_sys.stderr)
+            failed = True
+        elif outcome.result is not None:
+            print(outcome.result)
+    raise SystemExit(1 if failed else 0)
+
+
+def print_tasks(tasks: '_Iterable[_ManifestTask]') -> None:
     from rich.console import Console
     from rich.table import Table
-    from cleek._parsers import make_single_parser
 
     console = Console()
     table = Table()
     table.add_column('Task')
     table.add_column('Usage')
-    for name, task in tasks.items():
+    for task in tasks:
         name = task.full_name
         if task.style is not None:
             style = task.style
             name = f'[{style}]{name}[/{style}]'
-        parser = make_single_parser(task)
+        parser = task.make_parser()
         if _sys.version_info >= (3, 14):
             parser.color = False
         usage = ' '.join(parser.format_usage().strip().split()[1:])
@@ -93,6 +192,85 @@ def print_tasks(tasks: 'dict[str, _Task]') -> None:
     console.print(table)
 
 
+def _get_task(tasks: '_Mapping[str, _T]', name: str) -> '_T':
+    try:
+        return tasks[name]
+    except KeyError as error:
+        print(f'No task named {name!r}', file=_sys.stderr)
+        raise SystemExit(1) from error
+
+
+def _completing_task() -> str | None:
+    import os
+
+    line = os.environ.get('COMP_LINE', '')
+    point = int(os.environ.get('COMP_POINT', len(line)))
+    words = line[:point].split()
+    if len(words) > 2 or (len(words) == 2 and line[:point].endswith(' ')):
+        return words[1]
+    return None
+
+
+def _complete(path: '_Path') -> None:
+    from cleek._manifest import load_manifest
+
+    manifest = load_manifest(path)
+    if manifest is not None and manifest.complete:
+        manifest.make_parser(_completing_task())
+
+
+def _emit_completion(
+    manifest: '_Manifest',
+    path: '_Path',
+    ns: '_Namespace',
+) -> None:
+    from cleek._completion import (
+        emit_completion,
+        register_completion,
+        write_completion,
+    )
+
+    if ns.completion_file is None:
+        print(emit_completion(manifest, ns.emit_completion, path), end='')
+    else:
+        write_completion(manifest, ns.emit_completion, path, ns.completion_file)
+        register_completion(path, ns.emit_completion, ns.completion_file)
+
+
+def _describe(
+    manifest: '_Manifest',
+    path: '_Path',
+    ns: '_Namespace',
+    args: 'list[str]',
+) -> '_NoReturn':
+    import os
+    from cleek._spans import span
+
+    if '_ARGCOMPLETE' in os.environ:
+        manifest.make_parser(_completing_task())
+        raise SystemExit(1)
+
+    if ns.emit_completion is not None:
+        _emit_completion(manifest, path, ns)
+        raise SystemExit()
+
+    if ns.task is None:
+        with span('list tasks'):
+            print_tasks(manifest.tasks.values())
+        raise SystemExit()
+
+    _get_task(manifest.tasks, ns.task).make_parser().parse_args(args)
+    raise SystemExit()
+
+
+def _save_manifest(path: '_Path', manifest: '_Manifest') -> None:
+    from cleek._completion import regenerate_completions
+    from cleek._manifest import save_manifest
+
+    save_manifest(path, manifest)
+    regenerate_completions(path, manifest)
+
+
 _prev_excepthook: '_Final' = _sys.excepthook
 
 
@@ -123,37 +301,275 @@ def _excepthook(
 
 def main() -> None:
     import sys
+    from cleek._parsers import make_dispatch_parser, parse_dispatch_args
+
+    ns, args = parse_dispatch_args(make_dispatch_parser(), sys.argv[1:])
+    if ns.mem_compare is not None:
+        from cleek._memory import compare_snapshots
+
+        compare_snapshots(*ns.mem_compare)
+        return
+    if (
+        not ns.time
+        and ns.trace is None
+        and ns.profile is None
+        and not ns.mem
+        and not ns.async_stats
+        and ns.async_stats_output is None
+    ):
+        _main(ns, args)
+        return
+
+    from contextlib import ExitStack
+
+    with ExitStack() as stack:
+        if ns.time or ns.trace is not None:
+            stack.enter_context(_recording(ns))
+        if ns.profile is not None:
+            from cleek._profile import make_profiler, profiling_session
+
+            stack.enter_context(
+                profiling_session(make_profiler(ns.profile, ns.profile_output))
+            )
+        if ns.mem:
+            from cleek._memory import Memory
+            from cleek._profile import profiling_session
+
+            memory = Memory(
+                interval=ns.mem_interval,
+                snapshot_path=ns.mem_snapshot,
+            )
+            stack.enter_context(profiling_session(memory))
+        if ns.async_stats or ns.async_stats_output is not None:
+            from cleek._asyncstats import async_stats
+
+            stack.enter_context(async_stats(ns.async_stats_output))
+        _main(ns, args)
+
+
+@_contextmanager
+def _recording(ns: '_Namespace') -> '_Iterator[None]':
+    from cleek._spans import (
+        print_times,
+        span,
+        start_recording,
+        stop_recording,
+        write_trace,
+    )
+
+    start_recording()
+    try:
+        with span('total'):
+            yield
+    finally:
+        recorder = stop_recording()
+        if recorder is not None:
+            if ns.time:
+                print_times(recorder.spans)
+            if ns.trace is not None:
+                write_trace(recorder, ns.trace)
+
+
+def _main(ns: '_Namespace', args: 'list[str]') -> None:
+    import os
+    import sys
+    from cleek._spans import span
+    from cleek._startup import is_profiled_child
+
+    if is_profiled_child():
+        from cleek._startup import record_phases
+
+        record_phases()
+    elif ns.profile_startup or ns.profile_startup_json is not None:
+        from cleek._startup import profile_startup
+
+        raise SystemExit(
+            profile_startup(sys.argv[1:], json_path=ns.profile_startup_json)
+        )
+
+    from cleek._discovery import find_cleeks
 
     try:
-        _load_tasks()
+        with span('discovery'):
+            path, is_package = find_cleeks()
     except FileNotFoundError as error:
         if len(sys.argv) != 2 or sys.argv[1] != '--completion':
             print(error, file=sys.stderr)
         raise SystemExit(1)
 
-    from cleek import _ctx as ctx
-    from cleek._parsers import make_parser
+    if '_ARGCOMPLETE' in os.environ:
+        _complete(path)
+
+    if ns.daemon:
+        _serve(path, is_package=is_package)
+
+    from cleek._daemon import client_enabled, run_client, stop_daemon
+
+    if ns.daemon_stop:
+        raise SystemExit(0 if stop_daemon(path) else 1)
+
+    if ns.evict_artifacts is not None:
+        _evict_artifacts(path, ns.evict_artifacts, is_package=is_package)
+
+    if ns.bench is not None:
+        _bench(path, ns, is_package=is_package)
 
-    parser = make_parser(ctx)
-    ns = parser.parse_args()
+    if _resident is None and not is_profiled_child() and client_enabled():
+        code = run_client(path, sys.argv[1:])
+        if code is not None:
+            from cleek._spans import stop_recording
+
+            stop_recording()
+            raise SystemExit(code)
+
+    describing = (
+        '_ARGCOMPLETE' in os.environ
+        or ns.emit_completion is not None
+        or ns.task is None
+        or args in (['-h'], ['--help'])
+    )
 
     sys.excepthook = _excepthook
 
-    if ns.task is None:
-        print_tasks(ctx.tasks)
-        raise SystemExit()
+    from cleek._manifest import load_manifest, manifest_from_context
 
-    try:
-        task = ctx.tasks[ns.task]
-    except KeyError as error:
-        print(f'No task named {ns.task!r}', file=sys.stderr)
-        raise SystemExit(1) from error
+    with span('load manifest'):
+        if _resident is not None:
+            manifest = _resident.manifest
+        else:
+            manifest = load_manifest(path)
+    if describing and manifest is None:
+        from cleek._static import discover_static, static_enabled
+
+        if static_enabled():
+            with span('static discovery'):
+                manifest = discover_static(path, is_package=is_package)
+            if manifest is not None:
+                _save_manifest(path, manifest)
+
+    if describing and manifest is not None and manifest.complete:
+        _describe(manifest, path, ns, args)
+
+    if _resident is not None:
+        sources = _resident.sources
+    else:
+        with span('exec cleeks'):
+            sources = _load_tasks(path, is_package=is_package)
+    from cleek import _ctx as ctx
+
+    from cleek._cache import cache_enabled
+
+    if describing or (manifest is None and cache_enabled()):
+        with span('build parsers'):
+            manifest = manifest_from_context(ctx, sources)
+        _save_manifest(path, manifest)
+
+    if describing:
+        _describe(manifest, path, ns, args)
+
+    from cleek._artifacts import ArtifactCache, artifact_backend
+    from cleek._graph import (
+        UnknownDependency,
+        run_segments,
+        run_together,
+        shared_backend,
+    )
+    from cleek._parsers import make_single_parser, split_segments
+    from cleek._uptodate import UpToDate
+
+    def parser_for(name: str) -> _ArgumentParser:
+        if _resident is not None and name in _resident.parsers:
+            return _resident.parsers[name]
+        return make_single_parser(ctx.tasks[name])
 
-    from cleek._parsers import run
+    project_path = _project_path(path, is_package=is_package)
+    up_to_date = UpToDate(
+        path,
+        project_path,
+        force=ns.force,
+        explain=ns.explain,
+    )
+    artifacts = ArtifactCache(
+        artifact_backend(ctx),
+        project_path,
+        force=ns.force,
+        explain=ns.explain,
+    )
+
+    if ns.sweep is not None:
+        from cleek._sweep import run_sweep
+
+        try:
+            code = run_sweep(
+                ctx.tasks,
+                _get_task(ctx.tasks, ns.task),
+                ns.sweep,
+                args,
+                jobs=ns.jobs,
+                output=ns.sweep_output,
+                up_to_date=up_to_date,
+                artifacts=artifacts,
+            )
+        except UnknownDependency as error:
+            print(error, file=sys.stderr)
+            raise SystemExit(1) from error
+        raise SystemExit(code)
 
-    result = run(task, ns)
-    if result is not None:
-        print(result)
+    if ns.batch is not None:
+        from cleek._batch import run_batch
+
+        task = _get_task(ctx.tasks, ns.task)
+        with span(f'build parser: {task.full_name}'):
+            parser = parser_for(ns.task)
+        try:
+            code = run_batch(
+                ctx.tasks,
+                task,
+                parser,
+                args,
+                ns.batch,
+                jobs=ns.jobs,
+                up_to_date=up_to_date,
+                artifacts=artifacts,
+            )
+        except (OSError, UnknownDependency) as error:
+            print(error, file=sys.stderr)
+            raise SystemExit(1) from error
+        raise SystemExit(code)
+
+    segments: list[tuple[_Task, _Namespace]] = []
+    for name, segment_args in split_segments(ns.task, args, ctx.tasks):
+        task = _get_task(ctx.tasks, name)
+        with span(f'build parser: {task.full_name}'):
+            parser = parser_for(name)
+        with span('parse arguments'):
+            segments.append((task, parser.parse_args(segment_args)))
+
+    backend = shared_backend(segments) if ns.parallel else None
+    try:
+        if backend is not None:
+            _report(
+                run_together(
+                    ctx.tasks,
+                    segments,
+                    backend,
+                    up_to_date=up_to_date,
+                    artifacts=artifacts,
+                )
+            )
+        for result in run_segments(
+            ctx.tasks,
+            segments,
+            parallel=ns.parallel,
+            jobs=ns.jobs,
+            up_to_date=up_to_date,
+            artifacts=artifacts,
+        ):
+            if result is not None:
+                print(result)
+    except UnknownDependency as error:
+        print(error, file=sys.stderr)
+        raise SystemExit(1) from error
 
 
 if __name__ == '__main__':
@@ -0,0 +1,246 @@
+from __future__ import annotations
+from pathlib import Path
+from typing import Final, Protocol, TYPE_CHECKING, final
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Sequence
+    from os import PathLike
+    from typing import IO
+
+    from cleek._tasks import Context, Task
+
+
+class ArtifactBackend(Protocol):
+    def get_action(self, key: str) -> bytes | None: ...
+
+    def put_action(self, key: str, data: bytes) -> None: ...
+
+    def has_blob(self, digest: str) -> bool: ...
+
+    def get_blob(self, digest: str, dest: Path) -> None: ...
+
+    def put_blob(self, digest: str, src: Path) -> None: ...
+
+    def evict(self, max_size: int) -> tuple[int, int]: ...
+
+
+@final
+class DirectoryBackend:
+    def __init__(self, root: str | PathLike[str]) -> None:
+        self.root: Final = Path(root)
+
+    def _action_path(self, key: str) -> Path:
+        return self.root / 'ac' / key[:2] / f'{key}.json'
+
+    def _blob_path(self, digest: str) -> Path:
+        return self.root / 'cas' / digest[:2] / digest
+
+    def get_action(self, key: str) -> bytes | None:
+        import os
+
+        path = self._action_path(key)
+        try:
+            data = path.read_bytes()
+            os.utime(path)
+        except OSError:
+            return None
+        return data
+
+    def put_action(self, key: str, data: bytes) -> None:
+        from cleek._cache import atomic_write
+
+        atomic_write(self._action_path(key), lambda file: file.write(data))
+
+    def has_blob(self, digest: str) -> bool:
+        return self._blob_path(digest).is_file()
+
+    def get_blob(self, digest: str, dest: Path) -> None:
+        import os
+
+        path = self._blob_path(digest)
+        _copy(path, dest)
+        os.utime(path)
+
+    def put_blob(self, digest: str, src: Path) -> None:
+        import os
+
+        path = self._blob_path(digest)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            _copy(src, path)
+
+    def evict(self, max_size: int) -> tuple[int, int]:
+        import os
+
+        entries: list[tuple[int, int, str]] = []
+        total = 0
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime_ns, stat.st_size, path))
+                total += stat.st_size
+        entries.sort()
+        removed = freed = 0
+        for _, size, path in entries:
+            if total <= max_size:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+            freed += size
+        return removed, freed
+
+
+def _copy(src: Path, dest: Path) -> None:
+    from shutil import copyfileobj
+    from cleek._cache import atomic_write
+
+    def write(file: IO[bytes]) -> None:
+        with src.open('rb') as source:
+            copyfileobj(source, file)
+
+    atomic_write(dest, write)
+
+
+_SIZE_UNITS: Final = {
+    '': 1,
+    'K': 1 << 10,
+    'M': 1 << 20,
+    'G': 1 << 30,
+    'T': 1 << 40,
+}
+
+
+def parse_size(value: str) -> int:
+    number = value.upper().removesuffix('B')
+    unit = number[-1:] if number[-1:] in _SIZE_UNITS else ''
+    return int(float(number.removesuffix(unit)) * _SIZE_UNITS[unit])
+
+
+def artifact_backend(ctx: Context) -> ArtifactBackend:
+    import os
+    from cleek._cache import cache_dir
+
+    root = os.environ.get('CLEEK_ARTIFACT_DIR')
+    if root:
+        return DirectoryBackend(root)
+    if ctx.artifact_store is not None:
+        return ctx.artifact_store
+    return DirectoryBackend(cache_dir() / 'artifacts')
+
+
+def _files(root: Path, patterns: Iterable[str]) -> list[str]:
+    from cleek._uptodate import _expand
+
+    files: list[str] = []
+    for path in _expand(root, patterns):
+        full_path = root / path
+        if full_path.is_dir():
+            files.extend(
+                str(child.relative_to(root))
+                for child in sorted(full_path.rglob('*'))
+                if child.is_file()
+            )
+        elif full_path.is_file():
+            files.append(path)
+    return files
+
+
+_HEX_DIGITS: Final = frozenset('0123456789abcdef')
+
+
+def _is_digest(value: str) -> bool:
+    return len(value) == 64 and not set(value) - _HEX_DIGITS
+
+
+@final
+class ArtifactCache:
+    def __init__(
+        self,
+        backend: ArtifactBackend,
+        root: Path,
+        *,
+        force: bool = False,
+        explain: bool = False,
+    ) -> None:
+        self._backend: Final = backend
+        self._root: Final = root
+        self._force: Final = force
+        self._explain: Final = explain
+
+    def key(self, task: Task, args: Sequence[object]) -> str:
+        from hashlib import sha256
+        from cleek._uptodate import _hash
+
+        digest = sha256()
+        for part in (task.full_name, task.version or '', repr(list(args))):
+            digest.update(part.encode() + b'\0')
+        for path in _files(self._root, task.inputs):
+            digest.update(f'{path}\0{_hash(self._root / path)}\0'.encode())
+        return digest.hexdigest()
+
+    def restore(self, task: Task, key: str) -> bool:
+        import json
+        import os
+        import sys
+
+        if self._force:
+            return False
+        data = self._backend.get_action(key)
+        if data is None:
+            return False
+        try:
+            files = [
+                (str(path), str(digest), int(mode))
+                for path, digest, mode in json.loads(data)['files']
+            ]
+        except (ValueError, KeyError, TypeError):
+            return False
+        if not files:
+            return False
+        root = self._root.resolve()
+        dests = [(root / path).resolve() for path, _, _ in files]
+        if not all(dest.is_relative_to(root) for dest in dests):
+            return False
+        if not all(_is_digest(digest) for _, digest, _ in files):
+            return False
+        has_blob = self._backend.has_blob
+        if not all(has_blob(digest) for _, digest, _ in files):
+            return False
+        for dest, (_, digest, mode) in zip(dests, files):
+            try:
+                self._backend.get_blob(digest, dest)
+            except FileNotFoundError:
+                return False
+            os.chmod(dest, mode)
+        if self._explain:
+            print(
+                f'{task.full_name}: restored {len(files)} files from the'
+                ' artifact cache',
+                file=sys.stderr,
+            )
+        return True
+
+    def store(self, task: Task, key: str) -> None:
+        import json
+        from stat import S_IMODE
+        from cleek._uptodate import _hash
+
+        files: list[tuple[str, str, int]] = []
+        for path in _files(self._root, task.outputs):
+            src = self._root / path
+            digest = _hash(src)
+            self._backend.put_blob(digest, src)
+            files.append((path, digest, S_IMODE(src.stat().st_mode)))
+        if not files:
+            return
+        data = json.dumps({'task': task.full_name, 'files': files}).encode()
+        self._backend.put_action(key, data)
@@ -0,0 +1,191 @@
+from __future__ import annotations
+from contextlib import contextmanager
+from dataclasses import dataclass
+from threading import Lock, local
+from typing import Any, Final, TYPE_CHECKING, TextIO, final
+
+from trio.abc import Instrument
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+    from pathlib import Path
+
+    from trio.lowlevel import Task
+
+
+_TOP: Final = 10
+
+
+@dataclass
+class _TaskStats:
+    steps: int = 0
+    run_time: float = 0.0
+    longest_step: float = 0.0
+    max_latency: float = 0.0
+
+
+@final
+class AsyncStats(Instrument):
+    def __init__(self, stream: TextIO | None = None) -> None:
+        from time import perf_counter
+
+        self._stream: Final = stream
+        self._clock: Final = perf_counter
+        self._origin: Final = perf_counter()
+        self._lock: Final = Lock()
+        self._local: Final = local()
+        self._scheduled: Final[dict[Task, float]] = {}
+        self._stepping: Final[dict[Task, float]] = {}
+        self._tasks: Final[dict[str, _TaskStats]] = {}
+        self._runs = 0
+        self._spawned = 0
+        self._steps = 0
+        self._run_time = 0.0
+        self._io_wait = 0.0
+        self._total_latency = 0.0
+        self._max_latency = 0.0
+        self._longest_step = 0.0
+        self._longest_task: str | None = None
+
+    def _emit(self, event: str, now: float, **fields: Any) -> None:
+        import json
+
+        if self._stream is None:
+            return
+        record = {'event': event, 'time': now - self._origin, **fields}
+        self._stream.write(json.dumps(record) + '\n')
+
+    def before_run(self) -> None:
+        self._local.io_start = None
+        with self._lock:
+            self._runs += 1
+
+    def task_spawned(self, task: Task) -> None:
+        now = self._clock()
+        with self._lock:
+            self._spawned += 1
+            self._emit('spawn', now, task=task.name)
+
+    def task_scheduled(self, task: Task) -> None:
+        self._scheduled.setdefault(task, self._clock())
+
+    def before_task_step(self, task: Task) -> None:
+        now = self._clock()
+        latency = now - self._scheduled.pop(task, now)
+        self._stepping[task] = now
+        with self._lock:
+            self._total_latency += latency
+            self._max_latency = max(self._max_latency, latency)
+            stats = self._tasks.setdefault(task.name, _TaskStats())
+            stats.max_latency = max(stats.max_latency, latency)
+
+    def after_task_step(self, task: Task) -> None:
+        now = self._clock()
+        start = self._stepping.pop(task, now)
+        duration = now - start
+        with self._lock:
+            self._steps += 1
+            self._run_time += duration
+            stats = self._tasks.setdefault(task.name, _TaskStats())
+            stats.steps += 1
+            stats.run_time += duration
+            stats.longest_step = max(stats.longest_step, duration)
+            if duration > self._longest_step:
+                self._longest_step = duration
+                self._longest_task = task.name
+            self._emit('step', now, task=task.name, duration=duration)
+
+    def task_exited(self, task: Task) -> None:
+        self._scheduled.pop(task, None)
+
+    def before_io_wait(self, timeout: float) -> None:
+        self._local.io_start = self._clock()
+
+    def after_io_wait(self, timeout: float) -> None:
+        now = self._clock()
+        start = self._local.io_start
+        if start is None:
+            return
+        self._local.io_start = None
+        with self._lock:
+            self._io_wait += now - start
+            self._emit('io_wait', now, duration=now - start)
+
+    def _mean_latency(self) -> float:
+        return self._total_latency / self._steps if self._steps else 0.0
+
+    def summary(self) -> dict[str, Any]:
+        return {
+            'runs': self._runs,
+            'tasks_spawned': self._spawned,
+            'steps': self._steps,
+            'run_time': self._run_time,
+            'io_wait': self._io_wait,
+            'mean_latency': self._mean_latency(),
+            'max_latency': self._max_latency,
+            'longest_step': self._longest_step,
+            'longest_step_task': self._longest_task,
+            'tasks': {
+                name: vars(stats) for name, stats in self._tasks.items()
+            },
+        }
+
+    def report(self) -> None:
+        from rich.console import Console
+        from rich.table import Table
+
+        if not self._runs:
+            return
+        if self._stream is not None:
+            self._emit('summary', self._clock(), **self.summary())
+            return
+        console = Console(stderr=True)
+        console.print(
+            f'{self._runs} trio runs, {self._spawned} tasks spawned, '
+            f'{self._steps} steps\n'
+            f'Running: {self._run_time * 1e3:.2f} ms, '
+            f'waiting for I/O: {self._io_wait * 1e3:.2f} ms\n'
+            f'Scheduling latency: '
+            f'mean {self._mean_latency() * 1e3:.3f} ms, '
+            f'max {self._max_latency * 1e3:.3f} ms\n'
+            f'Longest step: {self._longest_step * 1e3:.3f} ms '
+            f'in {self._longest_task}',
+            highlight=False,
+        )
+        table = Table()
+        table.add_column('Task')
+        table.add_column('Steps', justify='right')
+        table.add_column('Running (ms)', justify='right')
+        table.add_column('Longest step (ms)', justify='right')
+        table.add_column('Max latency (ms)', justify='right')
+        by_step = sorted(
+            self._tasks.items(),
+            key=lambda item: item[1].longest_step,
+            reverse=True,
+        )
+        for name, stats in by_step[:_TOP]:
+            table.add_row(
+                name,
+                str(stats.steps),
+                f'{stats.run_time * 1e3:.2f}',
+                f'{stats.longest_step * 1e3:.3f}',
+                f'{stats.max_latency * 1e3:.3f}',
+            )
+        console.print(table)
+
+
+@contextmanager
+def async_stats(output: Path | None = None) -> Iterator[AsyncStats]:
+    from contextlib import ExitStack
+    from cleek._loops import instrumenting
+
+    with ExitStack() as stack:
+        stream = None
+        if output is not None:
+            stream = stack.enter_context(open(output, 'w'))
+        stats = AsyncStats(stream)
+        with instrumenting(stats):
+            try:
+                yield stats
+            finally:
+                stats.report()
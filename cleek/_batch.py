@@ -0,0 +1,112 @@
+from __future__ import annotations
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from argparse import ArgumentParser, Namespace
+    from collections.abc import Iterator, Mapping, Sequence
+
+    from cleek._artifacts import ArtifactCache
+    from cleek._tasks import Task
+    from cleek._uptodate import UpToDate
+
+
+def _lines(source: str) -> Iterator[str]:
+    import sys
+
+    if source == '-':
+        yield from sys.stdin
+        return
+    with open(source) as file:
+        yield from file
+
+
+def _parse(
+    parser: ArgumentParser,
+    prefix: Sequence[str],
+    source: str,
+) -> Iterator[tuple[int, Namespace | str]]:
+    import shlex
+
+    for number, line in enumerate(_lines(source), 1):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        try:
+            args = shlex.split(line)
+        except ValueError as error:
+            yield number, str(error)
+            continue
+        try:
+            yield number, parser.parse_args([*prefix, *args])
+        except SystemExit:
+            yield number, 'invalid arguments'
+
+
+def run_batch(
+    tasks: Mapping[str, Task],
+    task: Task,
+    parser: ArgumentParser,
+    prefix: Sequence[str],
+    source: str,
+    *,
+    jobs: int = 1,
+    up_to_date: UpToDate | None = None,
+    artifacts: ArtifactCache | None = None,
+) -> int:
+    from collections import deque
+    from concurrent.futures import Future, ThreadPoolExecutor
+    import sys
+    from cleek._graph import prepare
+
+    run = prepare(tasks, task, up_to_date=up_to_date, artifacts=artifacts)
+
+    def attempt(ns: Namespace) -> tuple[bool, object]:
+        try:
+            return True, run(ns)
+        except (Exception, SystemExit) as error:
+            return False, f'{type(error).__name__}: {error}'
+
+    name = '<stdin>' if source == '-' else source
+    succeeded = failed = 0
+
+    def report(number: int, ok: bool, value: object) -> None:
+        nonlocal succeeded, failed
+        if ok:
+            succeeded += 1
+            if value is not None:
+                print(value, flush=True)
+        else:
+            failed += 1
+            print(f'{name}:{number}: {value}', file=sys.stderr, flush=True)
+
+    parsed = _parse(parser, prefix, source)
+    if jobs < 2:
+        for number, ns in parsed:
+            if isinstance(ns, str):
+                report(number, False, ns)
+            else:
+                report(number, *attempt(ns))
+    else:
+        pending: deque[tuple[int, Future[tuple[bool, object]] | str]]
+        pending = deque()
+
+        def report_next() -> None:
+            number, item = pending.popleft()
+            if isinstance(item, str):
+                report(number, False, item)
+            else:
+                report(number, *item.result())
+
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            for number, ns in parsed:
+                if isinstance(ns, str):
+                    pending.append((number, ns))
+                else:
+                    pending.append((number, executor.submit(attempt, ns)))
+                while len(pending) > 2 * jobs:
+                    report_next()
+            while pending:
+                report_next()
+
+    print(f'{succeeded} succeeded, {failed} failed', file=sys.stderr)
+    return 1 if failed else 0
@@ -0,0 +1,152 @@
+from __future__ import annotations
+from typing import Any, Final, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Mapping
+    from pathlib import Path
+
+    from cleek._tasks import Bench
+
+
+_STATS: Final = ('min', 'median', 'p95', 'stddev')
+
+
+def _timer(bench: Bench, number: int) -> float:
+    from timeit import Timer
+
+    return Timer(bench.impl).timeit(number)
+
+
+def _calibrate(bench: Bench) -> int:
+    if bench.number is not None:
+        return bench.number
+    number = 1
+    while True:
+        for multiple in (1, 2, 5):
+            loops = number * multiple
+            if _timer(bench, loops) >= bench.min_time:
+                return loops
+        number *= 10
+
+
+def _measure(bench: Bench) -> dict[str, Any]:
+    import statistics
+
+    number = _calibrate(bench)
+    for _ in range(bench.warmup):
+        _timer(bench, number)
+    times = [_timer(bench, number) / number for _ in range(bench.repeats)]
+    if len(times) > 1:
+        p95 = statistics.quantiles(times, n=20, method='inclusive')[-1]
+        stddev = statistics.stdev(times)
+    else:
+        p95 = times[0]
+        stddev = 0.0
+    return {
+        'loops': number,
+        'repeats': bench.repeats,
+        'min': min(times),
+        'median': statistics.median(times),
+        'p95': p95,
+        'stddev': stddev,
+        'mean': statistics.fmean(times),
+    }
+
+
+def _duration(seconds: float) -> str:
+    for unit, scale in (('s', 1.0), ('ms', 1e-3), ('µs', 1e-6)):
+        if seconds >= scale:
+            return f'{seconds / scale:.3g} {unit}'
+    return f'{seconds / 1e-9:.3g} ns'
+
+
+def _print(
+    results: Mapping[str, Mapping[str, Any]],
+    baseline: Mapping[str, Mapping[str, Any]] | None,
+    regressed: Iterable[str],
+) -> None:
+    from rich.console import Console
+    from rich.table import Table
+
+    regressed = set(regressed)
+    table = Table()
+    table.add_column('Benchmark')
+    table.add_column('Loops', justify='right')
+    for stat in _STATS:
+        table.add_column(stat.capitalize(), justify='right')
+    if baseline is not None:
+        table.add_column('Change', justify='right')
+    for name, result in results.items():
+        row = [name, str(result['loops'])]
+        row.extend(_duration(result[stat]) for stat in _STATS)
+        if baseline is not None:
+            if name in baseline:
+                old = baseline[name]['median']
+                change = f'{100 * (result["median"] - old) / old:+.1f}%'
+                if name in regressed:
+                    change = f'[red]{change}[/red]'
+            else:
+                change = 'new'
+            row.append(change)
+        table.add_row(*row)
+    Console().print(table)
+
+
+def _regressed(
+    results: Mapping[str, Mapping[str, Any]],
+    baseline: Mapping[str, Mapping[str, Any]],
+    threshold: float,
+) -> list[str]:
+    return [
+        name
+        for name, result in results.items()
+        if name in baseline
+        and result['median'] > baseline[name]['median'] * (1 + threshold / 100)
+    ]
+
+
+def run_benches(
+    benches: Mapping[str, Bench],
+    pattern: str,
+    *,
+    output: Path | None = None,
+    baseline: Path | None = None,
+    threshold: float = 10.0,
+) -> int:
+    from fnmatch import fnmatchcase
+    import json
+    import sys
+    from cleek._spans import span
+
+    selected = [
+        bench for name, bench in benches.items() if fnmatchcase(name, pattern)
+    ]
+    if not selected:
+        print(f'No benchmarks match {pattern!r}', file=sys.stderr)
+        return 1
+
+    old = None
+    if baseline is not None:
+        try:
+            old = json.loads(baseline.read_text())['benchmarks']
+        except (OSError, ValueError, KeyError) as error:
+            print(f'Cannot read baseline {baseline}: {error}', file=sys.stderr)
+            return 1
+
+    results: dict[str, dict[str, Any]] = {}
+    for bench in selected:
+        with span(f'bench: {bench.name}'):
+            results[bench.name] = _measure(bench)
+
+    regressed = [] if old is None else _regressed(results, old, threshold)
+    _print(results, old, regressed)
+    if output is not None:
+        with output.open('w') as file:
+            json.dump({'benchmarks': results}, file, indent=2)
+            file.write('\n')
+    for name in regressed:
+        print(
+            f'{name} regressed by more than {threshold:g}%',
+            file=sys.stderr,
+        )
+    return 1 if regressed else 0
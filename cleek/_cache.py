@@ -0,0 +1,50 @@
+from __future__ import annotations
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+    from typing import IO
+
+
+def cache_enabled() -> bool:
+    import os
+
+    return not os.environ.get('CLEEK_NO_CACHE')
+
+
+def cache_dir() -> Path:
+    import os
+
+    root = os.environ.get('XDG_CACHE_HOME')
+    if root:
+        return Path(root) / 'cleek'
+    return Path.home() / '.cache/cleek'
+
+
+def cache_key(*parts: str) -> str:
+    from hashlib import sha256
+
+    return sha256('\0'.join(parts).encode()).hexdigest()[:32]
+
+
+def atomic_write(
+    path: Path,
+    write: 'Callable[[IO[bytes]], None]',
+) -> None:
+    import os
+    from tempfile import NamedTemporaryFile
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with NamedTemporaryFile(
+        dir=path.parent,
+        prefix=f'.{path.name}.',
+        delete=False,
+    ) as file:
+        try:
+            write(file)
+        except BaseException:
+            file.close()
+            os.unlink(file.name)
+            raise
+    os.replace(file.name, path)
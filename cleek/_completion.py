@@ -0,0 +1,347 @@
+from __future__ import annotations
+from dataclasses import dataclass
+from shlex import quote
+from typing import Any, Final, Literal, TYPE_CHECKING, final
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Mapping
+    from pathlib import Path
+
+    from cleek._manifest import Manifest, ManifestTask
+
+
+Shell = Literal['bash', 'zsh', 'fish']
+
+SHELLS: Final[tuple[Shell, ...]] = ('bash', 'zsh', 'fish')
+
+_PATH_TYPES: Final = frozenset(('pathlib:Path', 'trio:Path'))
+
+
+@final
+@dataclass(frozen=True)
+class _Values:
+    choices: tuple[str, ...] | None = None
+    path: bool = False
+
+
+@final
+@dataclass(frozen=True)
+class _Option:
+    strings: tuple[str, ...]
+    values: _Values | None
+
+
+@final
+@dataclass(frozen=True)
+class _Positional:
+    values: _Values
+    repeats: bool
+
+
+def _values(kwargs: Mapping[str, Any]) -> _Values:
+    from cleek._manifest import type_name
+
+    choices = kwargs.get('choices')
+    type = kwargs.get('type')
+    return _Values(
+        None if choices is None else tuple(str(choice) for choice in choices),
+        type is not None and type_name(type) in _PATH_TYPES,
+    )
+
+
+def _spec(task: ManifestTask) -> tuple[list[_Option], list[_Positional]]:
+    assert task.arguments is not None
+    options = [_Option(('-h', '--help'), None)]
+    positionals: list[_Positional] = []
+    for argument in task.arguments:
+        if argument.args[0].startswith('-'):
+            action = argument.kwargs.get('action')
+            takes_value = action not in ('store_true', 'store_false')
+            options.append(
+                _Option(
+                    argument.args,
+                    _values(argument.kwargs) if takes_value else None,
+                )
+            )
+        else:
+            positionals.append(
+                _Positional(
+                    _values(argument.kwargs),
+                    argument.kwargs.get('nargs') == '*',
+                )
+            )
+    return options, positionals
+
+
+def _dispatch_spec() -> tuple[list[_Option], list[str]]:
+    from cleek._parsers import make_dispatch_parser
+
+    options: list[_Option] = []
+    two_values: list[str] = []
+    for action in make_dispatch_parser()._actions:
+        if not action.option_strings:
+            continue
+        if action.nargs in (0, '?'):
+            options.append(_Option(tuple(action.option_strings), None))
+            continue
+        options.append(
+            _Option(tuple(action.option_strings), _values(vars(action)))
+        )
+        if action.nargs == 2:
+            two_values.extend(action.option_strings)
+    return options, two_values
+
+
+# bash #
+
+
+def _bash_reply(values: _Values) -> str:
+    if values.choices is not None:
+        words = quote(' '.join(values.choices))
+        return f'COMPREPLY=($(compgen -W {words} -- "$cur")); return'
+    if values.path:
+        return 'COMPREPLY=($(compgen -f -- "$cur")); return'
+    return 'return'
+
+
+def _bash_task(task: ManifestTask) -> Iterable[str]:
+    options, positionals = _spec(task)
+    value_options = [
+        string
+        for option in options
+        if option.values is not None
+        for string in option.strings
+    ]
+    yield f'        {quote(task.full_name)})'
+    if value_options:
+        yield '            case "$prev" in'
+        for option in options:
+            if option.values is not None:
+                yield f'                {"|".join(option.strings)})'
+                yield f'                    {_bash_reply(option.values)};;'
+        yield '            esac'
+    all_options = quote(
+        ' '.join(string for option in options for string in option.strings)
+    )
+    yield '            if [[ "$cur" == -* ]]; then'
+    yield f'                COMPREPLY=($(compgen -W {all_options} -- "$cur"))'
+    yield '                return'
+    yield '            fi'
+    if positionals:
+        yield (
+            '            case "$(_clk_positional_index "$task"'
+            f' {quote(" ".join(value_options))})" in'
+        )
+        for index, positional in enumerate(positionals):
+            pattern = '*' if positional.repeats else str(index)
+            yield f'                {pattern})'
+            yield f'                    {_bash_reply(positional.values)};;'
+        yield '            esac'
+    yield '            ;;'
+
+
+def _bash_dispatch(options: list[_Option]) -> Iterable[str]:
+    for option in options:
+        if option.values is not None:
+            yield f'            {"|".join(option.strings)})'
+            yield f'                {_bash_reply(option.values)};;'
+
+
+def _bash(manifest: Manifest, source: str) -> Iterable[str]:
+    names = quote(' '.join(manifest.tasks))
+    options, two_values = _dispatch_spec()
+    value_options = quote(
+        ' '.join(
+            string
+            for option in options
+            if option.values is not None and option.strings[0] not in two_values
+            for string in option.strings
+        )
+    )
+    all_options = quote(
+        ' '.join(string for option in options for string in option.strings)
+    )
+    yield f'# clk completion for {source}, generated by clk --emit-completion'
+    yield '_clk_task_index() {'
+    yield '    local i skip=0 word'
+    yield '    for ((i = 1; i < COMP_CWORD; i++)); do'
+    yield '        word="${COMP_WORDS[i]}"'
+    yield '        if ((skip)); then ((skip--)); continue; fi'
+    yield '        case "$word" in'
+    yield '            -*)'
+    yield '                if [[ " $1 " == *" $word "* ]]; then skip=1'
+    yield '                elif [[ " $2 " == *" $word "* ]]; then skip=2; fi'
+    yield '                ;;'
+    yield '            *) echo "$i"; return ;;'
+    yield '        esac'
+    yield '    done'
+    yield '    echo 0'
+    yield '}'
+    yield ''
+    yield '_clk_positional_index() {'
+    yield '    local i n=0 skip=0 word'
+    yield '    for ((i = $1 + 1; i < COMP_CWORD; i++)); do'
+    yield '        word="${COMP_WORDS[i]}"'
+    yield '        if ((skip)); then skip=0; continue; fi'
+    yield '        case "$word" in'
+    yield '            -*) [[ " $2 " == *" $word "* ]] && skip=1 ;;'
+    yield '            *) ((n++)) ;;'
+    yield '        esac'
+    yield '    done'
+    yield '    echo "$n"'
+    yield '}'
+    yield ''
+    yield '_clk() {'
+    yield '    local cur="${COMP_WORDS[COMP_CWORD]}"'
+    yield '    local prev="${COMP_WORDS[COMP_CWORD-1]}"'
+    yield '    local task'
+    yield '    COMPREPLY=()'
+    yield (
+        f'    task="$(_clk_task_index {value_options}'
+        f' {quote(" ".join(two_values))})"'
+    )
+    yield '    if ((task == 0)); then'
+    yield '        case "$prev" in'
+    yield from _bash_dispatch(options)
+    yield '        esac'
+    if two_values:
+        yield '        case "${COMP_WORDS[COMP_CWORD-2]}" in'
+        yield from _bash_dispatch(
+            [option for option in options if option.strings[0] in two_values]
+        )
+        yield '        esac'
+    yield '        if [[ "$cur" == -* ]]; then'
+    yield f'            COMPREPLY=($(compgen -W {all_options} -- "$cur"))'
+    yield '        else'
+    yield f'            COMPREPLY=($(compgen -W {names} -- "$cur"))'
+    yield '        fi'
+    yield '        return'
+    yield '    fi'
+    yield '    case "${COMP_WORDS[task]}" in'
+    for task in manifest.tasks.values():
+        yield from _bash_task(task)
+    yield '    esac'
+    yield '}'
+    yield ''
+    yield 'complete -o default -F _clk clk'
+
+
+def _zsh(manifest: Manifest, source: str) -> Iterable[str]:
+    yield 'autoload -U +X bashcompinit && bashcompinit'
+    yield from _bash(manifest, source)
+
+
+# fish #
+
+
+def _fish_values(values: _Values) -> str:
+    if values.choices is not None:
+        return f'-x -a {quote(" ".join(values.choices))}'
+    if values.path:
+        return '-r -F'
+    return '-x'
+
+
+def _fish_options(prefix: str, options: list[_Option]) -> Iterable[str]:
+    for option in options:
+        parts = [prefix]
+        for string in option.strings:
+            if string.startswith('--'):
+                parts.append(f'-l {quote(string[2:])}')
+            else:
+                parts.append(f'-s {quote(string[1:])}')
+        if option.values is not None:
+            parts.append(_fish_values(option.values))
+        yield ' '.join(parts)
+
+
+def _fish_task(task: ManifestTask) -> Iterable[str]:
+    options, positionals = _spec(task)
+    prefix = (
+        'complete -c clk -n'
+        f' {quote(f"__fish_seen_subcommand_from {task.full_name}")}'
+    )
+    yield from _fish_options(prefix, options)
+    for positional in positionals:
+        if positional.values.choices is not None or positional.values.path:
+            yield f'{prefix} {_fish_values(positional.values)}'
+
+
+def _fish(manifest: Manifest, source: str) -> Iterable[str]:
+    yield f'# clk completion for {source}, generated by clk --emit-completion'
+    yield 'complete -c clk -e'
+    yield (
+        "complete -c clk -f -n '__fish_use_subcommand'"
+        f' -a {quote(" ".join(manifest.tasks))}'
+    )
+    options, _ = _dispatch_spec()
+    yield from _fish_options(
+        "complete -c clk -n '__fish_use_subcommand'",
+        options,
+    )
+    for task in manifest.tasks.values():
+        yield from _fish_task(task)
+
+
+def emit_completion(manifest: Manifest, shell: Shell, source: Path) -> str:
+    match shell:
+        case 'bash':
+            lines = _bash(manifest, str(source))
+        case 'zsh':
+            lines = _zsh(manifest, str(source))
+        case 'fish':
+            lines = _fish(manifest, str(source))
+    return ''.join(f'{line}\n' for line in lines)
+
+
+# Regeneration #
+
+
+def _registry_path(cleeks: Path) -> Path:
+    from cleek._cache import cache_dir, cache_key
+
+    return cache_dir() / 'completions' / f'{cache_key(str(cleeks))}.json'
+
+
+def _load_registry(cleeks: Path) -> dict[str, Shell]:
+    import json
+
+    try:
+        with _registry_path(cleeks).open('rb') as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+
+def register_completion(cleeks: Path, shell: Shell, output: Path) -> None:
+    import json
+    from cleek._cache import atomic_write
+
+    registry = _load_registry(cleeks)
+    registry[str(output.resolve())] = shell
+    data = json.dumps(registry).encode()
+    atomic_write(_registry_path(cleeks), lambda file: file.write(data))
+
+
+def write_completion(
+    manifest: Manifest,
+    shell: Shell,
+    cleeks: Path,
+    output: Path,
+) -> None:
+    from cleek._cache import atomic_write
+
+    data = emit_completion(manifest, shell, cleeks).encode()
+    atomic_write(output, lambda file: file.write(data))
+
+
+def regenerate_completions(cleeks: Path, manifest: Manifest) -> None:
+    from pathlib import Path
+
+    if not manifest.complete:
+        return
+    for output, shell in _load_registry(cleeks).items():
+        try:
+            write_completion(manifest, shell, cleeks, Path(output))
+        except OSError:
+            pass
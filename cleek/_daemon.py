@@ -0,0 +1,277 @@
+from __future__ import annotations
+from typing import Any, Final, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Sequence
+    from pathlib import Path
+    from socket import socket as Socket
+    from typing import NoReturn
+
+    from cleek._manifest import Manifest
+
+
+_RELOAD_TIMEOUT: Final = 10.0
+
+_DISABLE_ENV: Final = 'CLEEK_NO_DAEMON'
+
+
+def socket_path(cleeks: Path) -> Path:
+    import os
+    from pathlib import Path
+    from tempfile import gettempdir
+    from cleek._cache import cache_dir, cache_key
+
+    # AF_UNIX paths are limited to about 100 bytes, too short for cache_dir().
+    runtime_dir = os.environ.get('XDG_RUNTIME_DIR')
+    if runtime_dir:
+        dir = Path(runtime_dir) / 'cleek'
+    else:
+        dir = Path(gettempdir()) / f'cleek-{os.getuid()}'
+    key = cache_key(str(cache_dir()), str(cleeks))
+    return dir / f'{key[:16]}.sock'
+
+
+def _is_private(dir: Path) -> bool:
+    import os
+    import stat
+
+    try:
+        info = os.lstat(dir)
+    except OSError:
+        return False
+    return (
+        stat.S_ISDIR(info.st_mode)
+        and info.st_uid == os.getuid()
+        and stat.S_IMODE(info.st_mode) == 0o700
+    )
+
+
+def client_enabled() -> bool:
+    import os
+
+    return not os.environ.get(_DISABLE_ENV) and '_ARGCOMPLETE' not in os.environ
+
+
+def _send(conn: Socket, message: dict[str, Any]) -> None:
+    import json
+
+    conn.sendall(json.dumps(message).encode() + b'\n')
+
+
+def _connect(path: Path) -> Socket | None:
+    import socket
+
+    conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        conn.connect(str(path))
+    except OSError:
+        conn.close()
+        return None
+    return conn
+
+
+def _request(conn: Socket, message: dict[str, Any]) -> int | None:
+    import json
+    import os
+    import signal
+    import socket
+
+    data = json.dumps(message).encode() + b'\n'
+    socket.send_fds(conn, [data], [0, 1, 2])
+
+    pid: int | None = None
+
+    def forward(signum: int, frame: object) -> None:
+        if pid is not None:
+            os.kill(pid, signum)
+
+    previous = {
+        signum: signal.signal(signum, forward)
+        for signum in (signal.SIGINT, signal.SIGTERM)
+    }
+    try:
+        for line in conn.makefile('rb'):
+            reply = json.loads(line)
+            if 'pid' in reply:
+                pid = reply['pid']
+            elif 'exit' in reply:
+                return reply['exit']
+            elif reply.get('reload'):
+                return None
+        return 1
+    finally:
+        for signum, handler in previous.items():
+            signal.signal(signum, handler)
+
+
+def run_client(cleeks: Path, argv: Sequence[str]) -> int | None:
+    import os
+    from time import monotonic, sleep
+
+    path = socket_path(cleeks)
+    if not _is_private(path.parent) or not path.exists():
+        return None
+    conn = _connect(path)
+    if conn is None:
+        return None
+
+    message = {'argv': list(argv), 'cwd': os.getcwd(), 'env': dict(os.environ)}
+    deadline = monotonic() + _RELOAD_TIMEOUT
+    while True:
+        with conn:
+            code = _request(conn, message)
+        if code is not None:
+            return code
+        # The daemon is restarting to pick up changes to cleeks.
+        while (conn := _connect(path)) is None:
+            if monotonic() > deadline:
+                return None
+            sleep(0.05)
+
+
+def stop_daemon(cleeks: Path) -> bool:
+    path = socket_path(cleeks)
+    if not _is_private(path.parent):
+        return False
+    conn = _connect(path)
+    if conn is None:
+        return False
+    with conn:
+        _send(conn, {'stop': True})
+        conn.recv(1)
+    return True
+
+
+def _exit_code(error: SystemExit) -> int:
+    import sys
+
+    code = error.code
+    if code is None:
+        return 0
+    if isinstance(code, int):
+        return code
+    print(code, file=sys.stderr)
+    return 1
+
+
+def _child(
+    conn: Socket,
+    request: dict[str, Any],
+    fds: list[int],
+    handle: Callable[[], None],
+) -> NoReturn:
+    import os
+    import sys
+
+    for target, fd in enumerate(fds[:3]):
+        os.dup2(fd, target)
+    for fd in fds:
+        os.close(fd)
+    os.chdir(request['cwd'])
+    os.environ.clear()
+    os.environ.update(request['env'])
+    os.environ[_DISABLE_ENV] = '1'
+    sys.argv = ['clk', *request['argv']]
+    _send(conn, {'pid': os.getpid()})
+
+    code = 0
+    try:
+        handle()
+    except SystemExit as error:
+        code = _exit_code(error)
+    except BaseException:
+        sys.excepthook(*sys.exc_info())  # type: ignore[arg-type]
+        code = 1
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+    _send(conn, {'exit': code})
+    os._exit(code)
+
+
+def _reload(path: Path) -> NoReturn:
+    import os
+    import sys
+
+    path.unlink(missing_ok=True)
+    os.execv(sys.executable, [sys.executable, '-m', 'cleek', '--daemon'])
+
+
+def serve(
+    cleeks: Path,
+    manifest: Manifest,
+    handle: Callable[[], None],
+) -> NoReturn:
+    import json
+    import os
+    import signal
+    import socket
+    import sys
+
+    path = socket_path(cleeks)
+    path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+    if not _is_private(path.parent):
+        print(
+            f'Refusing to serve: {path.parent} must be a directory owned by'
+            ' you with mode 0700',
+            file=sys.stderr,
+        )
+        raise SystemExit(1)
+    probe = _connect(path)
+    if probe is not None:
+        probe.close()
+        print(f'A daemon is already serving {cleeks}', file=sys.stderr)
+        raise SystemExit(1)
+    path.unlink(missing_ok=True)
+
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(str(path))
+    server.listen()
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+    print(f'Serving {cleeks} on {path}', file=sys.stderr)
+
+    try:
+        while True:
+            conn, _ = server.accept()
+            with conn:
+                try:
+                    data, fds, _, _ = socket.recv_fds(conn, 1 << 20, 3)
+                except OSError:
+                    continue
+                while data and not data.endswith(b'\n'):
+                    chunk = conn.recv(1 << 20)
+                    if not chunk:
+                        break
+                    data += chunk
+                try:
+                    request = json.loads(data)
+                    if not isinstance(request, dict):
+                        raise ValueError(request)
+                except ValueError:
+                    # Probes and broken clients; keep serving the rest.
+                    for fd in fds:
+                        os.close(fd)
+                    continue
+                if request.get('stop'):
+                    for fd in fds:
+                        os.close(fd)
+                    conn.sendall(b'\n')
+                    break
+                if not manifest.is_fresh():
+                    for fd in fds:
+                        os.close(fd)
+                    server.close()
+                    _send(conn, {'reload': True})
+                    conn.close()
+                    _reload(path)
+                sys.stdout.flush()
+                sys.stderr.flush()
+                if os.fork() == 0:
+                    server.close()
+                    _child(conn, request, fds, handle)
+                for fd in fds:
+                    os.close(fd)
+    finally:
+        server.close()
+        path.unlink(missing_ok=True)
+    raise SystemExit()
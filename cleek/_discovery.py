@@ -0,0 +1,142 @@
+from __future__ import annotations
+from pathlib import Path
+from typing import Any, Final, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+
+_MAX_CACHED: Final = 64
+
+
+def _stop_markers() -> tuple[set[str], set[Path]]:
+    import os
+
+    names: set[str] = set()
+    paths: set[Path] = set()
+    for marker in os.environ.get('CLEEKS_STOP', '').split(os.pathsep):
+        if not marker:
+            continue
+        marker = os.path.expanduser(os.path.expandvars(marker))
+        if os.sep in marker:
+            paths.add(Path(marker).resolve())
+        else:
+            names.add(marker)
+    return names, paths
+
+
+def _search_dirs(start: Path) -> Iterator[Path]:
+    names, paths = _stop_markers()
+    root_path = Path('/')
+    parent_path = start
+    while True:
+        yield parent_path
+        if parent_path in paths:
+            return
+        if any((parent_path / name).exists() for name in names):
+            return
+        parent_path = parent_path.parent
+        if parent_path == root_path:
+            return
+
+
+def _search(start: Path) -> tuple[Path, bool, list[Path]]:
+    searched: list[Path] = []
+    for parent_path in _search_dirs(start):
+        searched.append(parent_path)
+        path = parent_path / 'cleeks.py'
+        if path.exists():
+            return path, False, searched
+        path = parent_path / 'cleeks/__init__.py'
+        if path.exists():
+            return path, True, searched
+    raise FileNotFoundError('Cannot find cleeks')
+
+
+def _cache_path() -> Path:
+    from cleek._cache import cache_dir
+
+    return cache_dir() / 'discovery.json'
+
+
+def _load_cache() -> dict[str, Any]:
+    import json
+    from cleek._cache import cache_enabled
+
+    if not cache_enabled():
+        return {}
+    try:
+        with _cache_path().open('rb') as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_cache(cache: dict[str, Any]) -> None:
+    import json
+    from cleek._cache import atomic_write, cache_enabled
+
+    if not cache_enabled():
+        return
+    while len(cache) > _MAX_CACHED:
+        del cache[next(iter(cache))]
+    data = json.dumps(cache).encode()
+    try:
+        atomic_write(_cache_path(), lambda file: file.write(data))
+    except OSError:
+        pass
+
+
+def _mtime(path: Path) -> int | None:
+    try:
+        return path.stat().st_mtime_ns
+    except OSError:
+        return None
+
+
+def _cached(entry: Any, stop: str) -> tuple[Path, bool] | None:
+    try:
+        if entry['stop'] != stop:
+            return None
+        for dir, mtime in entry['dirs']:
+            if _mtime(Path(dir)) != mtime:
+                return None
+        path = Path(entry['path'])
+        if _mtime(path) is None:
+            return None
+        return path, entry['is_package']
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def find_cleeks() -> tuple[Path, bool]:
+    import os
+
+    root_path = os.environ.get('CLEEKS_PATH')
+    if root_path is not None:
+        root_path = Path(root_path).resolve(strict=True)
+        if not root_path.is_dir():
+            return root_path, False
+        path = root_path / '__init__.py'
+        if path.exists():
+            return path, True
+        raise FileNotFoundError('Cannot find cleeks')
+
+    start = Path().resolve(strict=True)
+    stop = os.environ.get('CLEEKS_STOP', '')
+    cache = _load_cache()
+    key = str(start)
+    found = _cached(cache.get(key), stop)
+    if found is not None:
+        return found
+
+    path, is_package, searched = _search(start)
+    cache.pop(key, None)
+    cache[key] = {
+        'path': str(path),
+        'is_package': is_package,
+        'stop': stop,
+        'dirs': [[str(dir), _mtime(dir)] for dir in searched],
+    }
+    _save_cache(cache)
+    return path, is_package
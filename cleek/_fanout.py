@@ -0,0 +1,94 @@
+from __future__ import annotations
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from asyncio import AbstractEventLoop
+    from collections.abc import Callable, Sequence
+
+    from cleek._loops import AsyncBackend
+    from cleek._tasks import Task
+
+
+def _init_worker(origin: str, is_package: bool, prepend_to_path: bool) -> None:
+    from pathlib import Path
+    import sys
+    from cleek.__main__ import _import_cleeks, _project_path
+
+    path = Path(origin)
+    project_path = str(_project_path(path, is_package=is_package))
+    if prepend_to_path and project_path not in sys.path:
+        sys.path.insert(0, project_path)
+    if 'cleeks' not in sys.modules:
+        _import_cleeks(path, is_package=is_package)
+
+
+def _run_chunk(
+    impl: Callable[..., object],
+    args: Sequence[object],
+    backend: AsyncBackend,
+    loop_factory: Callable[[], AbstractEventLoop] | None,
+) -> object:
+    from inspect import iscoroutine
+    from cleek._loops import run_coroutine
+
+    result = impl(*args)
+    if iscoroutine(result):
+        return run_coroutine(backend, result, loop_factory)
+    return result
+
+
+def _combine(results: list[object]) -> object:
+    if all(result is None for result in results):
+        return None
+    combined: list[object] = []
+    for result in results:
+        if not isinstance(result, list):
+            return results
+        combined.extend(result)
+    return combined
+
+
+def _chunks(
+    items: Sequence[object],
+    jobs: int,
+    size: int | None,
+) -> list[list[object]]:
+    if size is None:
+        size = max(1, -(-len(items) // jobs))
+    return [list(items[i : i + size]) for i in range(0, len(items), size)]
+
+
+def run_fan_out(task: Task, args: list[object], jobs: int) -> object:
+    from concurrent.futures import ProcessPoolExecutor
+    import sys
+    from cleek import _ctx as ctx
+
+    spec = task.spec
+    fixed = args[: len(spec.names)]
+    parts = _chunks(args[len(spec.names) :], jobs, task.chunk_size)
+    loop = task.async_backend
+    if len(parts) < 2:
+        return _run_chunk(task.impl, args, loop, task.loop_factory)
+
+    initializer = initargs = None
+    cleeks = sys.modules.get('cleeks')
+    origin = getattr(getattr(cleeks, '__spec__', None), 'origin', None)
+    if origin is not None:
+        initializer = _init_worker
+        initargs = (origin, hasattr(cleeks, '__path__'), ctx.prepend_to_path)
+    with ProcessPoolExecutor(
+        max_workers=min(jobs, len(parts)),
+        initializer=initializer,
+        initargs=initargs or (),
+    ) as executor:
+        futures = [
+            executor.submit(
+                _run_chunk,
+                task.impl,
+                [*fixed, *part],
+                loop,
+                task.loop_factory,
+            )
+            for part in parts
+        ]
+        return _combine([future.result() for future in futures])
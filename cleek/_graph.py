@@ -0,0 +1,454 @@
+from __future__ import annotations
+from typing import Any, Final, NamedTuple, TYPE_CHECKING, final
+
+if TYPE_CHECKING:
+    from argparse import Namespace
+    from collections.abc import (
+        Awaitable,
+        Callable,
+        Iterator,
+        Mapping,
+        Sequence,
+    )
+
+    from cleek._artifacts import ArtifactCache
+    from cleek._loops import AsyncBackend
+    from cleek._tasks import Task
+    from cleek._uptodate import UpToDate
+
+
+class UnknownDependency(ValueError):
+    def __init__(self, task: str, dependency: str) -> None:
+        self.task: Final = task
+        self.dependency: Final = dependency
+        super().__init__(
+            f'task {task!r} depends on unknown task {dependency!r}'
+        )
+
+
+def prerequisites(tasks: Mapping[str, Task], task: Task) -> list[Task]:
+    order: list[Task] = []
+    seen: set[str] = set()
+
+    def visit(task: Task) -> None:
+        for name in task.depends:
+            if name in seen:
+                continue
+            seen.add(name)
+            try:
+                dependency = tasks[name]
+            except KeyError:
+                raise UnknownDependency(task.full_name, name) from None
+            visit(dependency)
+            order.append(dependency)
+
+    visit(task)
+    return order
+
+
+async def _profiled(invoke: Callable[[], Awaitable[object]]) -> object:
+    from cleek._profile import profile
+
+    with profile():
+        return await invoke()
+
+
+async def _cached(
+    task: Task,
+    args: list[object],
+    invoke: Callable[[], Awaitable[object]],
+) -> object:
+    from cleek._results import result_cache
+
+    cache = result_cache(task, args)
+    if cache is None:
+        return await invoke()
+    hit, result = cache.get()
+    if not hit:
+        result = await invoke()
+        cache.put(result)
+    return result
+
+
+def _run_traced(task: Task, ns: Namespace, jobs: int) -> object:
+    from cleek._parsers import run
+    from cleek._spans import span
+
+    with span(f'run: {task.full_name}'):
+        return run(task, ns, jobs=jobs)
+
+
+async def _call(task: Task, ns: Namespace, jobs: int) -> object:
+    from functools import partial
+    import trio
+    from cleek._spans import span
+
+    fans_out = task.fan_out is not None and jobs > 1
+    if not task.spec.is_async or task.async_backend != 'trio' or fans_out:
+        return await trio.to_thread.run_sync(
+            partial(_run_traced, task, ns, jobs)
+        )
+    args = task.spec.bind(ns)
+    with span(f'run: {task.full_name}', track=True):
+        return await _cached(
+            task,
+            args,
+            partial(_profiled, partial(task.impl, *args)),
+        )
+
+
+@final
+class _Pending(NamedTuple):
+    task: Task
+    entry: dict[str, Any] | None
+    key: str | None
+
+
+@final
+class _Checks:
+    def __init__(
+        self,
+        up_to_date: UpToDate | None,
+        artifacts: ArtifactCache | None,
+    ) -> None:
+        self._up_to_date: Final = up_to_date
+        self._artifacts: Final = artifacts
+
+    def start(self, task: Task, ns: Namespace) -> _Pending | None:
+        entry = key = None
+        if self._up_to_date is not None and (task.inputs or task.outputs):
+            entry = self._up_to_date.check(task, task.spec.bind(ns))
+            if entry is None:
+                return None
+        if self._artifacts is not None and task.artifacts:
+            key = self._artifacts.key(task, task.spec.bind(ns))
+            if self._artifacts.restore(task, key):
+                self._record(task, entry)
+                return None
+        return _Pending(task, entry, key)
+
+    def _record(self, task: Task, entry: dict[str, Any] | None) -> None:
+        if entry is not None:
+            assert self._up_to_date is not None
+            self._up_to_date.record(task, entry)
+
+    def finish(self, pending: _Pending) -> None:
+        if pending.key is not None:
+            assert self._artifacts is not None
+            self._artifacts.store(pending.task, pending.key)
+        self._record(pending.task, pending.entry)
+
+
+async def _run_concurrently(
+    order: Sequence[Task],
+    namespaces: Mapping[str, Namespace],
+    jobs: int,
+    checks: _Checks,
+) -> object:
+    import trio
+
+    limiter = trio.CapacityLimiter(jobs)
+    done = {task.full_name: trio.Event() for task in order}
+    results: dict[str, object] = {}
+
+    async def run_task(task: Task) -> None:
+        for dependency in task.depends:
+            event = done.get(dependency)
+            if event is not None:
+                await event.wait()
+        name = task.full_name
+        ns = namespaces[name]
+        pending = checks.start(task, ns)
+        if pending is None:
+            results[name] = None
+        else:
+            async with limiter:
+                results[name] = await _call(task, ns, jobs)
+            checks.finish(pending)
+        done[name].set()
+
+    async with trio.open_nursery() as nursery:
+        for task in order:
+            nursery.start_soon(run_task, task)
+    return results[order[-1].full_name]
+
+
+def run_with_prerequisites(
+    tasks: Mapping[str, Task],
+    task: Task,
+    ns: Namespace,
+    *,
+    jobs: int = 1,
+    up_to_date: UpToDate | None = None,
+    artifacts: ArtifactCache | None = None,
+    completed: set[str] | None = None,
+) -> object:
+    from cleek._parsers import make_single_parser
+
+    order = prerequisites(tasks, task)
+    if completed is not None:
+        order = [step for step in order if step.full_name not in completed]
+        completed.update(step.full_name for step in order)
+        completed.add(task.full_name)
+    namespaces = {
+        dependency.full_name: make_single_parser(dependency).parse_args([])
+        for dependency in order
+    }
+    namespaces[task.full_name] = ns
+    order.append(task)
+    checks = _Checks(up_to_date, artifacts)
+
+    if jobs > 1 and len(order) > 1:
+        from cleek._loops import run_async
+
+        return run_async(
+            'trio',
+            _run_concurrently,
+            order,
+            namespaces,
+            jobs,
+            checks,
+        )
+
+    result = None
+    for step in order:
+        ns = namespaces[step.full_name]
+        pending = checks.start(step, ns)
+        if pending is None:
+            result = None
+            continue
+        result = _run_traced(step, ns, jobs)
+        checks.finish(pending)
+    return result
+
+
+def _run_prerequisites(
+    tasks: Mapping[str, Task],
+    task: Task,
+    completed: set[str],
+    *,
+    up_to_date: UpToDate | None,
+    artifacts: ArtifactCache | None,
+) -> None:
+    from cleek._parsers import make_single_parser
+
+    for dependency in prerequisites(tasks, task):
+        if dependency.full_name in completed:
+            continue
+        run_with_prerequisites(
+            tasks,
+            dependency,
+            make_single_parser(dependency).parse_args([]),
+            up_to_date=up_to_date,
+            artifacts=artifacts,
+            completed=completed,
+        )
+
+
+def prepare(
+    tasks: Mapping[str, Task],
+    task: Task,
+    *,
+    up_to_date: UpToDate | None = None,
+    artifacts: ArtifactCache | None = None,
+) -> Callable[[Namespace], object]:
+    completed: set[str] = set()
+    _run_prerequisites(
+        tasks,
+        task,
+        completed,
+        up_to_date=up_to_date,
+        artifacts=artifacts,
+    )
+
+    def run_task(ns: Namespace) -> object:
+        return run_with_prerequisites(
+            tasks,
+            task,
+            ns,
+            up_to_date=up_to_date,
+            artifacts=artifacts,
+            completed={*completed},
+        )
+
+    return run_task
+
+
+async def _traced(
+    name: str,
+    invoke: Callable[[], Awaitable[object]],
+) -> object:
+    from cleek._spans import span
+
+    with span(name, track=True):
+        return await invoke()
+
+
+@final
+class Outcome(NamedTuple):
+    task: Task
+    result: object = None
+    error: str | None = None
+
+
+def shared_backend(
+    segments: Sequence[tuple[Task, Namespace]],
+) -> AsyncBackend | None:
+    loops = {
+        (task.async_backend, task.loop_factory) if task.spec.is_async else None
+        for task, _ in segments
+    }
+    if len(segments) < 2 or len(loops) != 1:
+        return None
+    loop = loops.pop()
+    return None if loop is None else loop[0]
+
+
+_CANCELLED: Final = 'cancelled'
+
+
+async def _together_trio(
+    calls: Sequence[Callable[[], Awaitable[object]]],
+    outcomes: list[tuple[object, str | None]],
+) -> None:
+    import trio
+
+    async with trio.open_nursery() as nursery:
+
+        async def run_one(index: int) -> None:
+            try:
+                outcomes[index] = (await calls[index](), None)
+            except Exception as error:
+                outcomes[index] = (None, f'{type(error).__name__}: {error}')
+                nursery.cancel_scope.cancel()
+
+        for index in range(len(calls)):
+            nursery.start_soon(run_one, index)
+
+
+async def _together_asyncio(
+    calls: Sequence[Callable[[], Awaitable[object]]],
+    outcomes: list[tuple[object, str | None]],
+) -> None:
+    import asyncio
+
+    async def run_one(index: int) -> None:
+        try:
+            outcomes[index] = (await calls[index](), None)
+        except Exception as error:
+            outcomes[index] = (None, f'{type(error).__name__}: {error}')
+            for other in handles:
+                if other is not asyncio.current_task():
+                    other.cancel()
+
+    handles = [asyncio.ensure_future(run_one(i)) for i in range(len(calls))]
+    await asyncio.gather(*handles, return_exceptions=True)
+
+
+def run_together(
+    tasks: Mapping[str, Task],
+    segments: Sequence[tuple[Task, Namespace]],
+    backend: AsyncBackend,
+    *,
+    up_to_date: UpToDate | None = None,
+    artifacts: ArtifactCache | None = None,
+) -> list[Outcome]:
+    from functools import partial
+    from cleek._loops import run_async
+
+    completed: set[str] = set()
+    for task, _ in segments:
+        _run_prerequisites(
+            tasks,
+            task,
+            completed,
+            up_to_date=up_to_date,
+            artifacts=artifacts,
+        )
+
+    checks = _Checks(up_to_date, artifacts)
+    outcomes: list[tuple[object, str | None]] = []
+    calls: list[Callable[[], Awaitable[object]]] = []
+    started: list[tuple[int, _Pending]] = []
+    for task, ns in segments:
+        pending = checks.start(task, ns)
+        if pending is None:
+            outcomes.append((None, None))
+            continue
+        args = task.spec.bind(ns)
+        started.append((len(outcomes), pending))
+        outcomes.append((None, _CANCELLED))
+        invoke = partial(
+            _cached,
+            task,
+            args,
+            partial(_profiled, partial(task.impl, *args)),
+        )
+        calls.append(partial(_traced, f'run: {task.full_name}', invoke))
+
+    if calls:
+        results = [(None, _CANCELLED) for _ in calls]
+        together = {'asyncio': _together_asyncio, 'trio': _together_trio}
+        run_async(
+            backend,
+            together[backend],
+            calls,
+            results,
+            loop_factory=segments[0][0].loop_factory,
+        )
+        for (index, pending), outcome in zip(started, results):
+            outcomes[index] = outcome
+            if outcome[1] is None:
+                checks.finish(pending)
+
+    return [
+        Outcome(task, result, error)
+        for (task, _), (result, error) in zip(segments, outcomes)
+    ]
+
+
+def run_segments(
+    tasks: Mapping[str, Task],
+    segments: Sequence[tuple[Task, Namespace]],
+    *,
+    parallel: bool = False,
+    jobs: int = 1,
+    up_to_date: UpToDate | None = None,
+    artifacts: ArtifactCache | None = None,
+) -> Iterator[object]:
+    from functools import partial
+
+    for task, _ in segments:
+        prerequisites(tasks, task)
+
+    run = partial(
+        run_with_prerequisites,
+        tasks,
+        jobs=jobs,
+        up_to_date=up_to_date,
+        artifacts=artifacts,
+    )
+    if not parallel or len(segments) < 2:
+        completed: set[str] = set()
+        for task, ns in segments:
+            yield run(task, ns, completed=completed)
+        return
+
+    from concurrent.futures import ThreadPoolExecutor
+
+    completed = set()
+    for task, _ in segments:
+        _run_prerequisites(
+            tasks,
+            task,
+            completed,
+            up_to_date=up_to_date,
+            artifacts=artifacts,
+        )
+    with ThreadPoolExecutor(max_workers=len(segments)) as executor:
+        futures = [
+            executor.submit(run, task, ns, completed={*completed})
+            for task, ns in segments
+        ]
+        for future in futures:
+            yield future.result()
@@ -0,0 +1,90 @@
+from __future__ import annotations
+from contextlib import contextmanager
+from typing import Final, Literal, TYPE_CHECKING, TypeVar
+
+if TYPE_CHECKING:
+    from asyncio import AbstractEventLoop
+    from collections.abc import Callable, Coroutine, Iterator
+
+    from trio.abc import Instrument
+
+
+AsyncBackend = Literal['asyncio', 'trio']
+
+ASYNC_BACKENDS: Final = ('asyncio', 'trio')
+
+_T = TypeVar('_T')
+
+_instruments: Final[list[Instrument]] = []
+
+
+def check_backend(backend: str) -> None:
+    if backend not in ASYNC_BACKENDS:
+        raise ValueError(
+            f'unknown async backend {backend!r}, expected one of'
+            f' {", ".join(ASYNC_BACKENDS)}'
+        )
+
+
+def import_backend(backend: AsyncBackend) -> None:
+    check_backend(backend)
+    if backend == 'asyncio':
+        import asyncio
+    else:
+        import trio
+
+
+@contextmanager
+def instrumenting(instrument: Instrument) -> Iterator[None]:
+    _instruments.append(instrument)
+    try:
+        yield
+    finally:
+        _instruments.remove(instrument)
+
+
+def _run_asyncio(
+    coro: Coroutine[object, object, _T],
+    loop_factory: Callable[[], AbstractEventLoop] | None,
+) -> _T:
+    import asyncio
+    import sys
+
+    if loop_factory is None:
+        return asyncio.run(coro)
+    if sys.version_info >= (3, 11):
+        with asyncio.Runner(loop_factory=loop_factory) as runner:
+            return runner.run(coro)
+    loop = loop_factory()
+    try:
+        asyncio.set_event_loop(loop)
+        return loop.run_until_complete(coro)
+    finally:
+        loop.run_until_complete(loop.shutdown_asyncgens())
+        asyncio.set_event_loop(None)
+        loop.close()
+
+
+def run_async(
+    backend: AsyncBackend,
+    fn: Callable[..., Coroutine[object, object, _T]],
+    *args: object,
+    loop_factory: Callable[[], AbstractEventLoop] | None = None,
+) -> _T:
+    check_backend(backend)
+    if backend == 'asyncio':
+        return _run_asyncio(fn(*args), loop_factory)
+    import trio
+
+    return trio.run(fn, *args, instruments=list(_instruments))
+
+
+def run_coroutine(
+    backend: AsyncBackend,
+    coro: Coroutine[object, object, _T],
+    loop_factory: Callable[[], AbstractEventLoop] | None = None,
+) -> _T:
+    async def run_result() -> _T:
+        return await coro
+
+    return run_async(backend, run_result, loop_factory=loop_factory)
@@ -0,0 +1,282 @@
+from __future__ import annotations
+from dataclasses import dataclass, field
+from typing import Any, Final, TYPE_CHECKING, final
+
+from cleek._parsers import Argument
+
+if TYPE_CHECKING:
+    from argparse import ArgumentParser
+    from collections.abc import Callable, Iterable
+    from pathlib import Path
+
+    from cleek._parsers import UnsupportedSignature
+    from cleek._tasks import Context
+
+
+_VERSION: Final = 1
+
+
+@final
+class _LazyType:
+    def __init__(self, module: str, qualname: str) -> None:
+        self._module: Final = module
+        self._qualname: Final = qualname
+        self.__name__: Final = qualname.rpartition('.')[2]
+        self._type: Callable[[str], object] | None = None
+
+    def __call__(self, value: str) -> object:
+        if self._type is None:
+            self._type = _import_type(self._module, self._qualname)
+        return self._type(value)
+
+
+def _import_type(module: str, qualname: str) -> Callable[[str], object]:
+    from importlib import import_module
+
+    obj: Any = import_module(module)
+    for part in qualname.split('.'):
+        obj = getattr(obj, part)
+    return obj
+
+
+def type_name(type: Callable[[str], object]) -> str:
+    if isinstance(type, _LazyType):
+        return f'{type._module}:{type._qualname}'
+    return f'{type.__module__}:{type.__qualname__}'
+
+
+def _load_type(name: str) -> Callable[[str], object]:
+    import sys
+
+    module, _, qualname = name.partition(':')
+    if module in sys.modules:
+        return _import_type(module, qualname)
+    return _LazyType(module, qualname)
+
+
+def _dump_argument(argument: Argument) -> list[Any]:
+    kwargs = dict(argument.kwargs)
+    if 'type' in kwargs:
+        kwargs['type'] = type_name(kwargs['type'])
+    if 'choices' in kwargs:
+        kwargs['choices'] = list(kwargs['choices'])
+    return [list(argument.args), kwargs]
+
+
+def _load_argument(data: list[Any]) -> Argument:
+    args, kwargs = data
+    if 'type' in kwargs:
+        kwargs['type'] = _load_type(kwargs['type'])
+    if 'choices' in kwargs:
+        kwargs['choices'] = tuple(kwargs['choices'])
+    return Argument(tuple(args), kwargs)
+
+
+def _fingerprint(path: str) -> tuple[str, int, int] | None:
+    import os
+
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return path, stat.st_mtime_ns, stat.st_size
+
+
+@final
+@dataclass(frozen=True)
+class ManifestTask:
+    name: str
+    group: str | None
+    style: str | None
+    arguments: tuple[Argument, ...] | None
+    error: UnsupportedSignature | None = field(
+        default=None,
+        compare=False,
+        repr=False,
+    )
+
+    @property
+    def full_name(self) -> str:
+        parts: list[str] = []
+        if self.group is not None:
+            parts.append(self.group)
+        parts.append(self.name)
+        return '.'.join(parts)
+
+    def add_arguments(self, parser: ArgumentParser) -> None:
+        from cleek._parsers import add_arguments
+
+        if self.arguments is None:
+            assert self.error is not None
+            raise self.error
+        add_arguments(parser, self.arguments)
+
+    def make_parser(self) -> ArgumentParser:
+        from argparse import ArgumentParser
+
+        parser = ArgumentParser(prog=f'clk {self.full_name}')
+        self.add_arguments(parser)
+        return parser
+
+
+@final
+@dataclass(frozen=True)
+class Manifest:
+    sources: tuple[tuple[str, int, int], ...]
+    tasks: dict[str, ManifestTask]
+
+    @property
+    def complete(self) -> bool:
+        return all(task.arguments is not None for task in self.tasks.values())
+
+    def is_fresh(self) -> bool:
+        return all(
+            _fingerprint(source[0]) == source for source in self.sources
+        )
+
+    def make_parser(self, selected: str | None = None) -> ArgumentParser:
+        from argparse import ArgumentParser
+        import argcomplete
+
+        parser = ArgumentParser(add_help=False)
+        subparsers = parser.add_subparsers(
+            description='task',
+            help='task',
+            title='task',
+            dest='task',
+        )
+        if selected in self.tasks:
+            task = self.tasks[selected]
+            task.add_arguments(subparsers.add_parser(task.full_name))
+        else:
+            for name in self.tasks:
+                subparsers.add_parser(name, add_help=False)
+        argcomplete.autocomplete(parser)
+        return parser
+
+
+def manifest_from_tasks(
+    tasks: dict[str, ManifestTask],
+    sources: Iterable[str],
+) -> Manifest:
+    fingerprints: list[tuple[str, int, int]] = []
+    for source in sources:
+        fingerprint = _fingerprint(source)
+        if fingerprint is not None:
+            fingerprints.append(fingerprint)
+    return Manifest(tuple(fingerprints), tasks)
+
+
+def manifest_from_context(ctx: Context, sources: Iterable[str]) -> Manifest:
+    from cleek._parsers import UnsupportedSignature, record_arguments
+    from cleek._spans import span
+
+    tasks: dict[str, ManifestTask] = {}
+    for full_name, task in ctx.tasks.items():
+        try:
+            with span(f'build parser: {full_name}'):
+                arguments = tuple(record_arguments(task))
+        except UnsupportedSignature as error:
+            manifest_task = ManifestTask(
+                task.name,
+                task.group,
+                task.style,
+                None,
+                error,
+            )
+        else:
+            manifest_task = ManifestTask(
+                task.name,
+                task.group,
+                task.style,
+                arguments,
+            )
+        tasks[full_name] = manifest_task
+    return manifest_from_tasks(tasks, sources)
+
+
+def _dump_manifest(manifest: Manifest) -> dict[str, Any]:
+    return {
+        'version': _VERSION,
+        'sources': [list(source) for source in manifest.sources],
+        'tasks': [
+            {
+                'name': task.name,
+                'group': task.group,
+                'style': task.style,
+                'arguments': None
+                if task.arguments is None
+                else [_dump_argument(argument) for argument in task.arguments],
+            }
+            for task in manifest.tasks.values()
+        ],
+    }
+
+
+def _load_manifest(data: dict[str, Any]) -> Manifest:
+    tasks: dict[str, ManifestTask] = {}
+    for task_data in data['tasks']:
+        arguments = task_data['arguments']
+        task = ManifestTask(
+            task_data['name'],
+            task_data['group'],
+            task_data['style'],
+            None
+            if arguments is None
+            else tuple(_load_argument(argument) for argument in arguments),
+        )
+        tasks[task.full_name] = task
+    return Manifest(
+        tuple((path, mtime, size) for path, mtime, size in data['sources']),
+        tasks,
+    )
+
+
+def manifest_path(cleeks: Path) -> Path:
+    from cleek import __version__
+    from cleek._cache import cache_dir, cache_key
+
+    key = cache_key(__version__, str(cleeks))
+    return cache_dir() / 'manifests' / f'{key}.json'
+
+
+def load_manifest(cleeks: Path) -> Manifest | None:
+    import json
+    from cleek._cache import cache_enabled
+
+    if not cache_enabled():
+        return None
+    try:
+        with manifest_path(cleeks).open('rb') as file:
+            data = json.load(file)
+        if data['version'] != _VERSION:
+            return None
+        manifest = _load_manifest(data)
+    except (
+        AttributeError,
+        ImportError,
+        OSError,
+        ValueError,
+        KeyError,
+        TypeError,
+    ):
+        return None
+    if not manifest.is_fresh():
+        return None
+    return manifest
+
+
+def save_manifest(cleeks: Path, manifest: Manifest) -> None:
+    import json
+    from cleek._cache import atomic_write, cache_enabled
+
+    if not cache_enabled():
+        return
+    try:
+        data = json.dumps(_dump_manifest(manifest)).encode()
+    except (TypeError, ValueError):
+        return
+    try:
+        atomic_write(manifest_path(cleeks), lambda file: file.write(data))
+    except OSError:
+        pass
@@ -0,0 +1,215 @@
+from __future__ import annotations
+from contextlib import contextmanager
+from typing import Final, TYPE_CHECKING, final
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+    from pathlib import Path
+    from threading import Thread
+    from typing import TextIO
+    from tracemalloc import Snapshot, Statistic, StatisticDiff
+
+
+_TOP: Final = 10
+
+
+def _size(size: float) -> str:
+    for unit in ('B', 'KiB', 'MiB'):
+        if abs(size) < 1024:
+            return f'{size:7.1f} {unit}'
+        size /= 1024
+    return f'{size:7.1f} GiB'
+
+
+def _location(filename: str, lineno: int | None = None) -> str:
+    import os
+
+    cwd = os.getcwd() + os.sep
+    name = filename.removeprefix(cwd)
+    return name if lineno is None else f'{name}:{lineno}'
+
+
+def _ignored() -> list[str]:
+    import os
+    import tracemalloc
+
+    return [
+        tracemalloc.__file__,
+        '<frozen importlib._bootstrap*>',
+        os.path.join(os.path.dirname(__file__), '*'),
+    ]
+
+
+def _filtered(snapshot: Snapshot) -> Snapshot:
+    import tracemalloc
+
+    return snapshot.filter_traces(
+        [tracemalloc.Filter(False, pattern) for pattern in _ignored()]
+    )
+
+
+def _print_stats(
+    title: str,
+    stats: list[Statistic] | list[StatisticDiff],
+    key: str,
+    file: TextIO,
+) -> None:
+    from tracemalloc import StatisticDiff
+
+    print(title, file=file)
+    for stat in stats[:_TOP]:
+        frame = stat.traceback[0]
+        location = _location(
+            frame.filename,
+            frame.lineno if key == 'lineno' else None,
+        )
+        if isinstance(stat, StatisticDiff):
+            sizes = f'{_size(stat.size_diff)}  {_size(stat.size)}'
+        else:
+            sizes = _size(stat.size)
+        print(f'  {sizes}  {location}', file=file)
+
+
+@final
+class Memory:
+    def __init__(
+        self,
+        *,
+        interval: float | None = None,
+        snapshot_path: Path | None = None,
+    ) -> None:
+        from threading import Event, Lock
+
+        self._interval: Final = interval
+        self._snapshot_path: Final = snapshot_path
+        self._peak = 0
+        self._largest: Snapshot | None = None
+        self._largest_size = 0
+        self._timeline: Final[list[tuple[float, int, int]]] = []
+        self._lock: Final = Lock()
+        self._active = 0
+        self._origin: float | None = None
+        self._stop: Final = Event()
+        self._sampler: Thread | None = None
+
+    def _snapshot(self) -> None:
+        import tracemalloc
+
+        snapshot = _filtered(tracemalloc.take_snapshot())
+        size = sum(stat.size for stat in snapshot.statistics('filename'))
+        if self._largest is None or size >= self._largest_size:
+            self._largest = snapshot
+            self._largest_size = size
+
+    def _sample(self, interval: float) -> None:
+        from time import perf_counter
+        import tracemalloc
+
+        assert self._origin is not None
+        while not self._stop.wait(interval):
+            current, peak = tracemalloc.get_traced_memory()
+            elapsed = perf_counter() - self._origin
+            self._timeline.append((elapsed, current, peak))
+            self._snapshot()
+
+    def _start(self) -> None:
+        from fnmatch import fnmatch
+        from threading import Thread
+        from time import perf_counter
+        import tracemalloc
+
+        self._stop.clear()
+        self._sampler = None
+        if self._interval is not None:
+            self._sampler = Thread(
+                target=self._sample,
+                args=(self._interval,),
+                name='cleek-memory',
+                daemon=True,
+            )
+        # Compile the filter patterns now so that isn't traced.
+        for pattern in _ignored():
+            fnmatch('', pattern)
+        tracemalloc.start()
+        tracemalloc.reset_peak()
+        if self._origin is None:
+            self._origin = perf_counter()
+        if self._sampler is not None:
+            self._sampler.start()
+
+    def _finish(self) -> None:
+        import tracemalloc
+
+        self._stop.set()
+        if self._sampler is not None:
+            self._sampler.join()
+        self._snapshot()
+        self._peak = max(self._peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+
+    @contextmanager
+    def collect(self) -> Iterator[None]:
+        with self._lock:
+            self._active += 1
+            if self._active == 1:
+                self._start()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._active -= 1
+                if not self._active:
+                    self._finish()
+
+    def report(self) -> None:
+        import sys
+
+        if self._largest is None:
+            return
+        print(f'Peak traced memory: {_size(self._peak)}', file=sys.stderr)
+        if self._timeline:
+            print('Timeline:', file=sys.stderr)
+            for elapsed, current, peak in self._timeline:
+                print(
+                    f'  {elapsed:8.2f}s  {_size(current)}  '
+                    f'(peak {_size(peak).strip()})',
+                    file=sys.stderr,
+                )
+        print(
+            'Allocation sites in the largest snapshot'
+            f' ({_size(self._largest_size).strip()}):',
+            file=sys.stderr,
+        )
+        for key in ('lineno', 'filename'):
+            _print_stats(
+                f'Top {_TOP} {"lines" if key == "lineno" else "files"}:',
+                self._largest.statistics(key),
+                key,
+                sys.stderr,
+            )
+        if self._snapshot_path is not None:
+            self._largest.dump(str(self._snapshot_path))
+
+
+def compare_snapshots(old: Path, new: Path) -> None:
+    import sys
+    from tracemalloc import Snapshot
+
+    before = Snapshot.load(str(old))
+    after = Snapshot.load(str(new))
+    by_file = after.compare_to(before, 'filename')
+    total = sum(stat.size_diff for stat in by_file)
+    print(f'Total change: {_size(total).strip()}')
+    print(f'Total size: {_size(sum(stat.size for stat in by_file)).strip()}')
+    _print_stats(
+        f'Top {_TOP} lines (change, size):',
+        after.compare_to(before, 'lineno'),
+        'lineno',
+        sys.stdout,
+    )
+    _print_stats(
+        f'Top {_TOP} files (change, size):',
+        by_file,
+        'filename',
+        sys.stdout,
+    )
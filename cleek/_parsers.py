@@ -2,6 +2,7 @@ from __future__ import annotations
 from enum import Enum, auto, unique
 from pathlib import Path
 from typing import (
+    Any,
     Final,
     Literal,
     NamedTuple,
@@ -16,7 +17,7 @@ from cleek._tasks import Context, Task
 
 if TYPE_CHECKING:
     from argparse import ArgumentParser, _SubParsersAction, Namespace
-    from collections.abc import Callable, Iterable
+    from collections.abc import Callable, Container, Iterable, Sequence
     from inspect import _IntrospectableCallable, Signature, Parameter
 
 
@@ -173,9 +174,24 @@ def _parse_literal_annotation(
         raise _Unsupported('unsupported literal')
 
 
+@final
+class Argument(NamedTuple):
+    args: tuple[str, ...]
+    kwargs: dict[str, Any]
+
+
+@final
+class _ArgumentRecorder:
+    def __init__(self) -> None:
+        self.arguments: Final[list[Argument]] = []
+
+    def add_argument(self, *args: str, **kwargs: Any) -> None:
+        self.arguments.append(Argument(args, kwargs))
+
+
 @final
 class _ArgumentParserBuilder:
-    def __init__(self, parser: ArgumentParser) -> None:
+    def __init__(self, parser: ArgumentParser | _ArgumentRecorder) -> None:
         self._parser: Final = parser
         self._add_argument: Final = self._parser.add_argument
         self._options: Final = _OptionRegistry()
@@ -205,19 +221,18 @@ class _ArgumentParserBuilder:
         else:
             raise _UnsupportedDefault(default)
 
-    def _p_literal(self, param: Parameter, annotation: object) -> None:
-        match _parse_literal_annotation(annotation):
-            case 'str', args:
-                self._p_literal_str(param, args)
-            case _:
-                raise _Unsupported('unsupported literal')
-
-    def _p(self, param: Parameter) -> None:
-        annotation = param.annotation
-        if _is_literal_type(annotation):
-            self._p_literal(param, annotation)
+    def _p_converter(
+        self,
+        param: Parameter,
+        converter: Callable[[str], object],
+    ) -> None:
+        default = param.default
+        if default is param.empty:
+            self._add_argument(param.name, type=converter)
         else:
-            raise _Unsupported(f'unsupported annotation {annotation!r}')
+            self._add_argument(
+                param.name, nargs='?', default=default, type=converter
+            )
 
     # POSITIONAL_OR_KEYWORD #
 
@@ -267,17 +282,6 @@ class _ArgumentParserBuilder:
     def _pk_literal_str(self, param: Parameter, choices: Iterable[str]) -> None:
         self._pk_literal_type(param, str, choices)
 
-    def _pk_literal(
-        self,
-        param: Parameter,
-        annotation: object,
-    ) -> None:
-        match _parse_literal_annotation(annotation):
-            case 'int', args:
-                self._pk_literal_int(param, args)
-            case 'str', args:
-                self._pk_literal_str(param, args)
-
     # bool #
 
     def _pk_bool_default(
@@ -466,64 +470,66 @@ class _ArgumentParserBuilder:
         else:
             raise _UnsupportedDefault(default)
 
-    # - #
+    # Registered converters #
 
-    def _pk(self, param: Parameter) -> None:
-        annotation = param.annotation
-        if annotation is bool:
-            self._pk_bool(param)
-        elif annotation == bool | None:
-            self._pk_optional_bool(param)
-        elif annotation is float:
-            self._pk_float(param)
-        elif annotation == float | None:
-            self._pk_optional_float(param)
-        elif annotation is int:
-            self._pk_int(param)
-        elif annotation == int | None:
-            self._pk_optional_int(param)
-        elif annotation is str:
-            self._pk_str(param)
-        elif annotation == str | None:
-            self._pk_optional_str(param)
-        elif annotation is Path:
-            self._pk_pathlib_path(param)
-        elif annotation == Path | None:
-            self._pk_optional_pathlib_path(param)
-        elif _is_literal_type(annotation):
-            self._pk_literal(param, annotation)
+    def _pk_converter(
+        self,
+        param: Parameter,
+        converter: Callable[[str], object],
+    ) -> None:
+        default = param.default
+        dest = param.name
+        if default is param.empty:
+            self._add_argument(dest, type=converter)
         else:
-            raise _Unsupported(f'unsupported annotation {annotation!r}')
+            self._add_argument(
+                *self._assign_yes(dest),
+                type=converter,
+                default=default,
+                help='default: %(default)s',
+                dest=dest,
+            )
+
+    def _pk_optional_converter(
+        self,
+        param: Parameter,
+        converter: Callable[[str], object],
+    ) -> None:
+        dest = param.name
+        default = None if param.default is param.empty else param.default
+        self._add_argument(
+            *self._assign_yes(dest),
+            type=converter,
+            default=default,
+            help=None if default is None else 'default: %(default)s',
+            dest=dest,
+        )
 
     # VAR_POSITIONAL #
 
     def _vp_type(self, param: Parameter, type: Callable[[str], object]) -> None:
         self._add_argument(param.name, nargs='*', type=type)
 
-    def _vp_path(self, param: Parameter) -> None:
-        self._vp_type(param, Path)
+    # -- #
 
-    def _vp_str(self, param: Parameter) -> None:
-        self._vp_type(param, str)
+    def _dispatch(self, table: _Table, param: Parameter) -> None:
+        annotation = _normalize(param.annotation)
+        handler = _lookup(table, annotation)
+        if handler is None:
+            raise _Unsupported(f'unsupported annotation {param.annotation!r}')
+        method, extra = handler
+        if annotation.form == 'literal':
+            extra = (*extra, annotation.choices)
+        method(self, param, *extra)
 
-    def _vp_trio_path(self, param: Parameter) -> None:
-        import trio
+    def _p(self, param: Parameter) -> None:
+        self._dispatch(_P, param)
 
-        self._vp_type(param, trio.Path)
+    def _pk(self, param: Parameter) -> None:
+        self._dispatch(_PK, param)
 
     def _vp(self, param: Parameter) -> None:
-        annotation = param.annotation
-        if annotation is Path:
-            self._vp_path(param)
-        elif annotation is str:
-            self._vp_str(param)
-        else:
-            import trio
-
-            if annotation is trio.Path:
-                self._vp_trio_path(param)
-            else:
-                raise _Unsupported(f'unsupported annotation {annotation!r}')
+        self._dispatch(_VP, param)
 
     # -- #
 
@@ -542,32 +548,203 @@ class _ArgumentParserBuilder:
         for param in sig.parameters.values():
             self._add_param(param)
 
-    def build(self, obj: '_IntrospectableCallable') -> None:
-        from inspect import signature
-
-        sig = signature(obj, eval_str=True)
+    def build_signature(self, sig: Signature) -> None:
         try:
             self._add_signature(sig)
         except _Unsupported as error:
             raise UnsupportedSignature(sig) from error
 
+    def build(self, obj: '_IntrospectableCallable') -> None:
+        from inspect import signature
+
+        self.build_signature(signature(obj, eval_str=True))
+
+
+@final
+class _Annotation(NamedTuple):
+    form: Literal['type', 'optional', 'literal', 'other']
+    type: object
+    choices: tuple[object, ...] = ()
+
+
+_Handler = tuple['Callable[..., None]', tuple[object, ...]]
+
+_Table = dict[tuple[str, object], _Handler]
+
+_B: Final = _ArgumentParserBuilder
+
+_P: Final[_Table] = {
+    ('literal', str): (_B._p_literal_str, ()),
+}
+
+_PK: Final[_Table] = {
+    ('type', bool): (_B._pk_bool, ()),
+    ('optional', bool): (_B._pk_optional_bool, ()),
+    ('type', float): (_B._pk_float, ()),
+    ('optional', float): (_B._pk_optional_float, ()),
+    ('type', int): (_B._pk_int, ()),
+    ('optional', int): (_B._pk_optional_int, ()),
+    ('type', str): (_B._pk_str, ()),
+    ('optional', str): (_B._pk_optional_str, ()),
+    ('type', Path): (_B._pk_pathlib_path, ()),
+    ('optional', Path): (_B._pk_optional_pathlib_path, ()),
+    ('literal', int): (_B._pk_literal_int, ()),
+    ('literal', str): (_B._pk_literal_str, ()),
+}
+
+_VP: Final[_Table] = {
+    ('type', Path): (_B._vp_type, (Path,)),
+    ('type', str): (_B._vp_type, (str,)),
+}
+
+
+def register_converter(
+    annotation: type[_T],
+    converter: Callable[[str], _T] | None = None,
+) -> None:
+    if converter is None:
+        converter = annotation
+    _P['type', annotation] = (_B._p_converter, (converter,))
+    _PK['type', annotation] = (_B._pk_converter, (converter,))
+    _PK['optional', annotation] = (_B._pk_optional_converter, (converter,))
+    _VP['type', annotation] = (_B._vp_type, (converter,))
+
+
+def _register_trio() -> None:
+    import trio
+
+    register_converter(trio.Path)
+
+
+# Types from these packages are registered when first seen in an annotation,
+# so parsing signatures never imports them.
+_LAZY: Final[dict[str, Callable[[], None]]] = {'trio': _register_trio}
+
+
+def _normalize_uncached(annotation: object) -> _Annotation:
+    from types import NoneType, UnionType
+    from typing import Union, get_origin
+
+    origin = get_origin(annotation)
+    if origin is None:
+        return _Annotation('type', annotation)
+    if origin is Union or origin is UnionType:
+        args = get_args(annotation)
+        if len(args) == 2 and NoneType in args:
+            return _Annotation('optional', args[args[0] is NoneType])
+    elif origin is Literal or _is_literal_type(annotation):
+        match _parse_literal_annotation(annotation):
+            case 'int', choices:
+                return _Annotation('literal', int, choices)
+            case 'str', choices:
+                return _Annotation('literal', str, choices)
+    return _Annotation('other', annotation)
+
+
+_annotations: Final[dict[object, _Annotation]] = {}
+
+
+def _normalize(annotation: object) -> _Annotation:
+    try:
+        return _annotations[annotation]
+    except KeyError:
+        normalized = _annotations[annotation] = _normalize_uncached(annotation)
+        return normalized
+    except TypeError:
+        return _normalize_uncached(annotation)
+
+
+def _lookup(table: _Table, annotation: _Annotation) -> _Handler | None:
+    key = annotation.form, annotation.type
+    try:
+        return table[key]
+    except KeyError:
+        pass
+    except TypeError:
+        return None
+    module = getattr(annotation.type, '__module__', None)
+    if not isinstance(module, str):
+        return None
+    register = _LAZY.pop(module.partition('.')[0], None)
+    if register is None:
+        return None
+    register()
+    return table.get(key)
+
+
+@final
+class TaskSpec:
+    __slots__ = (
+        'impl',
+        'signature',
+        'arguments',
+        'is_async',
+        'names',
+        'variadic',
+    )
+
+    def __init__(self, impl: '_IntrospectableCallable') -> None:
+        from inspect import iscoroutinefunction, signature
+
+        sig = signature(impl, eval_str=True)
+        names: list[str] = []
+        variadic: str | None = None
+        for param in sig.parameters.values():
+            if param.kind == param.VAR_POSITIONAL:
+                variadic = param.name
+            else:
+                names.append(param.name)
+
+        self.impl: Final = impl
+        self.signature: Final = sig
+        self.arguments: Final = tuple(record_signature_arguments(sig))
+        self.is_async: Final = iscoroutinefunction(impl)
+        self.names: Final = tuple(names)
+        self.variadic: Final = variadic
+
+    def add_arguments(self, parser: ArgumentParser) -> None:
+        add_arguments(parser, self.arguments)
+
+    def bind(self, ns: Namespace) -> list[object]:
+        args = [getattr(ns, name) for name in self.names]
+        if self.variadic is not None:
+            args.extend(getattr(ns, self.variadic))
+        return args
+
 
 def make_single_parser(task: Task) -> ArgumentParser:
     from argparse import ArgumentParser
 
     parser = ArgumentParser(prog=f'clk {task.full_name}')
-    builder = _ArgumentParserBuilder(parser)
-    builder.build(task.impl)
+    task.spec.add_arguments(parser)
     return parser
 
 
+def record_arguments(task: Task) -> list[Argument]:
+    return list(task.spec.arguments)
+
+
+def record_signature_arguments(sig: Signature) -> list[Argument]:
+    recorder = _ArgumentRecorder()
+    builder = _ArgumentParserBuilder(recorder)
+    builder.build_signature(sig)
+    return recorder.arguments
+
+
+def add_arguments(
+    parser: ArgumentParser,
+    arguments: Iterable[Argument],
+) -> None:
+    for argument in arguments:
+        parser.add_argument(*argument.args, **argument.kwargs)
+
+
 def add_subparser(
     task: Task,
     subparsers: '_SubParsersAction[ArgumentParser]',
 ) -> None:
     parser = subparsers.add_parser(task.full_name)
-    builder = _ArgumentParserBuilder(parser)
-    builder.build(task.impl)
+    task.spec.add_arguments(parser)
 
 
 def make_parser(ctx: Context) -> 'ArgumentParser':
@@ -588,34 +765,170 @@ def make_parser(ctx: Context) -> 'ArgumentParser':
     return parser
 
 
-def run(task: Task, ns: Namespace) -> None:
-    from inspect import signature
+def make_dispatch_parser() -> 'ArgumentParser':
+    from argparse import ArgumentParser, REMAINDER
+    from cleek._artifacts import parse_size
+    from cleek._completion import SHELLS
+
+    parser = ArgumentParser(prog='clk', add_help=False)
+    parser.add_argument('--emit-completion', choices=SHELLS, metavar='SHELL')
+    parser.add_argument('--completion-file', type=Path, metavar='PATH')
+    parser.add_argument('-j', '--jobs', type=int, default=1, metavar='N')
+    parser.add_argument('--parallel', action='store_true')
+    parser.add_argument('--force', action='store_true')
+    parser.add_argument('--explain', action='store_true')
+    parser.add_argument('--batch', metavar='FILE')
+    parser.add_argument('--sweep', action='append', metavar='NAME=VALUES')
+    parser.add_argument('--sweep-output', type=Path, metavar='PATH')
+    parser.add_argument('--evict-artifacts', type=parse_size, metavar='SIZE')
+    parser.add_argument('--daemon', action='store_true')
+    parser.add_argument('--daemon-stop', action='store_true')
+    parser.add_argument('--profile-startup', action='store_true')
+    parser.add_argument('--profile-startup-json', type=Path, metavar='PATH')
+    parser.add_argument('--time', action='store_true')
+    parser.add_argument('--trace', type=Path, metavar='PATH')
+    parser.add_argument('--profile', nargs='?', const='cprofile', metavar='MODE')
+    parser.add_argument(
+        '--profile-output',
+        type=Path,
+        default=Path('clk-profile'),
+        metavar='PATH',
+    )
+    parser.add_argument('--mem', action='store_true')
+    parser.add_argument('--mem-interval', type=float, metavar='SECONDS')
+    parser.add_argument('--mem-snapshot', type=Path, metavar='PATH')
+    parser.add_argument(
+        '--mem-compare',
+        nargs=2,
+        type=Path,
+        metavar=('OLD', 'NEW'),
+    )
+    parser.add_argument('--async-stats', action='store_true')
+    parser.add_argument('--async-stats-output', type=Path, metavar='PATH')
+    parser.add_argument('--bench', nargs='?', const='*', metavar='PATTERN')
+    parser.add_argument('--bench-output', type=Path, metavar='PATH')
+    parser.add_argument('--bench-baseline', type=Path, metavar='PATH')
+    parser.add_argument(
+        '--bench-threshold',
+        type=float,
+        default=10.0,
+        metavar='PERCENT',
+    )
+    parser.add_argument('task', nargs='?')
+    parser.add_argument('args', nargs=REMAINDER)
+    return parser
 
-    args: list[object] = []
 
-    for param in signature(task.impl, eval_str=True).parameters.values():
-        value = getattr(ns, param.name)
-        if param.kind == param.VAR_POSITIONAL:
-            args.extend(value)
+def _task_index(args: 'Sequence[str]', ns: 'Namespace') -> int:
+    # REMAINDER drops a '--' that directly follows the task name on some
+    # Python versions, so check which of the two candidates is the task.
+    index = len(args) - len(ns.args) - 1
+    if args[index] != ns.task:
+        index -= 1
+    return index
+
+
+def parse_dispatch_args(
+    parser: 'ArgumentParser',
+    args: 'Sequence[str]',
+) -> 'tuple[Namespace, list[str]]':
+    args = list(args)
+    if '--profile' in args:
+        from cleek._profile import MODES
+
+        # --profile takes an optional mode, so it may swallow the task name.
+        # Give each bare --profile before the task name the default mode,
+        # leaving any that belong to the task's own arguments alone.
+        bare = [
+            i
+            for i, arg in enumerate(args[:-1])
+            if arg == '--profile' and args[i + 1] not in MODES
+        ]
+        given = [*args]
+        for i in bare:
+            given[i] = '--profile=cprofile'
+        ns, _ = parser.parse_known_args(given)
+        end = len(args) if ns.task is None else _task_index(given, ns)
+        for i in bare:
+            if i < end:
+                args[i] = '--profile=cprofile'
+    ns = parser.parse_args(args)
+    if ns.profile is not None:
+        from cleek._profile import MODES
+
+        if ns.profile not in MODES:
+            parser.error(f'--profile must be one of {", ".join(MODES)}')
+        if ns.profile == 'cprofile' and (ns.parallel or ns.jobs > 1):
+            parser.error(
+                '--profile=cprofile cannot profile tasks running at the same'
+                ' time; use --profile=sample with --parallel or -j'
+            )
+    if ns.task is None:
+        return ns, []
+    return ns, args[_task_index(args, ns) + 1 :]
+
+
+def split_segments(
+    task: str,
+    args: Sequence[str],
+    names: Container[str],
+) -> list[tuple[str, list[str]]]:
+    segments: list[tuple[str, list[str]]] = [(task, [])]
+    index = 0
+    while index < len(args):
+        arg = args[index]
+        if arg == '--' and index + 1 < len(args) and args[index + 1] in names:
+            segments.append((args[index + 1], []))
+            index += 2
         else:
-            args.append(value)
-
-    from inspect import iscoroutinefunction
+            segments[-1][1].append(arg)
+            index += 1
+    return segments
 
-    if iscoroutinefunction(task.impl):
-        from functools import partial
-        import trio
 
-        return trio.run(partial(task.impl, *args))
+def call(task: Task, args: list[object], jobs: int) -> object:
+    if task.fan_out is not None and jobs > 1:
+        from cleek._fanout import run_fan_out
 
-    result = task.impl(*args)
+        return run_fan_out(task, args, jobs)
 
     from inspect import iscoroutine
+    from cleek._loops import import_backend, run_async, run_coroutine
+    from cleek._profile import profile
+
+    loop = task.async_backend
+    if task.spec.is_async:
+        import_backend(loop)
+        with profile():
+            return run_async(
+                loop,
+                task.impl,
+                *args,
+                loop_factory=task.loop_factory,
+            )
+
+    with profile():
+        result = task.impl(*args)
 
     if iscoroutine(result):
-        import trio
-
-        async def run_result():
-            return await result
-
-        return trio.run(run_result)
+        import_backend(loop)
+        with profile():
+            return run_coroutine(loop, result, task.loop_factory)
+    return result
+
+
+def run(task: Task, ns: Namespace, *, jobs: int = 1) -> None:
+    args = task.spec.bind(ns)
+    if not task.cache:
+        return call(task, args, jobs)
+
+    from cleek._results import result_cache
+
+    cache = result_cache(task, args)
+    if cache is None:
+        return call(task, args, jobs)
+    hit, result = cache.get()
+    if not hit:
+        result = call(task, args, jobs)
+        cache.put(result)
+    return result
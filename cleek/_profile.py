@@ -0,0 +1,266 @@
+from __future__ import annotations
+from contextlib import contextmanager, nullcontext
+from typing import Final, Literal, Protocol, TYPE_CHECKING, final
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+    from contextlib import AbstractContextManager
+    from pathlib import Path
+    from pstats import Stats
+    from threading import Event, Thread
+    from types import FrameType
+
+
+Mode = Literal['cprofile', 'sample']
+
+MODES: Final = ('cprofile', 'sample')
+
+_SAMPLE_INTERVAL: Final = 0.001
+
+_TOP: Final = 20
+
+
+def _is_cleek(filename: str) -> bool:
+    import os
+
+    return filename.startswith(os.path.dirname(__file__) + os.sep)
+
+
+def _label(filename: str, line: int, name: str) -> str:
+    import os
+
+    if filename == '~':
+        return name
+    return f'{name} ({os.path.basename(filename)}:{line})'
+
+
+class Profiler(Protocol):
+    def collect(self) -> AbstractContextManager[None]: ...
+
+    def report(self) -> None: ...
+
+
+def _write_collapsed(stacks: dict[str, float], path: Path) -> None:
+    with open(path, 'w') as file:
+        for stack, weight in sorted(stacks.items()):
+            if weight > 0:
+                file.write(f'{stack} {round(weight)}\n')
+
+
+_Func = tuple[str, int, str]
+
+
+def _filter_stats(stats: Stats) -> None:
+    table = stats.stats  # type: ignore[attr-defined]
+
+    def hidden(func: _Func) -> bool:
+        return _is_cleek(func[0]) or '_lsprof.Profiler' in func[2]
+
+    for func in [func for func in table if hidden(func)]:
+        del table[func]
+    for *_, callers in table.values():
+        for caller in [caller for caller in callers if hidden(caller)]:
+            del callers[caller]
+
+
+def _collapse_stats(stats: Stats) -> dict[str, float]:
+    from collections import defaultdict
+
+    table = stats.stats  # type: ignore[attr-defined]
+    children: defaultdict[_Func, list[tuple[_Func, float]]]
+    children = defaultdict(list)
+    for func, (*_, callers) in table.items():
+        for caller, (*_, cumulative) in callers.items():
+            children[caller].append((func, cumulative))
+
+    stacks: defaultdict[str, float] = defaultdict(float)
+
+    def visit(func: _Func, path: tuple[_Func, ...], share: float) -> None:
+        _, _, own, cumulative, _ = table[func]
+        path = (*path, func)
+        stack = ';'.join(_label(*frame) for frame in path)
+        stacks[stack] += own * share * 1e6
+        for child, via in children[func]:
+            child_cumulative = table[child][3]
+            if child in path or child_cumulative <= 0:
+                continue
+            child_share = share * via / child_cumulative
+            if child_share * child_cumulative >= 1e-6:
+                visit(child, path, child_share)
+
+    for func, (*_, callers) in table.items():
+        if not callers:
+            visit(func, (), 1.0)
+    return stacks
+
+
+@final
+class _CProfile:
+    def __init__(self, output: Path) -> None:
+        from cProfile import Profile
+
+        self._output: Final = output
+        self._profile: Final = Profile()
+        self._active = 0
+        self._used = False
+
+    def collect(self) -> _CProfile:
+        return self
+
+    def __enter__(self) -> None:
+        self._active += 1
+        if self._active == 1:
+            self._used = True
+            self._profile.enable()
+
+    def __exit__(self, *exc_info: object) -> None:
+        self._active -= 1
+        if not self._active:
+            self._profile.disable()
+
+    def report(self) -> None:
+        from pstats import Stats
+        import sys
+
+        if not self._used:
+            return
+        stats = Stats(self._profile, stream=sys.stderr)
+        _filter_stats(stats)
+        stats.dump_stats(self._output.with_suffix('.pstats'))
+        _write_collapsed(
+            _collapse_stats(stats),
+            self._output.with_suffix('.collapsed'),
+        )
+        stats.sort_stats('cumulative').print_stats(_TOP)
+
+
+def _sample_stack(frame: FrameType | None) -> list[str]:
+    stack: list[str] = []
+    while frame is not None:
+        code = frame.f_code
+        if _is_cleek(code.co_filename):
+            break
+        stack.append(_label(code.co_filename, frame.f_lineno, code.co_name))
+        frame = frame.f_back
+    stack.reverse()
+    return stack
+
+
+@final
+class _Sampler:
+    def __init__(self, output: Path) -> None:
+        from collections import Counter
+        from threading import Lock
+
+        self._output: Final = output
+        self._stacks: Final[Counter[str]] = Counter()
+        self._samples = 0
+        self._lock: Final = Lock()
+        self._targets: Final[dict[int, tuple[int, Event, Thread]]] = {}
+        self._switch_interval = 0.0
+
+    def _sample(self, target: int, stop: Event) -> None:
+        from time import sleep
+        import sys
+
+        while True:
+            sleep(_SAMPLE_INTERVAL)
+            frame = sys._current_frames().get(target)
+            if stop.is_set():
+                break
+            stack = _sample_stack(frame)
+            with self._lock:
+                if stack:
+                    self._stacks[';'.join(stack)] += 1
+                self._samples += 1
+
+    @contextmanager
+    def collect(self) -> Iterator[None]:
+        from threading import Event, Thread, get_ident
+        import sys
+
+        target = get_ident()
+        with self._lock:
+            if not self._targets:
+                self._switch_interval = sys.getswitchinterval()
+                sys.setswitchinterval(_SAMPLE_INTERVAL / 2)
+            if target in self._targets:
+                count, stop, thread = self._targets[target]
+            else:
+                stop = Event()
+                thread = Thread(
+                    target=self._sample,
+                    args=(target, stop),
+                    name='cleek-sampler',
+                    daemon=True,
+                )
+                thread.start()
+                count = 0
+            self._targets[target] = (count + 1, stop, thread)
+        try:
+            yield
+        finally:
+            with self._lock:
+                count, stop, thread = self._targets.pop(target)
+                if count > 1:
+                    self._targets[target] = (count - 1, stop, thread)
+                else:
+                    stop.set()
+            if stop.is_set():
+                thread.join()
+                with self._lock:
+                    if not self._targets:
+                        sys.setswitchinterval(self._switch_interval)
+
+    def report(self) -> None:
+        from collections import Counter
+        import sys
+
+        if not self._samples:
+            return
+        _write_collapsed(
+            dict(self._stacks),
+            self._output.with_suffix('.collapsed'),
+        )
+        leaves: Counter[str] = Counter()
+        for stack, count in self._stacks.items():
+            leaves[stack.rsplit(';', 1)[-1]] += count
+        print(f'{self._samples} samples', file=sys.stderr)
+        for label, count in leaves.most_common(_TOP):
+            percent = 100 * count / self._samples
+            print(f'{percent:6.2f}%  {label}', file=sys.stderr)
+
+
+def make_profiler(mode: Mode, output: Path) -> Profiler:
+    return _CProfile(output) if mode == 'cprofile' else _Sampler(output)
+
+
+_profilers: Final[list[Profiler]] = []
+
+
+@contextmanager
+def profiling_session(profiler: Profiler) -> Iterator[None]:
+    _profilers.append(profiler)
+    try:
+        yield
+    finally:
+        _profilers.remove(profiler)
+        profiler.report()
+
+
+@contextmanager
+def _collect_all(profilers: list[Profiler]) -> Iterator[None]:
+    from contextlib import ExitStack
+
+    with ExitStack() as stack:
+        for profiler in profilers:
+            stack.enter_context(profiler.collect())
+        yield
+
+
+def profile() -> AbstractContextManager[None]:
+    if not _profilers:
+        return nullcontext()
+    if len(_profilers) == 1:
+        return _profilers[0].collect()
+    return _collect_all(list(_profilers))
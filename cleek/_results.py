@@ -0,0 +1,117 @@
+from __future__ import annotations
+from typing import Final, TYPE_CHECKING, final
+
+if TYPE_CHECKING:
+    from collections.abc import Sequence
+    from pathlib import Path
+
+    from cleek._tasks import Task
+
+
+def _results_dir(task: Task) -> Path:
+    from cleek._cache import cache_dir, cache_key
+
+    return cache_dir() / 'results' / cache_key(task.full_name)
+
+
+@final
+class ResultCache:
+    def __init__(self, task: Task, args: Sequence[object]) -> None:
+        self._task: Final = task
+        self._dir: Final = _results_dir(task)
+        self._path: Path | None = None
+        self._json: Final = task.cache == 'json'
+        try:
+            self._path = self._dir / self._key(args)
+        except Exception:
+            pass
+
+    def _key(self, args: Sequence[object]) -> str:
+        import json
+        import pickle
+        from cleek._cache import cache_key
+
+        if self._json:
+            data = json.dumps(list(args), sort_keys=True, default=repr)
+        else:
+            data = pickle.dumps(list(args), protocol=4).hex()
+        suffix = '.json' if self._json else '.pickle'
+        return cache_key(self._task.version or '', data) + suffix
+
+    def get(self) -> tuple[bool, object]:
+        import json
+        import os
+        import pickle
+        from time import time
+
+        if self._path is None:
+            return False, None
+        try:
+            with self._path.open('rb') as file:
+                if self._json:
+                    created, result = json.load(file)
+                else:
+                    created, result = pickle.load(file)
+        except FileNotFoundError:
+            return False, None
+        except Exception:
+            self._path.unlink(missing_ok=True)
+            return False, None
+        ttl = self._task.ttl
+        if ttl is not None and time() - created > ttl:
+            self._path.unlink(missing_ok=True)
+            return False, None
+        try:
+            os.utime(self._path)
+        except OSError:
+            pass
+        return True, result
+
+    def put(self, result: object) -> None:
+        import json
+        import pickle
+        from time import time
+        from cleek._cache import atomic_write
+
+        if self._path is None:
+            return
+        entry = [time(), result]
+        try:
+            if self._json:
+                data = json.dumps(entry).encode()
+            else:
+                data = pickle.dumps(entry)
+        except Exception:
+            return
+        try:
+            atomic_write(self._path, lambda file: file.write(data))
+        except OSError:
+            return
+        if self._task.max_size is not None:
+            self._evict(self._task.max_size)
+
+    def _evict(self, max_size: int) -> None:
+        entries: list[tuple[int, int, Path]] = []
+        total = 0
+        for path in self._dir.iterdir():
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, path))
+            total += stat.st_size
+        entries.sort()
+        for _, size, path in entries:
+            if total <= max_size:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+
+
+def result_cache(task: Task, args: Sequence[object]) -> ResultCache | None:
+    from cleek._cache import cache_enabled
+
+    if not task.cache or not cache_enabled():
+        return None
+    return ResultCache(task, args)
+
@@ -0,0 +1,166 @@
+from __future__ import annotations
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Final, TYPE_CHECKING, final
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator
+    from contextlib import AbstractContextManager
+    from pathlib import Path
+
+
+@final
+@dataclass(frozen=True)
+class Span:
+    name: str
+    start: float
+    end: float
+    depth: int
+    thread: int = 0
+    cpu: float = 0.0
+    peak_rss: int = 0
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+    def to_json(self) -> dict[str, Any]:
+        return {
+            'name': self.name,
+            'start': self.start,
+            'end': self.end,
+            'duration': self.duration,
+            'depth': self.depth,
+            'thread': self.thread,
+            'cpu': self.cpu,
+            'peak_rss': self.peak_rss,
+        }
+
+
+def _peak_rss() -> int:
+    import sys
+
+    try:
+        import resource
+    except ImportError:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+_depth: Final = ContextVar('cleek_span_depth', default=0)
+
+_track: Final[ContextVar[int | None]] = ContextVar(
+    'cleek_span_track',
+    default=None,
+)
+
+
+@final
+class Recorder:
+    def __init__(self) -> None:
+        from itertools import count
+        from time import perf_counter
+
+        self.spans: Final[list[Span]] = []
+        self.origin: Final = perf_counter()
+        self._tracks: Final = count(1)
+
+    @contextmanager
+    def span(self, name: str, *, track: bool = False) -> Iterator[None]:
+        from threading import get_ident
+        from time import perf_counter, thread_time
+
+        # Tasks sharing an event loop thread get their own track; thread
+        # idents are positive, so negative ids never collide with them.
+        token = _track.set(-next(self._tracks)) if track else None
+        thread = _track.get() or get_ident()
+        depth = _depth.get()
+        _depth.set(depth + 1)
+        start = perf_counter()
+        cpu = thread_time()
+        try:
+            yield
+        finally:
+            end = perf_counter()
+            _depth.set(depth)
+            if token is not None:
+                _track.reset(token)
+            self.spans.append(
+                Span(
+                    name,
+                    start,
+                    end,
+                    depth,
+                    thread,
+                    thread_time() - cpu,
+                    _peak_rss(),
+                )
+            )
+
+
+_recorder: Recorder | None = None
+
+
+def start_recording() -> Recorder:
+    global _recorder
+
+    if _recorder is None:
+        _recorder = Recorder()
+    return _recorder
+
+
+def stop_recording() -> Recorder | None:
+    global _recorder
+
+    recorder, _recorder = _recorder, None
+    return recorder
+
+
+def span(name: str, *, track: bool = False) -> AbstractContextManager[None]:
+    if _recorder is None:
+        return nullcontext()
+    return _recorder.span(name, track=track)
+
+
+def print_times(spans: Iterable[Span]) -> None:
+    from rich.console import Console
+    from rich.table import Table
+
+    table = Table()
+    table.add_column('Phase')
+    table.add_column('Wall (ms)', justify='right')
+    table.add_column('CPU (ms)', justify='right')
+    table.add_column('Peak RSS (MiB)', justify='right')
+    for span in sorted(spans, key=lambda span: span.start):
+        table.add_row(
+            '  ' * span.depth + span.name,
+            f'{span.duration * 1e3:.2f}',
+            f'{span.cpu * 1e3:.2f}',
+            f'{span.peak_rss / (1 << 20):.1f}',
+        )
+    Console(stderr=True).print(table)
+
+
+def write_trace(recorder: Recorder, path: Path) -> None:
+    import json
+    import os
+
+    threads: dict[int, int] = {}
+    events: list[dict[str, Any]] = []
+    for span in sorted(recorder.spans, key=lambda span: span.start):
+        tid = threads.setdefault(span.thread, len(threads) + 1)
+        events.append(
+            {
+                'name': span.name,
+                'ph': 'X',
+                'ts': (span.start - recorder.origin) * 1e6,
+                'dur': span.duration * 1e6,
+                'pid': os.getpid(),
+                'tid': tid,
+                'args': {'cpu_ms': span.cpu * 1e3, 'peak_rss': span.peak_rss},
+            }
+        )
+    with open(path, 'w') as file:
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, file)
@@ -0,0 +1,151 @@
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import Any, Final, TYPE_CHECKING, final
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Sequence
+    from pathlib import Path
+
+
+_PHASES_FILE_ENV: Final = 'CLEEK_PHASES_FILE'
+
+_IMPORT_TIME_PREFIX: Final = 'import time:'
+
+
+@final
+@dataclass(frozen=True)
+class ModuleImport:
+    name: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+    def to_json(self) -> dict[str, Any]:
+        return {
+            'name': self.name,
+            'self_us': self.self_us,
+            'cumulative_us': self.cumulative_us,
+            'depth': self.depth,
+        }
+
+
+def parse_import_time(line: str) -> ModuleImport | None:
+    if not line.startswith(_IMPORT_TIME_PREFIX):
+        return None
+    fields = line[len(_IMPORT_TIME_PREFIX) :].split('|')
+    if len(fields) != 3:
+        return None
+    self_us, cumulative_us, name = fields
+    name = name.rstrip()
+    try:
+        self_us_int = int(self_us)
+        cumulative_us_int = int(cumulative_us)
+    except ValueError:
+        return None
+    stripped = name.lstrip()
+    depth = (len(name) - len(stripped) - 1) // 2
+    return ModuleImport(stripped, self_us_int, cumulative_us_int, depth)
+
+
+def is_profiled_child() -> bool:
+    import os
+
+    return _PHASES_FILE_ENV in os.environ
+
+
+def record_phases() -> None:
+    import atexit
+    import json
+    import os
+    from cleek._spans import start_recording
+
+    recorder = start_recording()
+    path = os.environ[_PHASES_FILE_ENV]
+
+    def write() -> None:
+        with open(path, 'w') as file:
+            json.dump([span.to_json() for span in recorder.spans], file)
+
+    atexit.register(write)
+
+
+def _print_table(
+    phases: Iterable[dict[str, Any]],
+    imports: Sequence[ModuleImport],
+    limit: int,
+) -> None:
+    from rich.console import Console
+    from rich.table import Table
+
+    console = Console(stderr=True)
+
+    table = Table(title='Phases')
+    table.add_column('Phase')
+    table.add_column('Duration (ms)', justify='right')
+    for phase in sorted(phases, key=lambda phase: phase['start']):
+        name = '  ' * phase['depth'] + phase['name']
+        table.add_row(name, f'{phase["duration"] * 1e3:.2f}')
+    console.print(table)
+
+    table = Table(title=f'Slowest {limit} imports')
+    table.add_column('Module')
+    table.add_column('Self (ms)', justify='right')
+    table.add_column('Cumulative (ms)', justify='right')
+    slowest = sorted(imports, key=lambda i: i.cumulative_us, reverse=True)
+    for module in slowest[:limit]:
+        table.add_row(
+            module.name,
+            f'{module.self_us / 1e3:.2f}',
+            f'{module.cumulative_us / 1e3:.2f}',
+        )
+    console.print(table)
+
+
+def profile_startup(
+    argv: Sequence[str],
+    *,
+    json_path: Path | None,
+    limit: int = 25,
+) -> int:
+    import json
+    import os
+    import subprocess
+    import sys
+    from tempfile import TemporaryDirectory
+
+    imports: list[ModuleImport] = []
+    with TemporaryDirectory() as tmp:
+        phases_path = os.path.join(tmp, 'phases.json')
+        proc = subprocess.Popen(
+            (sys.executable, '-X', 'importtime', '-m', 'cleek', *argv),
+            env={**os.environ, _PHASES_FILE_ENV: phases_path},
+            stderr=subprocess.PIPE,
+            text=True,
+        )
+        assert proc.stderr is not None
+        for line in proc.stderr:
+            module = parse_import_time(line)
+            if module is not None:
+                imports.append(module)
+            elif not line.startswith(_IMPORT_TIME_PREFIX):
+                sys.stderr.write(line)
+        returncode = proc.wait()
+        try:
+            with open(phases_path) as file:
+                phases: list[dict[str, Any]] = json.load(file)
+        except (OSError, ValueError):
+            phases = []
+
+    if json_path is None:
+        _print_table(phases, imports, limit)
+    else:
+        with open(json_path, 'w') as file:
+            json.dump(
+                {
+                    'phases': phases,
+                    'imports': [module.to_json() for module in imports],
+                },
+                file,
+                indent=2,
+            )
+    return returncode
@@ -0,0 +1,435 @@
+from __future__ import annotations
+import ast
+from dataclasses import dataclass
+from typing import Any, Final, TYPE_CHECKING, final
+
+if TYPE_CHECKING:
+    from inspect import Parameter, Signature
+    from pathlib import Path
+
+    from cleek._manifest import Manifest, ManifestTask
+
+
+class _Unresolved(Exception):
+    pass
+
+
+@final
+@dataclass(frozen=True)
+class _Ref:
+    module: str
+    qualname: str = ''
+
+    def attr(self, name: str) -> _Ref:
+        if self.qualname:
+            return _Ref(self.module, f'{self.qualname}.{name}')
+        return _Ref(f'{self.module}.{name}', '')
+
+
+@final
+@dataclass(frozen=True)
+class _Decorator:
+    group: str | None = None
+    style: str | None = None
+
+
+@final
+class _Customize:
+    pass
+
+
+_CUSTOMIZE: Final = _Customize()
+
+_BUILTINS: Final[dict[str, object]] = {
+    'bool': bool,
+    'float': float,
+    'int': int,
+    'str': str,
+}
+
+
+def _resolve_ref(ref: _Ref) -> object:
+    if not ref.qualname:
+        module, _, qualname = ref.module.rpartition('.')
+        ref = _Ref(module, qualname)
+    match ref.module, ref.qualname:
+        case 'builtins', name if name in _BUILTINS:
+            return _BUILTINS[name]
+        case 'pathlib', 'Path':
+            from pathlib import Path
+
+            return Path
+        case ('typing' | 'typing_extensions'), ('Literal' | 'Optional'):
+            import typing
+
+            return getattr(typing, ref.qualname)
+        case 'trio', 'Path':
+            import trio
+
+            return trio.Path
+        case _:
+            raise _Unresolved(f'cannot resolve {ref!r}')
+
+
+def _literal(node: ast.expr) -> Any:
+    try:
+        return ast.literal_eval(node)
+    except ValueError as error:
+        raise _Unresolved(f'not a literal {ast.dump(node)}') from error
+
+
+@final
+class _Module:
+    def __init__(self, discovery: _Discovery, path: Path, package: str | None):
+        self._discovery: Final = discovery
+        self._path: Final = path
+        self._package: Final = package
+        self._names: Final[dict[str, object]] = {}
+        self._consumed: Final[set[int]] = set()
+        self._future_annotations = False
+
+    # Names #
+
+    def _lookup(self, node: ast.expr) -> object:
+        match node:
+            case ast.Name(id=name):
+                try:
+                    value = self._names[name]
+                except KeyError:
+                    if name in _BUILTINS:
+                        return _Ref('builtins', name)
+                    raise _Unresolved(f'unknown name {name!r}') from None
+                return value
+            case ast.Attribute(value=value, attr=attr):
+                base = self._lookup(value)
+                if base == _Ref('cleek'):
+                    match attr:
+                        case 'task':
+                            return _Decorator()
+                        case 'customize':
+                            return _CUSTOMIZE
+                if isinstance(base, _Ref):
+                    return base.attr(attr)
+                raise _Unresolved(f'cannot resolve attribute {attr!r}')
+            case _:
+                raise _Unresolved(f'cannot resolve {ast.dump(node)}')
+
+    def _consume(self, node: ast.expr) -> None:
+        self._consumed.add(id(node))
+
+    def _is_decorator_use(self, node: ast.AST) -> bool:
+        match node:
+            case ast.Name(id=name):
+                value = self._names.get(name)
+            case ast.Attribute(value=ast.Name(id=name), attr=attr):
+                value = self._names.get(name)
+                return value == _Ref('cleek') and attr in ('task', 'customize')
+            case _:
+                return False
+        return isinstance(value, (_Decorator, _Customize))
+
+    def _bind_import_from(self, node: ast.ImportFrom) -> None:
+        module = node.module or ''
+        if module == '__future__':
+            names = {alias.name for alias in node.names}
+            self._future_annotations |= 'annotations' in names
+            return
+        if node.level:
+            if self._package is None:
+                raise _Unresolved('relative import outside package')
+            parts = self._package.split('.')
+            parts = parts[: len(parts) - node.level + 1]
+            if not parts:
+                raise _Unresolved('relative import beyond top-level package')
+            module = '.'.join(filter(None, (*parts, module)))
+        for alias in node.names:
+            name = alias.asname or alias.name
+            if alias.name == '*':
+                raise _Unresolved('star import')
+            if module == 'cleek':
+                match alias.name:
+                    case 'task':
+                        self._names[name] = _Decorator()
+                    case 'customize':
+                        self._names[name] = _CUSTOMIZE
+                    case _:
+                        self._names[name] = _Ref(module, alias.name)
+                continue
+            self._names[name] = _Ref(module, alias.name)
+            if module == 'cleeks' or module.startswith('cleeks.'):
+                self._discovery.visit_submodule(f'{module}.{alias.name}')
+        if module == 'cleeks' or module.startswith('cleeks.'):
+            self._discovery.visit_submodule(module)
+
+    def _bind_import(self, node: ast.Import) -> None:
+        for alias in node.names:
+            if alias.asname is not None:
+                self._names[alias.asname] = _Ref(alias.name)
+            else:
+                top = alias.name.partition('.')[0]
+                self._names[top] = _Ref(top)
+            if alias.name.startswith('cleeks.'):
+                self._discovery.visit_submodule(alias.name)
+
+    # Decorators #
+
+    def _decorator(self, node: ast.expr) -> _Decorator | None:
+        func = node.func if isinstance(node, ast.Call) else node
+        try:
+            value = self._lookup(func)
+        except _Unresolved:
+            return None
+        if not isinstance(value, _Decorator):
+            return None
+        self._consume(func)
+        if isinstance(node, ast.Call) and len(node.args) > 1:
+            raise _Unresolved('too many arguments to task')
+        return value
+
+    def _register(self, node: ast.FunctionDef | ast.AsyncFunctionDef) -> None:
+        self._names.pop(node.name, None)
+        if len(node.decorator_list) != 1:
+            return
+        (expr,) = node.decorator_list
+        decorator = self._decorator(expr)
+        if decorator is None:
+            return
+
+        name = None
+        group = decorator.group
+        style = decorator.style
+        if isinstance(expr, ast.Call):
+            if expr.args:
+                name = _literal(expr.args[0])
+            for keyword in expr.keywords:
+                match keyword.arg:
+                    case 'group':
+                        value = _literal(keyword.value)
+                        if value is not None:
+                            group = value
+                    case 'style':
+                        value = _literal(keyword.value)
+                        if value is not None:
+                            style = value
+                    case None:
+                        raise _Unresolved('keyword unpacking')
+        if name is None:
+            name = node.name.replace('_', '-')
+        self._discovery.add_task(name, group, style, self._signature(node))
+
+    def _assign(self, node: ast.Assign) -> None:
+        if self._customize(node):
+            return
+        for target in node.targets:
+            for name in ast.walk(target):
+                if isinstance(name, ast.Name):
+                    self._names.pop(name.id, None)
+
+    def _customize(self, node: ast.Assign) -> bool:
+        match node:
+            case ast.Assign(
+                targets=[ast.Name(id=target)],
+                value=ast.Call(func=func, args=args, keywords=keywords),
+            ):
+                pass
+            case _:
+                return False
+        try:
+            value = self._lookup(func)
+        except _Unresolved:
+            return False
+        if value is not _CUSTOMIZE:
+            return False
+        self._consume(func)
+        self._consume(node.targets[0])
+        if len(args) > 1:
+            raise _Unresolved('too many arguments to customize')
+        group = _literal(args[0]) if args else None
+        style = None
+        for keyword in keywords:
+            match keyword.arg:
+                case 'group':
+                    group = _literal(keyword.value)
+                case 'style':
+                    style = _literal(keyword.value)
+                case _:
+                    raise _Unresolved('unsupported customize argument')
+        self._names[target] = _Decorator(group, style)
+        return True
+
+    # Signatures #
+
+    def _annotation(self, node: ast.expr | None) -> object:
+        from inspect import Parameter
+
+        if node is None:
+            return Parameter.empty
+        match node:
+            case ast.Constant(value=str(source)):
+                if self._future_annotations:
+                    raise _Unresolved('doubly stringified annotation')
+                return self._annotation(ast.parse(source, mode='eval').body)
+            case ast.Constant(value=None):
+                return None
+            case ast.BinOp(left=left, op=ast.BitOr(), right=right):
+                return self._annotation(left) | self._annotation(right)  # type: ignore[operator]
+            case ast.Subscript(value=value, slice=slice):
+                origin = _resolve_ref(self._ref(value))
+                from typing import Literal, Optional
+
+                if origin is Literal:
+                    elements = (
+                        slice.elts if isinstance(slice, ast.Tuple) else [slice]
+                    )
+                    values = tuple(_literal(element) for element in elements)
+                    return Literal[values]  # type: ignore[valid-type]
+                if origin is Optional:
+                    return Optional[self._annotation(slice)]  # type: ignore[index]
+                raise _Unresolved('unsupported subscript')
+            case _:
+                return _resolve_ref(self._ref(node))
+
+    def _ref(self, node: ast.expr) -> _Ref:
+        value = self._lookup(node)
+        if not isinstance(value, _Ref):
+            raise _Unresolved('not a reference')
+        return value
+
+    def _parameters(
+        self,
+        args: ast.arguments,
+    ) -> list[Parameter]:
+        from inspect import Parameter
+
+        def default(node: ast.expr | None) -> object:
+            return Parameter.empty if node is None else _literal(node)
+
+        positional = [*args.posonlyargs, *args.args]
+        defaults: list[ast.expr | None] = [None] * (
+            len(positional) - len(args.defaults)
+        )
+        defaults.extend(args.defaults)
+
+        parameters: list[Parameter] = []
+        for index, (arg, node) in enumerate(zip(positional, defaults)):
+            parameters.append(
+                Parameter(
+                    arg.arg,
+                    Parameter.POSITIONAL_ONLY
+                    if index < len(args.posonlyargs)
+                    else Parameter.POSITIONAL_OR_KEYWORD,
+                    default=default(node),
+                    annotation=self._annotation(arg.annotation),
+                )
+            )
+        if args.vararg is not None:
+            parameters.append(
+                Parameter(
+                    args.vararg.arg,
+                    Parameter.VAR_POSITIONAL,
+                    annotation=self._annotation(args.vararg.annotation),
+                )
+            )
+        if args.kwonlyargs or args.kwarg is not None:
+            raise _Unresolved('keyword parameters')
+        return parameters
+
+    def _signature(
+        self,
+        node: ast.FunctionDef | ast.AsyncFunctionDef,
+    ) -> Signature:
+        from inspect import Signature
+
+        return Signature(self._parameters(node.args))
+
+    # - #
+
+    def visit(self) -> None:
+        tree = ast.parse(self._path.read_bytes(), str(self._path))
+        for node in tree.body:
+            match node:
+                case ast.Import():
+                    self._bind_import(node)
+                case ast.ImportFrom():
+                    self._bind_import_from(node)
+                case ast.FunctionDef() | ast.AsyncFunctionDef():
+                    self._register(node)
+                case ast.ClassDef():
+                    self._names.pop(node.name, None)
+                case ast.Assign():
+                    self._assign(node)
+        for node in ast.walk(tree):
+            if id(node) not in self._consumed and self._is_decorator_use(node):
+                raise _Unresolved('task decorator used outside a decorator')
+
+
+@final
+class _Discovery:
+    def __init__(self, path: Path, *, is_package: bool) -> None:
+        self._root: Final = path.parent if is_package else None
+        self._path: Final = path
+        self._is_package: Final = is_package
+        self._visited: Final[set[Path]] = set()
+        self.tasks: Final[dict[str, ManifestTask]] = {}
+
+    @property
+    def sources(self) -> list[str]:
+        return [str(path) for path in self._visited]
+
+    def add_task(
+        self,
+        name: str,
+        group: str | None,
+        style: str | None,
+        sig: Signature,
+    ) -> None:
+        from cleek._manifest import ManifestTask
+        from cleek._parsers import UnsupportedSignature
+        from cleek._parsers import record_signature_arguments
+
+        try:
+            arguments = tuple(record_signature_arguments(sig))
+        except UnsupportedSignature as error:
+            raise _Unresolved('unsupported signature') from error
+        task = ManifestTask(name, group, style, arguments)
+        if task.full_name in self.tasks:
+            raise _Unresolved(f'duplicate task {task.full_name!r}')
+        self.tasks[task.full_name] = task
+
+    def _visit(self, path: Path, package: str | None) -> None:
+        if path in self._visited:
+            return
+        self._visited.add(path)
+        _Module(self, path, package).visit()
+
+    def visit_submodule(self, module: str) -> None:
+        if self._root is None:
+            return
+        parts = module.split('.')[1:]
+        if not parts:
+            return
+        base = self._root.joinpath(*parts)
+        if (base / '__init__.py').exists():
+            self._visit(base / '__init__.py', module)
+        elif base.with_suffix('.py').exists():
+            self._visit(base.with_suffix('.py'), module.rpartition('.')[0])
+
+    def visit(self) -> None:
+        self._visit(self._path, 'cleeks' if self._is_package else None)
+
+
+def static_enabled() -> bool:
+    import os
+
+    return bool(os.environ.get('CLEEK_STATIC'))
+
+
+def discover_static(path: Path, *, is_package: bool) -> Manifest | None:
+    from cleek._manifest import manifest_from_tasks
+
+    discovery = _Discovery(path, is_package=is_package)
+    try:
+        discovery.visit()
+    except (_Unresolved, SyntaxError, OSError, TypeError):
+        return None
+    return manifest_from_tasks(discovery.tasks, discovery.sources)
@@ -0,0 +1,158 @@
+from __future__ import annotations
+from typing import Any, Final, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from argparse import Action, ArgumentParser
+    from collections.abc import Mapping, Sequence
+    from pathlib import Path
+
+    from cleek._artifacts import ArtifactCache
+    from cleek._tasks import Task
+    from cleek._uptodate import UpToDate
+
+
+_TRUE: Final = frozenset(('1', 'true', 'yes', 'on'))
+
+_FALSE: Final = frozenset(('0', 'false', 'no', 'off'))
+
+
+def _convert(parser: ArgumentParser, action: Action, text: str) -> object:
+    if action.nargs == 0:
+        if text.lower() in _TRUE:
+            return True
+        if text.lower() in _FALSE:
+            return False
+        parser.error(f'invalid {action.dest} value: {text!r}')
+    value: object = text
+    if callable(action.type):
+        try:
+            value = action.type(text)
+        except (TypeError, ValueError):
+            parser.error(f'invalid {action.dest} value: {text!r}')
+    if action.choices is not None and value not in action.choices:
+        parser.error(f'invalid {action.dest} value: {text!r}')
+    return value
+
+
+def _texts(values: str) -> list[str]:
+    texts: list[str] = []
+    for part in values.split(','):
+        start, dots, stop = part.partition('..')
+        try:
+            texts.extend(map(str, range(int(start), int(stop) + 1)))
+        except ValueError:
+            if dots:
+                raise
+            texts.append(part)
+    return texts
+
+
+def _axes(
+    parser: ArgumentParser,
+    specs: Sequence[str],
+) -> dict[str, list[object]]:
+    actions = {action.dest: action for action in parser._actions}
+    axes: dict[str, list[object]] = {}
+    for spec in specs:
+        name, equals, values = spec.partition('=')
+        dest = name.replace('-', '_')
+        action = actions.get(dest)
+        if action is None or dest == 'help':
+            parser.error(f'cannot sweep unknown parameter {name!r}')
+        if action.nargs not in (None, 0, '?'):
+            parser.error(f'cannot sweep variadic parameter {name!r}')
+        if equals:
+            try:
+                texts = _texts(values)
+            except ValueError:
+                parser.error(f'invalid range in --sweep {spec!r}')
+            axes[dest] = [_convert(parser, action, text) for text in texts]
+        elif action.nargs == 0:
+            axes[dest] = [False, True]
+        elif action.choices is not None:
+            axes[dest] = list(action.choices)
+        else:
+            parser.error(f'--sweep {name} needs values, like {name}=1,2')
+        action.required = False
+        if not action.option_strings:
+            action.nargs = '?'
+    return axes
+
+
+def _write(rows: list[dict[str, Any]], output: Path) -> None:
+    import csv
+    import json
+
+    if output.suffix == '.csv':
+        with output.open('w', newline='') as file:
+            writer = csv.DictWriter(file, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+    else:
+        with output.open('w') as file:
+            json.dump(rows, file, indent=2, default=repr)
+            file.write('\n')
+
+
+def _print(rows: list[dict[str, Any]]) -> None:
+    from rich.console import Console
+    from rich.table import Table
+
+    table = Table()
+    for column in rows[0]:
+        table.add_column(column)
+    for row in rows:
+        cells = ['' if value is None else str(value) for value in row.values()]
+        cells[list(row).index('duration')] = f'{row["duration"]:.3f}s'
+        table.add_row(*cells)
+    Console().print(table)
+
+
+def run_sweep(
+    tasks: Mapping[str, Task],
+    task: Task,
+    specs: Sequence[str],
+    args: Sequence[str],
+    *,
+    jobs: int = 1,
+    output: Path | None = None,
+    up_to_date: UpToDate | None = None,
+    artifacts: ArtifactCache | None = None,
+) -> int:
+    from argparse import Namespace
+    from concurrent.futures import ThreadPoolExecutor
+    from itertools import product
+    from time import perf_counter
+    from cleek._graph import prepare
+    from cleek._parsers import make_single_parser
+
+    parser = make_single_parser(task)
+    axes = _axes(parser, specs)
+    base = vars(parser.parse_args(args))
+    combinations = [
+        dict(zip(axes, values)) for values in product(*axes.values())
+    ]
+    run = prepare(tasks, task, up_to_date=up_to_date, artifacts=artifacts)
+
+    def attempt(params: dict[str, object]) -> dict[str, Any]:
+        result = error = None
+        start = perf_counter()
+        try:
+            result = run(Namespace(**{**base, **params}))
+        except (Exception, SystemExit) as exception:
+            error = f'{type(exception).__name__}: {exception}'
+        return {
+            **params,
+            'duration': perf_counter() - start,
+            'result': result,
+            'error': error,
+        }
+
+    with ThreadPoolExecutor(max_workers=max(jobs, 1)) as executor:
+        rows = list(executor.map(attempt, combinations))
+
+    if output is None:
+        _print(rows)
+    else:
+        _write(rows, output)
+    return 1 if any(row['error'] is not None for row in rows) else 0
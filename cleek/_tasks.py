@@ -1,7 +1,9 @@
 from __future__ import annotations
 from dataclasses import dataclass as _dataclass
+from functools import cached_property as _cached_property
 from typing import (
     Final as _Final,
+    Literal as _Literal,
     TYPE_CHECKING,
     ParamSpec,
     Protocol as _Protocol,
@@ -11,9 +13,14 @@ from typing import (
 )
 
 if TYPE_CHECKING:
-    from collections.abc import Callable
+    from asyncio import AbstractEventLoop
+    from collections.abc import Callable, Iterable
     from inspect import _IntrospectableCallable
+    from os import PathLike
 
+    from cleek._artifacts import ArtifactBackend
+    from cleek._loops import AsyncBackend
+    from cleek._parsers import TaskSpec
 
     class SupportsDunderName(_Protocol):
         __name__: str
@@ -26,6 +33,19 @@ class Task:
     name: _Final[str]
     group: _Final[str | None] = None
     style: _Final[str | None] = None
+    depends: _Final[tuple[str, ...]] = ()
+    inputs: _Final[tuple[str, ...]] = ()
+    outputs: _Final[tuple[str, ...]] = ()
+    hash_inputs: _Final[bool] = False
+    cache: _Final[bool | _Literal['pickle', 'json']] = False
+    ttl: _Final[float | None] = None
+    max_size: _Final[int | None] = None
+    version: _Final[str | None] = None
+    artifacts: _Final[bool] = False
+    fan_out: _Final[str | None] = None
+    chunk_size: _Final[int | None] = None
+    async_backend: _Final['AsyncBackend'] = 'trio'
+    loop_factory: _Final['Callable[[], AbstractEventLoop] | None'] = None
 
     @property
     def full_name(self) -> str:
@@ -35,6 +55,23 @@ class Task:
         parts.append(self.name)
         return '.'.join(parts)
 
+    @_cached_property
+    def spec(self) -> 'TaskSpec':
+        from cleek._parsers import TaskSpec
+
+        return TaskSpec(self.impl)
+
+
+@_final
+@_dataclass(frozen=True)
+class Bench:
+    impl: _Final[Callable[[], object]]
+    name: _Final[str]
+    warmup: _Final[int] = 1
+    repeats: _Final[int] = 10
+    min_time: _Final[float] = 0.02
+    number: _Final[int | None] = None
+
 
 def task_name_from_impl(impl: 'SupportsDunderName') -> str:
     return impl.__name__.replace('_', '-')
@@ -44,6 +81,22 @@ _T = TypeVar('_T')
 _P = ParamSpec('_P')
 
 
+def _check_fan_out(
+    name: str,
+    impl: Callable[..., object],
+    fan_out: str,
+) -> None:
+    from inspect import Parameter, signature
+
+    for param in signature(impl).parameters.values():
+        if param.kind is Parameter.VAR_POSITIONAL and param.name == fan_out:
+            return
+    raise ValueError(
+        f'task {name!r} fans out {fan_out!r}, which is not its variadic'
+        ' positional parameter'
+    )
+
+
 @_final
 class _Customize:
     def __init__(
@@ -65,6 +118,18 @@ class _Customize:
         *,
         group: str | None = ...,
         style: str | None = ...,
+        depends: Iterable[str | Callable[..., object]] = ...,
+        inputs: Iterable[str] = ...,
+        outputs: Iterable[str] = ...,
+        hash_inputs: bool = ...,
+        cache: bool | _Literal['pickle', 'json'] = ...,
+        ttl: float | None = ...,
+        max_size: int | None = ...,
+        version: str | None = ...,
+        artifacts: bool = ...,
+        fan_out: str | None = ...,
+        chunk_size: int | None = ...,
+        async_backend: AsyncBackend | None = ...,
     ) -> Callable[_P, _T]: ...
 
     @_overload
@@ -75,6 +140,18 @@ class _Customize:
         *,
         group: str | None = ...,
         style: str | None = ...,
+        depends: Iterable[str | Callable[..., object]] = ...,
+        inputs: Iterable[str] = ...,
+        outputs: Iterable[str] = ...,
+        hash_inputs: bool = ...,
+        cache: bool | _Literal['pickle', 'json'] = ...,
+        ttl: float | None = ...,
+        max_size: int | None = ...,
+        version: str | None = ...,
+        artifacts: bool = ...,
+        fan_out: str | None = ...,
+        chunk_size: int | None = ...,
+        async_backend: AsyncBackend | None = ...,
     ) -> Callable[[Callable[_P, _T]], Callable[_P, _T]]: ...
 
     def __call__(
@@ -84,12 +161,40 @@ class _Customize:
         *,
         group: str | None = None,
         style: str | None = None,
+        depends: Iterable[str | Callable[..., object]] = (),
+        inputs: Iterable[str] = (),
+        outputs: Iterable[str] = (),
+        hash_inputs: bool = False,
+        cache: bool | _Literal['pickle', 'json'] = False,
+        ttl: float | None = None,
+        max_size: int | None = None,
+        version: str | None = None,
+        artifacts: bool = False,
+        fan_out: str | None = None,
+        chunk_size: int | None = None,
+        async_backend: AsyncBackend | None = None,
     ) -> Callable[_P, _T] | Callable[[Callable[_P, _T]], Callable[_P, _T]]:
         if group is None:
             group = self._group
         if style is None:
             style = self._style
-        return self._ctx.task(implOrName, group=group, style=style)
+        return self._ctx.task(
+            implOrName,
+            group=group,
+            style=style,
+            depends=depends,
+            inputs=inputs,
+            outputs=outputs,
+            hash_inputs=hash_inputs,
+            cache=cache,
+            ttl=ttl,
+            max_size=max_size,
+            version=version,
+            artifacts=artifacts,
+            fan_out=fan_out,
+            chunk_size=chunk_size,
+            async_backend=async_backend,
+        )
 
 
 
@@ -97,11 +202,37 @@ class _Customize:
 class Context:
     def __init__(self) -> None:
         self.tasks: _Final[dict[str, Task]] = {}
+        self.benches: _Final[dict[str, Bench]] = {}
         self.prepend_to_path = False
+        self.artifact_store: 'ArtifactBackend | None' = None
+        self.async_backend: 'AsyncBackend' = 'trio'
+        self.loop_factory: 'Callable[[], AbstractEventLoop] | None' = None
+        self._names: _Final[dict[object, str]] = {}
 
-    def config(self, *, prepend_to_path: bool | None = None) -> None:
+    def config(
+        self,
+        *,
+        prepend_to_path: bool | None = None,
+        artifact_store: 'str | PathLike[str] | ArtifactBackend | None' = None,
+        async_backend: 'AsyncBackend | None' = None,
+        loop_factory: 'Callable[[], AbstractEventLoop] | None' = None,
+    ) -> None:
         if prepend_to_path is not None:
             self.prepend_to_path = prepend_to_path
+        if async_backend is not None:
+            from cleek._loops import check_backend
+
+            check_backend(async_backend)
+            self.async_backend = async_backend
+        if loop_factory is not None:
+            self.loop_factory = loop_factory
+        if artifact_store is not None:
+            from os import PathLike
+            from cleek._artifacts import DirectoryBackend
+
+            if isinstance(artifact_store, (str, PathLike)):
+                artifact_store = DirectoryBackend(artifact_store)
+            self.artifact_store = artifact_store
 
     def customize(
         self,
@@ -111,6 +242,28 @@ class Context:
     ) -> _Customize:
         return _Customize(self, group=group, style=style)
 
+    def _dependency_name(self, dependency: str | Callable[..., object]) -> str:
+        if isinstance(dependency, str):
+            return dependency
+        try:
+            return self._names[dependency]
+        except KeyError:
+            raise ValueError(f'{dependency!r} is not a task') from None
+
+    def _check_cycle(self, full_name: str, depends: tuple[str, ...]) -> None:
+        stack = [(name, (full_name, name)) for name in depends]
+        seen: set[str] = set()
+        while stack:
+            name, path = stack.pop()
+            if name == full_name:
+                raise ValueError(f'dependency cycle {" -> ".join(path)}')
+            if name in seen:
+                continue
+            seen.add(name)
+            task = self.tasks.get(name)
+            if task is not None:
+                stack.extend((dep, (*path, dep)) for dep in task.depends)
+
     @_overload
     def task(
         self,
@@ -119,6 +272,18 @@ class Context:
         *,
         group: str | None = ...,
         style: str | None = ...,
+        depends: Iterable[str | Callable[..., object]] = ...,
+        inputs: Iterable[str] = ...,
+        outputs: Iterable[str] = ...,
+        hash_inputs: bool = ...,
+        cache: bool | _Literal['pickle', 'json'] = ...,
+        ttl: float | None = ...,
+        max_size: int | None = ...,
+        version: str | None = ...,
+        artifacts: bool = ...,
+        fan_out: str | None = ...,
+        chunk_size: int | None = ...,
+        async_backend: AsyncBackend | None = ...,
     ) -> Callable[_P, _T]: ...
 
     @_overload
@@ -129,6 +294,18 @@ class Context:
         *,
         group: str | None = ...,
         style: str | None = ...,
+        depends: Iterable[str | Callable[..., object]] = ...,
+        inputs: Iterable[str] = ...,
+        outputs: Iterable[str] = ...,
+        hash_inputs: bool = ...,
+        cache: bool | _Literal['pickle', 'json'] = ...,
+        ttl: float | None = ...,
+        max_size: int | None = ...,
+        version: str | None = ...,
+        artifacts: bool = ...,
+        fan_out: str | None = ...,
+        chunk_size: int | None = ...,
+        async_backend: AsyncBackend | None = ...,
     ) -> Callable[[Callable[_P, _T]], Callable[_P, _T]]: ...
 
     def task(
@@ -138,15 +315,60 @@ class Context:
         *,
         group: str | None = None,
         style: str | None = None,
+        depends: Iterable[str | Callable[..., object]] = (),
+        inputs: Iterable[str] = (),
+        outputs: Iterable[str] = (),
+        hash_inputs: bool = False,
+        cache: bool | _Literal['pickle', 'json'] = False,
+        ttl: float | None = None,
+        max_size: int | None = None,
+        version: str | None = None,
+        artifacts: bool = False,
+        fan_out: str | None = None,
+        chunk_size: int | None = None,
+        async_backend: AsyncBackend | None = None,
     ) -> Callable[_P, _T] | Callable[[Callable[_P, _T]], Callable[_P, _T]]:
+        if chunk_size is not None and chunk_size < 1:
+            raise ValueError('chunk_size must be at least 1')
+        outputs = tuple(outputs)
+        if artifacts and not outputs:
+            raise ValueError('artifacts requires outputs')
+        if async_backend is not None:
+            from cleek._loops import check_backend
+
+            check_backend(async_backend)
+        dependency_names = tuple(map(self._dependency_name, depends))
+
         def register(name: str, impl: Callable[_P, _T]) -> Callable[_P, _T]:
-            task = Task(impl=impl, name=name, group=group, style=style)
+            if fan_out is not None:
+                _check_fan_out(name, impl, fan_out)
+            task = Task(
+                impl=impl,
+                name=name,
+                group=group,
+                style=style,
+                depends=dependency_names,
+                inputs=tuple(inputs),
+                outputs=outputs,
+                hash_inputs=hash_inputs,
+                cache=cache,
+                ttl=ttl,
+                max_size=max_size,
+                version=version,
+                artifacts=artifacts,
+                fan_out=fan_out,
+                chunk_size=chunk_size,
+                async_backend=async_backend or self.async_backend,
+                loop_factory=self.loop_factory,
+            )
             full_name = task.full_name
 
             if full_name in self.tasks:
                 raise ValueError(f'task named {full_name!r} already exists')
+            self._check_cycle(full_name, task.depends)
 
             self.tasks[task.full_name] = task
+            self._names[impl] = full_name
             return impl
 
         if implOrName is None:
@@ -166,3 +388,79 @@ class Context:
 
         impl = implOrName
         return register(task_name_from_impl(impl), impl)
+
+    @_overload
+    def bench(
+        self,
+        impl: Callable[[], _T],
+        /,
+        *,
+        warmup: int = ...,
+        repeats: int = ...,
+        min_time: float = ...,
+        number: int | None = ...,
+    ) -> Callable[[], _T]: ...
+
+    @_overload
+    def bench(
+        self,
+        name: str | None = ...,
+        /,
+        *,
+        warmup: int = ...,
+        repeats: int = ...,
+        min_time: float = ...,
+        number: int | None = ...,
+    ) -> Callable[[Callable[[], _T]], Callable[[], _T]]: ...
+
+    def bench(
+        self,
+        implOrName: Callable[[], _T] | str | None = None,
+        /,
+        *,
+        warmup: int = 1,
+        repeats: int = 10,
+        min_time: float = 0.02,
+        number: int | None = None,
+    ) -> Callable[[], _T] | Callable[[Callable[[], _T]], Callable[[], _T]]:
+        if warmup < 0:
+            raise ValueError('warmup must not be negative')
+        if repeats < 1:
+            raise ValueError('repeats must be at least 1')
+        if number is not None and number < 1:
+            raise ValueError('number must be at least 1')
+
+        def register(name: str, impl: Callable[[], _T]) -> Callable[[], _T]:
+            from inspect import iscoroutinefunction
+
+            if iscoroutinefunction(impl):
+                raise ValueError(f'benchmark {name!r} must not be async')
+            if name in self.benches:
+                raise ValueError(f'benchmark named {name!r} already exists')
+            self.benches[name] = Bench(
+                impl=impl,
+                name=name,
+                warmup=warmup,
+                repeats=repeats,
+                min_time=min_time,
+                number=number,
+            )
+            return impl
+
+        if implOrName is None:
+
+            def unnamed_bench(impl: Callable[[], _T]) -> Callable[[], _T]:
+                return register(task_name_from_impl(impl), impl)
+
+            return unnamed_bench
+
+        if isinstance(implOrName, str):
+            name = implOrName
+
+            def named_bench(impl: Callable[[], _T]) -> Callable[[], _T]:
+                return register(name, impl)
+
+            return named_bench
+
+        impl = implOrName
+        return register(task_name_from_impl(impl), impl)
@@ -0,0 +1,170 @@
+from __future__ import annotations
+from threading import Lock
+from typing import Any, Final, TYPE_CHECKING, final
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+    from pathlib import Path
+
+    from cleek._tasks import Task
+
+
+_Fingerprint = list[Any]
+
+
+def _expand(root: Path, patterns: Iterable[str]) -> list[str]:
+    from glob import glob
+
+    paths: set[str] = set()
+    for pattern in patterns:
+        paths.update(glob(pattern, root_dir=root, recursive=True))
+    return sorted(paths)
+
+
+def _hash(path: Path) -> str:
+    from hashlib import sha256
+
+    digest = sha256()
+    with path.open('rb') as file:
+        while chunk := file.read(1 << 20):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _changed(
+    previous: dict[str, _Fingerprint],
+    current: dict[str, _Fingerprint],
+) -> str | None:
+    for path, fingerprint in current.items():
+        before = previous.get(path)
+        if before is None:
+            return f'input {path} was added'
+        if before != fingerprint:
+            return f'input {path} changed'
+    for path in previous:
+        if path not in current:
+            return f'input {path} was removed'
+    return None
+
+
+@final
+class UpToDate:
+    def __init__(
+        self,
+        cleeks: Path,
+        root: Path,
+        *,
+        force: bool = False,
+        explain: bool = False,
+    ) -> None:
+        self._cleeks: Final = cleeks
+        self._root: Final = root
+        self._force: Final = force
+        self._explain: Final = explain
+        self._state: dict[str, Any] | None = None
+        self._lock: Final = Lock()
+
+    def _path(self) -> Path:
+        from cleek._cache import cache_dir, cache_key
+
+        return cache_dir() / 'state' / f'{cache_key(str(self._cleeks))}.json'
+
+    def _load(self) -> dict[str, Any]:
+        import json
+        from cleek._cache import cache_enabled
+
+        if self._state is None:
+            self._state = {}
+            if cache_enabled():
+                try:
+                    with self._path().open('rb') as file:
+                        self._state = json.load(file)
+                except (OSError, ValueError):
+                    pass
+        return self._state
+
+    def _fingerprints(
+        self,
+        task: Task,
+        previous: dict[str, _Fingerprint],
+    ) -> dict[str, _Fingerprint]:
+        import os
+        from stat import S_ISDIR
+
+        fingerprints: dict[str, _Fingerprint] = {}
+        for path in _expand(self._root, task.inputs):
+            try:
+                stat = os.stat(self._root / path)
+            except OSError:
+                continue
+            if S_ISDIR(stat.st_mode):
+                continue
+            fingerprint: _Fingerprint = [stat.st_mtime_ns, stat.st_size]
+            if task.hash_inputs:
+                # Only rehash files whose stat changed since the last run.
+                before = previous.get(path)
+                if before is not None and before[:2] == fingerprint:
+                    fingerprint = before
+                else:
+                    fingerprint.append(_hash(self._root / path))
+            fingerprints[path] = fingerprint
+        return fingerprints
+
+    def _reason(
+        self,
+        task: Task,
+        key: str,
+        entry: Any,
+        fingerprints: dict[str, _Fingerprint],
+    ) -> str | None:
+        if self._force:
+            return 'forced'
+        if entry is None:
+            return 'no previous run'
+        if entry['args'] != key:
+            return 'arguments changed'
+        for pattern in task.outputs:
+            if not _expand(self._root, (pattern,)):
+                return f'output {pattern} is missing'
+        previous: dict[str, _Fingerprint] = entry['inputs']
+        if task.hash_inputs:
+            return _changed(
+                {path: before[2:] for path, before in previous.items()},
+                {path: after[2:] for path, after in fingerprints.items()},
+            )
+        return _changed(previous, fingerprints)
+
+    def check(self, task: Task, args: list[object]) -> dict[str, Any] | None:
+        import sys
+
+        name = task.full_name
+        with self._lock:
+            entry = self._load().get(name)
+        fingerprints = self._fingerprints(
+            task,
+            {} if entry is None else entry['inputs'],
+        )
+        key = repr(args)
+        reason = self._reason(task, key, entry, fingerprints)
+        if reason is None:
+            if self._explain:
+                print(f'{name}: up to date', file=sys.stderr)
+            return None
+        if self._explain:
+            print(f'{name}: running because {reason}', file=sys.stderr)
+        return {'args': key, 'inputs': fingerprints}
+
+    def record(self, task: Task, entry: dict[str, Any]) -> None:
+        import json
+        from cleek._cache import atomic_write, cache_enabled
+
+        with self._lock:
+            state = self._load()
+            state[task.full_name] = entry
+            if not cache_enabled():
+                return
+            data = json.dumps(state).encode()
+            try:
+                atomic_write(self._path(), lambda file: file.write(data))
+            except OSError:
+                pass
@@ -1,8 +1,10 @@
 from __future__ import annotations
 from collections.abc import Callable, Iterator
+import subprocess
 from inspect import signature
 import inspect
 from os import environ
+import os
 from pathlib import Path
 from typing import Literal, Protocol, TYPE_CHECKING
 
@@ -13,6 +15,7 @@ from cleek._parsers import _NO, _OptionRegistry, make_parser, run as _run
 from cleek._tasks import Context, Task, task_name_from_impl
 
 if TYPE_CHECKING:
+    from argparse import Namespace
     from inspect import _IntrospectableCallable
 
 
@@ -28,9 +31,12 @@ class Run(Protocol):
 
 
 @pytest.fixture
-def run() -> Iterator[Run]:
-    ctx = Context()
+def ctx() -> Context:
+    return Context()
+
 
+@pytest.fixture
+def run(ctx: Context) -> Iterator[Run]:
     def capture_args(*args: object):
         def capture_impl(impl: '_IntrospectableCallable'):
             ctx.task(impl)
@@ -398,29 +404,100 @@ def test_var_trio_path(run: Run) -> None:
         assert a == val
 
 
-def test_coro_func_impl(run: Run) -> None:
-    called = False
+@pytest.fixture(params=['trio', 'asyncio'])
+def async_backend(request: pytest.FixtureRequest, ctx: Context) -> str:
+    ctx.config(async_backend=request.param)
+    return request.param
+
+
+def _running_backend() -> str:
+    import sniffio
+
+    return sniffio.current_async_library()
+
+
+def test_coro_func_impl(run: Run, async_backend: str) -> None:
+    called = None
 
     @run()
     async def _() -> None:
         nonlocal called
-        called = True
+        called = _running_backend()
 
-    assert called
+    assert called == async_backend
 
 
-def test_impl_returns_coro(run: Run) -> None:
-    called = False
+def test_impl_returns_coro(run: Run, async_backend: str) -> None:
+    called = None
 
     @run()
     def _():
         async def foo():
             nonlocal called
-            called = True
+            called = _running_backend()
 
         return foo()
 
-    assert called
+    assert called == async_backend
+
+
+def test_task_async_backend() -> None:
+    from cleek._graph import run_with_prerequisites
+    from cleek._parsers import make_single_parser
+
+    ctx = Context()
+    ran: list[str] = []
+
+    @ctx.task(async_backend='asyncio')
+    async def a() -> None:
+        ran.append(_running_backend())
+
+    @ctx.task(depends=[a])
+    async def b() -> None:
+        ran.append(_running_backend())
+
+    task = ctx.tasks['b']
+    ns = make_single_parser(task).parse_args([])
+    run_with_prerequisites(ctx.tasks, task, ns)
+    assert ran == ['asyncio', 'trio']
+    ran.clear()
+    run_with_prerequisites(ctx.tasks, task, ns, jobs=2)
+    assert ran == ['asyncio', 'trio']
+
+    with pytest.raises(ValueError, match='unknown async backend'):
+        ctx.task(async_backend='curio')  # type: ignore[call-overload]
+    with pytest.raises(ValueError, match='unknown async backend'):
+        ctx.config(async_backend='curio')  # type: ignore[arg-type]
+    assert ctx.async_backend == 'trio'
+
+    ctx.config(async_backend='asyncio')
+
+    @ctx.task
+    async def c() -> None:
+        ran.append(_running_backend())
+
+    assert ctx.tasks['b'].async_backend == 'trio'
+    assert ctx.tasks['c'].async_backend == 'asyncio'
+
+
+def test_loop_factory(run: Run, ctx: Context) -> None:
+    import asyncio
+
+    loops: list[asyncio.AbstractEventLoop] = []
+
+    def loop_factory() -> asyncio.AbstractEventLoop:
+        loops.append(asyncio.new_event_loop())
+        return loops[-1]
+
+    ctx.config(async_backend='asyncio', loop_factory=loop_factory)
+    running = None
+
+    @run()
+    async def _() -> None:
+        nonlocal running
+        running = asyncio.get_running_loop()
+
+    assert loops == [running]
 
 
 def test_full_name() -> None:
@@ -574,3 +651,1632 @@ def test_multiprocesing() -> None:
     )
 
     assert proc.stdout == 'multiprocessing\n'
+
+
+def test_dispatch_splits_task_args() -> None:
+    from cleek._parsers import make_dispatch_parser, parse_dispatch_args
+
+    parser = make_dispatch_parser()
+    ns, args = parse_dispatch_args(parser, ('foo', '-a', 'b'))
+    assert ns.task == 'foo'
+    assert args == ['-a', 'b']
+
+
+def test_dispatch_keeps_double_dash() -> None:
+    from cleek._parsers import make_dispatch_parser, parse_dispatch_args
+
+    parser = make_dispatch_parser()
+    ns, args = parse_dispatch_args(parser, ('foo', '--', '-a'))
+    assert ns.task == 'foo'
+    assert args == ['--', '-a']
+
+
+def test_dispatch_no_task() -> None:
+    from cleek._parsers import make_dispatch_parser, parse_dispatch_args
+
+    ns, args = parse_dispatch_args(make_dispatch_parser(), ())
+    assert ns.task is None
+    assert args == []
+
+
+def test_dispatch_only_builds_selected_task() -> None:
+    from cleek._parsers import (
+        make_dispatch_parser,
+        make_single_parser,
+        parse_dispatch_args,
+    )
+
+    class Foo:
+        pass
+
+    ctx = Context()
+
+    @ctx.task
+    def unsupported(_: 'Foo') -> None:  # pragma: no cover
+        pass
+
+    called = False
+
+    @ctx.task
+    def supported(a: int) -> None:
+        nonlocal called
+        called = a == 1
+
+    ns, args = parse_dispatch_args(make_dispatch_parser(), ('supported', '1'))
+    task = ctx.tasks[ns.task]
+    _run(task, make_single_parser(task).parse_args(args))
+    assert called
+
+
+_evaluations = 0
+
+
+def _counted_int() -> type[int]:
+    global _evaluations
+    _evaluations += 1
+    return int
+
+
+def test_task_spec_evaluates_annotations_once() -> None:
+    from cleek._parsers import make_single_parser
+
+    ctx = Context()
+    calls: list[tuple[int, tuple[str, ...]]] = []
+
+    @ctx.task
+    def spec(a: _counted_int(), *rest: str) -> None:  # type: ignore[valid-type]
+        calls.append((a, rest))
+
+    task = ctx.tasks['spec']
+    assert task.spec is task.spec
+    for args in (('1',), ('2', 'x', 'y')):
+        _run(task, make_single_parser(task).parse_args(args))
+    assert calls == [(1, ()), (2, ('x', 'y'))]
+    assert _evaluations == 1
+
+
+class _Celsius(float):
+    pass
+
+
+def _parse_celsius(value: str) -> _Celsius:
+    return _Celsius(value.removesuffix('C'))
+
+
+def test_register_converter() -> None:
+    from cleek import register_converter
+
+    register_converter(_Celsius, _parse_celsius)
+    ctx = Context()
+    calls: list[tuple[object, ...]] = []
+
+    @ctx.task
+    def convert(
+        low: _Celsius,
+        /,
+        high: _Celsius,
+        step: _Celsius = _Celsius(1),
+        limit: _Celsius | None = None,
+        *extra: _Celsius,
+    ) -> None:
+        calls.append((low, high, step, limit, extra))
+
+    parser = make_parser(ctx)
+    for args in (
+        ('convert', '1C', '2C'),
+        ('convert', '-s', '3C', '-l', '4C', '1C', '2C', '5C', '6C'),
+    ):
+        ns = parser.parse_args(args)
+        _run(ctx.tasks['convert'], ns)
+    assert calls == [
+        (1, 2, 1, None, ()),
+        (1, 2, 3, 4, (5, 6)),
+    ]
+    assert all(isinstance(value, _Celsius) for value in calls[1][:4])
+
+
+def test_task_depends() -> None:
+    from cleek._graph import prerequisites
+
+    ctx = Context()
+
+    @ctx.task
+    def base() -> None:  # pragma: no cover
+        pass
+
+    @ctx.task(depends=[base])
+    def left() -> None:  # pragma: no cover
+        pass
+
+    @ctx.task(depends=['base'])
+    def right() -> None:  # pragma: no cover
+        pass
+
+    @ctx.task(depends=[left, 'right'])
+    def top() -> None:  # pragma: no cover
+        pass
+
+    assert ctx.tasks['top'].depends == ('left', 'right')
+    order = prerequisites(ctx.tasks, ctx.tasks['top'])
+    assert [task.name for task in order] == ['base', 'left', 'right']
+
+
+def test_task_depends_cycle_raises() -> None:
+    ctx = Context()
+
+    @ctx.task(depends=['b'])
+    def a() -> None:  # pragma: no cover
+        pass
+
+    with pytest.raises(ValueError, match='b -> a -> b'):
+
+        @ctx.task(depends=[a])
+        def b() -> None:  # pragma: no cover
+            pass
+
+    with pytest.raises(ValueError, match='c -> c'):
+
+        @ctx.task(depends=['c'])
+        def c() -> None:  # pragma: no cover
+            pass
+
+    assert list(ctx.tasks) == ['a']
+
+
+def test_task_depends_run_concurrently() -> None:
+    import threading
+    from cleek._graph import run_with_prerequisites
+    from cleek._parsers import make_single_parser
+
+    ctx = Context()
+    barrier = threading.Barrier(2, timeout=5)
+    ran: list[str] = []
+
+    @ctx.task
+    def sync_a() -> None:
+        barrier.wait()
+        ran.append('sync-a')
+
+    @ctx.task
+    def sync_b() -> None:
+        barrier.wait()
+        ran.append('sync-b')
+
+    @ctx.task
+    async def async_c() -> None:
+        await trio.sleep(0)
+        ran.append('async-c')
+
+    @ctx.task(depends=[sync_a, sync_b, async_c])
+    def build(value: int = 1) -> int:
+        ran.append('build')
+        return value
+
+    task = ctx.tasks['build']
+    ns = make_single_parser(task).parse_args(['-v', '2'])
+    assert run_with_prerequisites(ctx.tasks, task, ns, jobs=3) == 2
+    assert sorted(ran[:3]) == ['async-c', 'sync-a', 'sync-b']
+    assert ran[3] == 'build'
+
+
+class Clk(Protocol):
+    def __call__(
+        self,
+        *args: str,
+        env: dict[str, str] | None = None,
+    ) -> 'subprocess.CompletedProcess[str]': ...
+
+
+@pytest.fixture
+def clk(tmp_path: Path) -> Clk:
+    import os
+
+    def clk(
+        *args: str,
+        env: dict[str, str] | None = None,
+    ) -> 'subprocess.CompletedProcess[str]':
+        return subprocess.run(
+            ('clk', *args),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            env={
+                **os.environ,
+                'CLEEKS_PATH': str(tmp_path / 'cleeks.py'),
+                'XDG_CACHE_HOME': str(tmp_path / 'cache'),
+                **(env or {}),
+            },
+            text=True,
+        )
+
+    return clk
+
+
+_COUNTING_CLEEKS = '''\
+from pathlib import Path
+from cleek import task
+
+with (Path(__file__).parent / 'imports').open('a') as file:
+    file.write('x')
+
+
+@task
+def greet(name: str, loud: bool = False) -> None:
+    print(f'Hello, {name}!')
+'''
+
+
+def test_manifest_serves_listing_and_help(clk: Clk, tmp_path: Path) -> None:
+    (tmp_path / 'cleeks.py').write_text(_COUNTING_CLEEKS)
+    imports = tmp_path / 'imports'
+
+    assert 'greet' in clk().stdout
+    assert imports.read_text() == 'x'
+
+    assert 'greet' in clk().stdout
+    assert '--loud' in clk('greet', '-h').stdout
+    assert imports.read_text() == 'x'
+
+    assert clk('greet', 'Peter').stdout == 'Hello, Peter!\n'
+    assert imports.read_text() == 'xx'
+
+
+def test_manifest_invalidated_by_source_change(
+    clk: Clk,
+    tmp_path: Path,
+) -> None:
+    cleeks = tmp_path / 'cleeks.py'
+    cleeks.write_text(_COUNTING_CLEEKS)
+    clk()
+    cleeks.write_text(_COUNTING_CLEEKS.replace('greet', 'wave'))
+
+    proc = clk()
+    assert 'wave' in proc.stdout
+    assert 'greet' not in proc.stdout
+    assert (tmp_path / 'imports').read_text() == 'xx'
+
+
+def test_manifest_skipped_without_cache(clk: Clk, tmp_path: Path) -> None:
+    (tmp_path / 'cleeks.py').write_text(
+        _COUNTING_CLEEKS + '\n\n@task\ndef other(count: int) -> None: ...\n'
+    )
+    proc = clk('--time', 'greet', 'Peter', env={'CLEEK_NO_CACHE': '1'})
+    assert proc.stdout == 'Hello, Peter!\n'
+    assert 'build parser: greet' in proc.stderr
+    assert 'build parser: other' not in proc.stderr
+
+
+def test_manifest_keyed_by_version(
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+) -> None:
+    import cleek
+    from cleek._manifest import manifest_path
+
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path))
+    path = manifest_path(tmp_path / 'cleeks.py')
+    monkeypatch.setattr(cleek, '__version__', '0.0.0')
+    assert manifest_path(tmp_path / 'cleeks.py') != path
+
+
+def test_manifest_bad_type_rebuilt(clk: Clk, tmp_path: Path) -> None:
+    import json
+    from cleek._manifest import manifest_path
+
+    (tmp_path / 'cleeks.py').write_text(_COUNTING_CLEEKS)
+    clk()
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / 'cache'))
+        path = manifest_path(tmp_path / 'cleeks.py')
+    data = json.loads(path.read_text())
+    for task in data['tasks']:
+        task['arguments'][0][1]['type'] = 'json:missing'
+    path.write_text(json.dumps(data))
+    assert clk('greet', 'Peter').stdout == 'Hello, Peter!\n'
+
+
+def test_manifest_round_trip() -> None:
+    from cleek._manifest import _dump_manifest, _load_manifest
+    from cleek._manifest import manifest_from_context
+
+    ctx = Context()
+
+    @ctx.task(group='g', style='red')
+    def impl(
+        a: Literal[1, 2] = 1,
+        b: Path | None = None,
+        *c: trio.Path,
+    ) -> None:  # pragma: no cover
+        pass
+
+    manifest = manifest_from_context(ctx, ())
+    loaded = _load_manifest(_dump_manifest(manifest))
+    task = loaded.tasks['g.impl']
+    assert task.style == 'red'
+    assert (
+        task.make_parser().format_help()
+        == manifest.tasks['g.impl'].make_parser().format_help()
+    )
+
+
+_STATIC_CLEEKS = '''\
+from __future__ import annotations
+from pathlib import Path
+from typing import Literal
+import cleek
+from cleek import customize, task as t
+import trio
+
+red = customize('colors', style='red')
+
+
+@t
+def plain(x: int, y: float = 1.0, *rest: str) -> None: ...
+
+
+@t('named', group='g')
+async def impl(op: Literal['add', 'sub'] = 'add', out: Path | None = None): ...
+
+
+@red
+def crimson(flag: bool = False, maybe: int | None = None) -> None: ...
+
+
+@red(style='blue')
+def navy(*paths: trio.Path) -> None: ...
+
+
+@cleek.task
+def attr(which: Literal['a', 'b'], /) -> None: ...
+'''
+
+
+def _import_manifest(tmp_path: Path, source: str) -> object:
+    import importlib.util
+    import sys
+    from cleek import _ctx
+    from cleek._manifest import _dump_manifest, manifest_from_context
+
+    path = tmp_path / 'cleeks.py'
+    path.write_text(source)
+    spec = importlib.util.spec_from_file_location('_static_cleeks', path)
+    assert spec is not None and spec.loader is not None
+    module = importlib.util.module_from_spec(spec)
+    tasks = dict(_ctx.tasks)
+    _ctx.tasks.clear()
+    try:
+        sys.modules['_static_cleeks'] = module
+        spec.loader.exec_module(module)
+        return _dump_manifest(manifest_from_context(_ctx, ()))['tasks']
+    finally:
+        del sys.modules['_static_cleeks']
+        _ctx.tasks.clear()
+        _ctx.tasks.update(tasks)
+
+
+def test_static_discovery_matches_import(tmp_path: Path) -> None:
+    from cleek._manifest import _dump_manifest
+    from cleek._static import discover_static
+
+    expected = _import_manifest(tmp_path, _STATIC_CLEEKS)
+    manifest = discover_static(tmp_path / 'cleeks.py', is_package=False)
+    assert manifest is not None
+    assert _dump_manifest(manifest)['tasks'] == expected
+
+
+def test_static_discovery_follows_package_imports(tmp_path: Path) -> None:
+    from cleek._static import discover_static
+
+    package = tmp_path / 'cleeks'
+    package.mkdir()
+    (package / '__init__.py').write_text('from . import sub\n')
+    (package / 'sub.py').write_text(
+        'from cleek import task\n\n@task(group="sub")\ndef a() -> None: ...\n'
+    )
+    manifest = discover_static(package / '__init__.py', is_package=True)
+    assert manifest is not None
+    assert list(manifest.tasks) == ['sub.a']
+
+
+@pytest.mark.parametrize(
+    'source',
+    (
+        'from cleek import task\nfrom x import Foo\n\n@task\ndef a(f: Foo): ...\n',
+        'from cleek import task\n\ndef a(): ...\n\ntask(a)\n',
+        'from cleek import task\n\nfor n in "ab":\n    @task(n)\n    def a(): ...\n',
+        'from cleek import task\n\n@task(NAME)\ndef a(): ...\n',
+        'from cleek import task\n\n@task\ndef a(x: int = len("")): ...\n',
+        'from __future__ import annotations\nfrom cleek import task\n\n'
+        '@task\ndef a(x: "int"): ...\n',
+    ),
+)
+def test_static_discovery_gives_up(tmp_path: Path, source: str) -> None:
+    from cleek._static import discover_static
+
+    (tmp_path / 'cleeks.py').write_text(source)
+    assert discover_static(tmp_path / 'cleeks.py', is_package=False) is None
+
+
+def test_static_discovery_skips_import(clk: Clk, tmp_path: Path) -> None:
+    (tmp_path / 'cleeks.py').write_text(_COUNTING_CLEEKS)
+    env = {'CLEEK_STATIC': '1'}
+
+    assert 'greet' in clk(env=env).stdout
+    assert '--loud' in clk('greet', '-h', env=env).stdout
+    assert not (tmp_path / 'imports').exists()
+
+    assert clk('greet', 'Peter', env=env).stdout == 'Hello, Peter!\n'
+    assert (tmp_path / 'imports').read_text() == 'x'
+
+
+def test_completion_skips_heavy_imports(tmp_path: Path) -> None:
+    import os
+    import sys
+
+    (tmp_path / 'cleeks.py').write_text(
+        _COUNTING_CLEEKS
+        + '\n\nimport trio\n\n\n@task\ndef walk(*paths: trio.Path) -> None: ...\n'
+    )
+    env = {
+        **os.environ,
+        'CLEEKS_PATH': str(tmp_path / 'cleeks.py'),
+        'XDG_CACHE_HOME': str(tmp_path / 'cache'),
+    }
+    subprocess.run(('clk',), env=env, stdout=subprocess.DEVNULL, check=True)
+
+    output = tmp_path / 'completions'
+    line = 'clk greet -'
+    proc = subprocess.run(
+        (sys.executable, '-X', 'importtime', '-m', 'cleek'),
+        env={
+            **env,
+            '_ARGCOMPLETE': '1',
+            '_ARGCOMPLETE_STDOUT_FILENAME': str(output),
+            'COMP_LINE': line,
+            'COMP_POINT': str(len(line)),
+        },
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+
+    assert '--loud' in output.read_text().split('\013')
+    imported = {
+        line.rpartition('|')[2].strip().partition('.')[0]
+        for line in proc.stderr.splitlines()
+    }
+    assert not imported & {'rich', 'trio', 'typing_inspect', 'cleeks'}
+    assert (tmp_path / 'imports').read_text() == 'x'
+
+
+_COMPLETION_CLEEKS = '''\
+from pathlib import Path
+from typing import Literal
+from cleek import task
+
+
+@task
+def calc(
+    op: Literal['add', 'sub'],
+    x: int,
+    mode: Literal['fast', 'slow'] = 'fast',
+    verbose: bool = False,
+    *paths: Path,
+) -> None: ...
+'''
+
+
+def _bash_complete(script: str, *words: str) -> list[str]:
+    proc = subprocess.run(
+        (
+            'bash',
+            '-c',
+            f'{script}\n'
+            f'COMP_WORDS=({" ".join(repr(word) for word in words)})\n'
+            f'COMP_CWORD={len(words) - 1}\n'
+            '_clk\n'
+            'printf "%s\\n" "${COMPREPLY[@]}"',
+        ),
+        stdout=subprocess.PIPE,
+        check=True,
+        text=True,
+    )
+    return [line for line in proc.stdout.splitlines() if line]
+
+
+def test_emit_bash_completion(clk: Clk, tmp_path: Path) -> None:
+    (tmp_path / 'cleeks.py').write_text(_COMPLETION_CLEEKS)
+    (tmp_path / 'some-file').touch()
+    proc = clk('--emit-completion', 'bash')
+    assert proc.returncode == 0
+    script = proc.stdout.replace('complete -o default -F _clk clk', '')
+
+    assert _bash_complete(script, 'clk', 'ca') == ['calc']
+    assert _bash_complete(script, 'clk', 'calc', '') == ['add', 'sub']
+    assert _bash_complete(script, 'clk', 'calc', '-m', 'f') == ['fast']
+    assert '--verbose' in _bash_complete(script, 'clk', 'calc', '--')
+    assert _bash_complete(script, 'clk', 'calc', '-m', 'fast', 'a') == ['add']
+    assert _bash_complete(script, 'clk', 'calc', 'add', '') == []
+    assert _bash_complete(
+        script, 'clk', 'calc', 'add', '1', str(tmp_path / 'some')
+    ) == [str(tmp_path / 'some-file')]
+
+    assert _bash_complete(script, 'clk', '-j', '4', 'ca') == ['calc']
+    assert _bash_complete(script, 'clk', '-j', '4', 'calc', '') == [
+        'add',
+        'sub',
+    ]
+    assert _bash_complete(
+        script, 'clk', '--profile', '--mem', 'calc', '-m', 'f'
+    ) == ['fast']
+    assert _bash_complete(script, 'clk', '--emit-completion', 'f') == ['fish']
+    assert '--parallel' in _bash_complete(script, 'clk', '--p')
+    assert _bash_complete(script, 'clk', '--jobs', '') == []
+
+
+def test_emit_fish_completion(clk: Clk, tmp_path: Path) -> None:
+    (tmp_path / 'cleeks.py').write_text(_COMPLETION_CLEEKS)
+    script = clk('--emit-completion', 'fish').stdout
+    assert (
+        "complete -c clk -n '__fish_seen_subcommand_from calc' -s m -l mode"
+        " -x -a 'fast slow'"
+    ) in script
+    assert "complete -c clk -n '__fish_use_subcommand' -l parallel" in script
+
+
+def test_emitted_completion_regenerated(clk: Clk, tmp_path: Path) -> None:
+    cleeks = tmp_path / 'cleeks.py'
+    cleeks.write_text(_COMPLETION_CLEEKS)
+    output = tmp_path / 'clk.bash'
+    clk('--emit-completion', 'bash', '--completion-file', str(output))
+    assert 'calc)' in output.read_text()
+
+    cleeks.write_text(_COMPLETION_CLEEKS.replace('calc', 'compute'))
+    clk()
+    assert 'compute)' in output.read_text()
+
+
+def _find_cleeks_in(
+    monkeypatch: pytest.MonkeyPatch,
+    cwd: Path,
+    **env: str,
+) -> tuple[Path, bool]:
+    from cleek._discovery import find_cleeks
+
+    monkeypatch.delenv('CLEEKS_PATH', raising=False)
+    monkeypatch.delenv('CLEEKS_STOP', raising=False)
+    for name, value in env.items():
+        monkeypatch.setenv(name, value)
+    monkeypatch.chdir(cwd)
+    return find_cleeks()
+
+
+def test_discovery_cache_invalidated_by_new_cleeks(
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+) -> None:
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / 'cache'))
+    project = tmp_path / 'project'
+    deep = project / 'a/b'
+    deep.mkdir(parents=True)
+    (project / 'cleeks.py').touch()
+
+    expected = (project / 'cleeks.py', False)
+    assert _find_cleeks_in(monkeypatch, deep) == expected
+    assert (tmp_path / 'cache/cleek/discovery.json').exists()
+    assert _find_cleeks_in(monkeypatch, deep) == expected
+
+    (project / 'a/cleeks').mkdir()
+    (project / 'a/cleeks/__init__.py').touch()
+    assert _find_cleeks_in(monkeypatch, deep) == (
+        project / 'a/cleeks/__init__.py',
+        True,
+    )
+
+
+def test_discovery_stops_at_marker(
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+) -> None:
+    monkeypatch.setenv('CLEEK_NO_CACHE', '1')
+    project = tmp_path / 'project'
+    deep = project / 'a'
+    deep.mkdir(parents=True)
+    (tmp_path / 'cleeks.py').touch()
+    assert _find_cleeks_in(monkeypatch, deep)[0] == tmp_path / 'cleeks.py'
+
+    (project / '.git').mkdir()
+    with pytest.raises(FileNotFoundError):
+        _find_cleeks_in(monkeypatch, deep, CLEEKS_STOP='.git')
+
+
+def test_discovery_stops_at_path(
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+) -> None:
+    monkeypatch.setenv('CLEEK_NO_CACHE', '1')
+    deep = tmp_path / 'home/a'
+    deep.mkdir(parents=True)
+    (tmp_path / 'cleeks.py').touch()
+    monkeypatch.setenv('FAKE_HOME', str(tmp_path / 'home'))
+    with pytest.raises(FileNotFoundError):
+        _find_cleeks_in(
+            monkeypatch,
+            deep,
+            CLEEKS_STOP=f'.nothing{os.pathsep}$FAKE_HOME',
+        )
+
+
+def test_parse_import_time() -> None:
+    from cleek._startup import ModuleImport, parse_import_time
+
+    assert parse_import_time(
+        'import time:       151 |        373 |     encodings.aliases\n'
+    ) == ModuleImport('encodings.aliases', 151, 373, 2)
+    assert parse_import_time('import time: self [us] | cumulative | x') is None
+    assert parse_import_time('something else') is None
+
+
+def test_profile_startup_json(clk: Clk, tmp_path: Path) -> None:
+    import json
+
+    (tmp_path / 'cleeks.py').write_text('import json\n' + _COUNTING_CLEEKS)
+    output = tmp_path / 'profile.json'
+    proc = clk('--profile-startup-json', str(output), 'greet', 'Peter')
+    assert proc.stdout == 'Hello, Peter!\n'
+    assert 'import time' not in proc.stderr
+
+    profile = json.loads(output.read_text())
+    phases = [phase['name'] for phase in profile['phases']]
+    for phase in (
+        'discovery',
+        'exec cleeks',
+        'build parser: greet',
+        'parse arguments',
+        'run: greet',
+    ):
+        assert phase in phases
+    assert any(module['name'] == 'json' for module in profile['imports'])
+
+
+def test_daemon_serves_runs(clk: Clk, tmp_path: Path) -> None:
+    import os
+    import time
+
+    cleeks = tmp_path / 'cleeks.py'
+    cleeks.write_text(_COUNTING_CLEEKS)
+    imports = tmp_path / 'imports'
+    env = {
+        **os.environ,
+        'CLEEKS_PATH': str(cleeks),
+        'XDG_CACHE_HOME': str(tmp_path / 'cache'),
+    }
+    daemon = subprocess.Popen(
+        ('clk', '--daemon'),
+        stderr=subprocess.PIPE,
+        env=env,
+        text=True,
+    )
+    try:
+        assert daemon.stderr is not None
+        assert daemon.stderr.readline().startswith('Serving')
+        assert imports.read_text() == 'x'
+
+        proc = clk('greet', 'Peter')
+        assert proc.stdout == 'Hello, Peter!\n'
+        assert clk('greet').returncode == 2
+        assert imports.read_text() == 'x'
+
+        time.sleep(0.01)
+        cleeks.write_text(_COUNTING_CLEEKS.replace('Hello', 'Hi'))
+        assert clk('greet', 'Peter').stdout == 'Hi, Peter!\n'
+        assert imports.read_text() == 'xx'
+        assert clk('greet', 'Peter').stdout == 'Hi, Peter!\n'
+        assert imports.read_text() == 'xx'
+
+        second = clk('--daemon')
+        assert second.returncode == 1
+        assert 'already serving' in second.stderr
+        imported = imports.read_text()
+        assert clk('greet', 'Peter').stdout == 'Hi, Peter!\n'
+        assert imports.read_text() == imported
+
+        assert clk('--daemon-stop').returncode == 0
+        assert daemon.wait(timeout=10) == 0
+    finally:
+        daemon.kill()
+        daemon.wait()
+
+
+def test_daemon_refuses_shared_socket_dir(clk: Clk, tmp_path: Path) -> None:
+    (tmp_path / 'cleeks.py').write_text(_COUNTING_CLEEKS)
+    runtime_dir = tmp_path / 'run'
+    (runtime_dir / 'cleek').mkdir(parents=True)
+    (runtime_dir / 'cleek').chmod(0o755)
+    env = {'XDG_RUNTIME_DIR': str(runtime_dir)}
+
+    proc = clk('--daemon', env=env)
+    assert proc.returncode == 1
+    assert proc.stderr.startswith('Refusing to serve')
+    assert clk('--daemon-stop', env=env).returncode == 1
+    assert clk('greet', 'Peter', env=env).stdout == 'Hello, Peter!\n'
+
+
+def test_unknown_dependency(clk: Clk, tmp_path: Path) -> None:
+    (tmp_path / 'cleeks.py').write_text(
+        'from cleek import task\n'
+        '@task(depends=["missing"])\n'
+        'def build() -> None: ...\n'
+    )
+    proc = clk('build')
+    assert proc.returncode == 1
+    assert "depends on unknown task 'missing'" in proc.stderr
+
+
+_UP_TO_DATE_CLEEKS = '''\
+from pathlib import Path
+from cleek import task
+
+root = Path(__file__).parent
+
+
+@task(inputs=['src/**/*.txt'], outputs=['out.txt'])
+def build(suffix: str = '') -> None:
+    print('building')
+    text = ''.join(path.read_text() for path in sorted(root.glob('src/*.txt')))
+    (root / 'out.txt').write_text(text + suffix)
+'''
+
+
+def test_up_to_date(clk: Clk, tmp_path: Path) -> None:
+    (tmp_path / 'cleeks.py').write_text(_UP_TO_DATE_CLEEKS)
+    (tmp_path / 'src').mkdir()
+    source = tmp_path / 'src' / 'a.txt'
+    source.write_text('a')
+
+    assert clk('build').stdout == 'building\n'
+    proc = clk('--explain', 'build')
+    assert proc.stdout == ''
+    assert proc.stderr == 'build: up to date\n'
+
+    source.write_text('aa')
+    proc = clk('--explain', 'build')
+    assert proc.stdout == 'building\n'
+    assert proc.stderr == 'build: running because input src/a.txt changed\n'
+
+    (tmp_path / 'src' / 'b.txt').write_text('b')
+    assert 'src/b.txt was added' in clk('--explain', 'build').stderr
+    (tmp_path / 'out.txt').unlink()
+    assert 'output out.txt is missing' in clk('--explain', 'build').stderr
+    assert 'arguments changed' in clk('--explain', 'build', '-s', '!').stderr
+    assert clk('build', '-s', '!').stdout == ''
+    assert clk('--force', 'build', '-s', '!').stdout == 'building\n'
+
+
+def test_up_to_date_hash_inputs(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    from cleek._uptodate import UpToDate
+
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / 'cache'))
+    source = tmp_path / 'a.txt'
+    source.write_text('a')
+    ctx = Context()
+
+    @ctx.task(inputs=['*.txt'])
+    def stat() -> None:  # pragma: no cover
+        pass
+
+    @ctx.task(inputs=['*.txt'], hash_inputs=True)
+    def content() -> None:  # pragma: no cover
+        pass
+
+    up_to_date = UpToDate(tmp_path / 'cleeks.py', tmp_path)
+    for task in ctx.tasks.values():
+        entry = up_to_date.check(task, [])
+        assert entry is not None
+        up_to_date.record(task, entry)
+        assert up_to_date.check(task, []) is None
+
+    mtime = source.stat().st_mtime_ns + 10**9
+    os.utime(source, ns=(mtime, mtime))
+    assert up_to_date.check(ctx.tasks['stat'], []) is not None
+    assert up_to_date.check(ctx.tasks['content'], []) is None
+    source.write_text('b')
+    assert up_to_date.check(ctx.tasks['content'], []) is not None
+
+
+def test_result_cache(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    from cleek._parsers import make_single_parser
+
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / 'cache'))
+    calls: list[int] = []
+
+    def define(ctx: Context, **kwargs: object) -> Task:
+        @ctx.task(**kwargs)  # type: ignore[call-overload]
+        def square(x: int) -> int:
+            calls.append(x)
+            return x * x
+
+        return ctx.tasks['square']
+
+    def square(task: Task, x: int) -> object:
+        return _run(task, make_single_parser(task).parse_args([str(x)]))
+
+    task = define(Context(), cache=True)
+    assert [square(task, 2), square(task, 2), square(task, 3)] == [4, 4, 9]
+    assert calls == [2, 3]
+
+    task = define(Context(), cache=True, version='2')
+    assert square(task, 2) == 4
+    assert calls == [2, 3, 2]
+
+    task = define(Context(), cache='json', ttl=0)
+    assert [square(task, 2), square(task, 2)] == [4, 4]
+    assert calls == [2, 3, 2, 2, 2]
+
+    calls.clear()
+    task = define(Context(), cache=True, version='3', max_size=1)
+    assert [square(task, 2), square(task, 2)] == [4, 4]
+    assert calls == [2, 2]
+
+
+_ARTIFACT_CLEEKS = '''\
+from pathlib import Path
+from cleek import task
+
+root = Path(__file__).parent
+
+
+@task(inputs=['src/*.txt'], outputs=['out'], artifacts=True)
+def build() -> None:
+    print('building')
+    (root / 'out').mkdir(exist_ok=True)
+    (root / 'out' / 'all.txt').write_text(
+        ''.join(path.read_text() for path in sorted(root.glob('src/*.txt')))
+    )
+'''
+
+
+def test_artifact_cache(clk: Clk, tmp_path: Path) -> None:
+    store = tmp_path / 'store'
+    env = {'CLEEK_ARTIFACT_DIR': str(store)}
+    machines = []
+    for name in ('a', 'b'):
+        machine = tmp_path / name
+        (machine / 'src').mkdir(parents=True)
+        (machine / 'src' / 'x.txt').write_text('x')
+        (machine / 'cleeks.py').write_text(_ARTIFACT_CLEEKS)
+        machines.append(
+            {
+                **env,
+                'CLEEKS_PATH': str(machine / 'cleeks.py'),
+                'XDG_CACHE_HOME': str(machine / 'cache'),
+            }
+        )
+    a, b = machines
+
+    assert clk('build', env=a).stdout == 'building\n'
+    proc = clk('--explain', 'build', env=b)
+    assert proc.stdout == ''
+    assert 'restored 1 files' in proc.stderr
+    assert (tmp_path / 'b' / 'out' / 'all.txt').read_text() == 'x'
+
+    (tmp_path / 'b' / 'src' / 'x.txt').write_text('y')
+    assert clk('build', env=b).stdout == 'building\n'
+
+    proc = clk('--evict-artifacts', '0', env=b)
+    assert proc.stdout.startswith('Removed 4 files')
+    assert not any(path.is_file() for path in store.rglob('*'))
+
+
+def test_artifact_cache_rejects_bad_entries(tmp_path: Path) -> None:
+    import json
+    from cleek._artifacts import ArtifactCache, DirectoryBackend
+
+    store = DirectoryBackend(tmp_path / 'store')
+    root = tmp_path / 'project'
+    root.mkdir()
+    src = tmp_path / 'blob'
+    src.write_text('evil')
+    digest = 'a' * 64
+    store.put_blob(digest, src)
+    cache = ArtifactCache(store, root)
+    task = Task(impl=lambda: None, name='build', artifacts=True)
+
+    for path in ('../escaped', str(tmp_path / 'absolute')):
+        entry = {'task': 'build', 'files': [[path, digest, 0o644]]}
+        store.put_action('k', json.dumps(entry).encode())
+        assert not cache.restore(task, 'k')
+    assert not (tmp_path / 'escaped').exists()
+    assert not (tmp_path / 'absolute').exists()
+
+    entry = {'task': 'build', 'files': [['out', '../../blob', 0o644]]}
+    store.put_action('k', json.dumps(entry).encode())
+    assert not cache.restore(task, 'k')
+
+    entry = {'task': 'build', 'files': [['out', digest, 0o644]]}
+    store.put_action('k', json.dumps(entry).encode())
+    assert cache.restore(task, 'k')
+    assert (root / 'out').read_text() == 'evil'
+
+    class Evicted:
+        get_action = store.get_action
+
+        def has_blob(self, digest: str) -> bool:
+            return True
+
+        def get_blob(self, digest: str, dest: Path) -> None:
+            raise FileNotFoundError(digest)
+
+    evicted = ArtifactCache(Evicted(), root)  # type: ignore[arg-type]
+    assert not evicted.restore(task, 'k')
+
+    entry = {'task': 'build', 'files': []}
+    store.put_action('k', json.dumps(entry).encode())
+    assert not cache.restore(task, 'k')
+
+    missing = Task(impl=lambda: None, name='missing', outputs=('out/*',))
+    cache.store(missing, 'empty')
+    assert store.get_action('empty') is None
+
+
+def test_artifacts_require_outputs() -> None:
+    ctx = Context()
+
+    def build() -> None: ...
+
+    with pytest.raises(ValueError, match='artifacts requires outputs'):
+        ctx.task(artifacts=True)(build)
+    ctx.task(artifacts=True, outputs=['out'])(build)
+    assert ctx.tasks['build'].outputs == ('out',)
+
+
+def test_parse_size() -> None:
+    from cleek._artifacts import parse_size
+
+    assert parse_size('0') == 0
+    assert parse_size('512') == 512
+    assert parse_size('1.5K') == 1536
+    assert parse_size('2GB') == 2 << 30
+
+
+_SEGMENT_CLEEKS = '''\
+import threading
+from cleek import task
+
+barrier = threading.Barrier(2, timeout=5)
+
+
+@task
+def setup() -> None:
+    print('setup')
+
+
+@task(depends=[setup])
+def clean() -> None:
+    print('clean')
+
+
+@task(depends=[setup])
+def echo(*words: str) -> str:
+    return ' '.join(words)
+
+
+@task
+def wait(name: str) -> str:
+    barrier.wait()
+    return name
+'''
+
+
+def test_segments(clk: Clk, tmp_path: Path) -> None:
+    (tmp_path / 'cleeks.py').write_text(_SEGMENT_CLEEKS)
+
+    proc = clk('clean', '--', 'echo', 'a', '--', '-b', '--', 'echo', 'c')
+    assert proc.stdout == 'setup\nclean\na -b\nc\n'
+
+    proc = clk('--parallel', 'wait', 'x', '--', 'wait', 'y')
+    assert proc.stdout == 'x\ny\n'
+
+    proc = clk('--parallel', 'echo', 'a', '--', 'echo', 'b')
+    assert proc.stdout == 'setup\na\nb\n'
+
+
+def test_split_segments() -> None:
+    from cleek._parsers import split_segments
+
+    names = {'a', 'b'}
+    assert split_segments('a', [], names) == [('a', [])]
+    assert split_segments('a', ['1', '--', 'b', '2', '--', 'x'], names) == [
+        ('a', ['1']),
+        ('b', ['2', '--', 'x']),
+    ]
+
+
+_FAN_OUT_CLEEKS = '''\
+import multiprocessing
+from cleek import task
+
+
+@task(fan_out='items', chunk_size=2)
+def label(prefix: str, *items: str) -> list[str]:
+    worker = multiprocessing.parent_process() is not None
+    return [f'{prefix}{item}:{worker}' for item in items]
+'''
+
+
+def test_fan_out(clk: Clk, tmp_path: Path) -> None:
+    (tmp_path / 'cleeks.py').write_text(_FAN_OUT_CLEEKS)
+
+    proc = clk('-j', '2', 'label', '-', 'a', 'b', 'c')
+    assert proc.stdout == "['-a:True', '-b:True', '-c:True']\n"
+
+    proc = clk('label', '-', 'a', 'b', 'c')
+    assert proc.stdout == "['-a:False', '-b:False', '-c:False']\n"
+
+
+def test_fan_out_checked() -> None:
+    ctx = Context()
+
+    def label(prefix: str, *items: str) -> None:
+        pass
+
+    with pytest.raises(ValueError, match='variadic'):
+        ctx.task(label, fan_out='typo')
+    with pytest.raises(ValueError, match='variadic'):
+        ctx.task(label, fan_out='prefix')
+    with pytest.raises(ValueError, match='chunk_size'):
+        ctx.task(label, fan_out='items', chunk_size=0)
+    ctx.task(label, fan_out='items', chunk_size=1)
+
+
+def test_fan_out_chunks() -> None:
+    from cleek._fanout import _chunks, _combine
+
+    assert _chunks([1, 2, 3, 4, 5], 2, None) == [[1, 2, 3], [4, 5]]
+    assert _chunks([1, 2, 3], 4, None) == [[1], [2], [3]]
+    assert _chunks([1, 2, 3], 4, 2) == [[1, 2], [3]]
+    assert _combine([[1], [2, 3]]) == [1, 2, 3]
+    assert _combine([None, None]) is None
+    assert _combine([1, [2]]) == [1, [2]]
+
+
+_BATCH_CLEEKS = '''\
+from cleek import task
+
+
+@task
+def setup() -> None:
+    print('setup')
+
+
+@task(depends=[setup])
+def add(a: int, b: int, scale: int = 1) -> int:
+    if a < 0:
+        raise ValueError('negative')
+    if a == 0:
+        raise SystemExit('zero')
+    return (a + b) * scale
+'''
+
+
+def test_batch(clk: Clk, tmp_path: Path) -> None:
+    (tmp_path / 'cleeks.py').write_text(_BATCH_CLEEKS)
+    batch = tmp_path / 'args.txt'
+    batch.write_text('1 2\n\n# comment\n3 4\nx 1\n-- -1 1\n5 6\n0 1\n')
+
+    for jobs in ('1', '3'):
+        proc = clk('--batch', str(batch), '-j', jobs, 'add', '--scale', '10')
+        assert proc.stdout == 'setup\n30\n70\n110\n'
+        assert f'{batch}:5: invalid arguments' in proc.stderr
+        assert f'{batch}:6: ValueError: negative' in proc.stderr
+        assert f'{batch}:8: SystemExit: zero' in proc.stderr
+        assert proc.stderr.endswith('3 succeeded, 3 failed\n')
+        assert proc.returncode == 1
+
+
+_SWEEP_CLEEKS = '''\
+from typing import Literal
+from cleek import task
+
+
+@task
+def calc(
+    op: Literal['add', 'sub'],
+    x: int,
+    y: int = 1,
+    big: bool = False,
+) -> int:
+    if x == 3:
+        raise ValueError('three')
+    if x == 4:
+        raise SystemExit(4)
+    result = x + y if op == 'add' else x - y
+    return result * 100 if big else result
+'''
+
+
+def test_sweep(clk: Clk, tmp_path: Path) -> None:
+    import csv
+    import json
+
+    (tmp_path / 'cleeks.py').write_text(_SWEEP_CLEEKS)
+    output = tmp_path / 'out.json'
+
+    proc = clk(
+        '--sweep', 'op', '--sweep', 'x=1..3', '--sweep-output', str(output),
+        '-j', '4', 'calc', '-y', '10',
+    )
+    assert proc.returncode == 1
+    rows = json.loads(output.read_text())
+    assert [(row['op'], row['x'], row['result']) for row in rows] == [
+        ('add', 1, 11),
+        ('add', 2, 12),
+        ('add', 3, None),
+        ('sub', 1, -9),
+        ('sub', 2, -8),
+        ('sub', 3, None),
+    ]
+    assert rows[2]['error'] == 'ValueError: three'
+    assert all(row['duration'] >= 0 for row in rows)
+
+    output = tmp_path / 'out.csv'
+    proc = clk(
+        '--sweep', 'big', '--sweep-output', str(output), 'calc', 'add', '2',
+    )
+    assert proc.returncode == 0
+    with output.open() as file:
+        rows = list(csv.DictReader(file))
+    assert [(row['big'], row['result']) for row in rows] == [
+        ('False', '3'),
+        ('True', '300'),
+    ]
+
+    output = tmp_path / 'exit.json'
+    proc = clk(
+        '--sweep', 'x=3..4', '--sweep-output', str(output), 'calc', 'add',
+    )
+    assert proc.returncode == 1
+    rows = json.loads(output.read_text())
+    assert [row['error'] for row in rows] == [
+        'ValueError: three',
+        'SystemExit: 4',
+    ]
+
+    proc = clk('--sweep', 'x=a', 'calc', 'add')
+    assert proc.returncode == 2
+    assert "invalid x value: 'a'" in proc.stderr
+
+
+_ASYNCIO_CLEEKS = '''\
+import asyncio
+import sys
+from cleek import config, task
+
+config(async_backend='asyncio')
+
+
+@task
+async def wait() -> bool:
+    await asyncio.sleep(0)
+    return 'trio' in sys.modules
+'''
+
+
+def test_asyncio_skips_trio_import(clk: Clk, tmp_path: Path) -> None:
+    (tmp_path / 'cleeks.py').write_text(_ASYNCIO_CLEEKS)
+    assert clk('wait').stdout == 'False\n'
+
+
+@pytest.mark.parametrize('backend', ['trio', 'asyncio'])
+def test_run_together(backend: Literal['trio', 'asyncio']) -> None:
+    import asyncio
+    from cleek._graph import Outcome, run_together, shared_backend
+    from cleek._parsers import make_single_parser
+
+    ctx = Context()
+    ready: list[str] = []
+
+    async def sleep(seconds: float) -> None:
+        if backend == 'trio':
+            await trio.sleep(seconds)
+        else:
+            await asyncio.sleep(seconds)
+
+    @ctx.task(async_backend=backend)
+    async def first() -> str:
+        while 'second' not in ready:
+            await sleep(0.001)
+        return 'first'
+
+    @ctx.task(async_backend=backend)
+    async def second() -> str:
+        ready.append('second')
+        return 'second'
+
+    @ctx.task(async_backend=backend)
+    async def fail() -> None:
+        await sleep(0.01)
+        raise ValueError('boom')
+
+    @ctx.task(async_backend=backend)
+    async def hang() -> None:
+        await sleep(60)
+
+    def segments(*names: str) -> list[tuple[Task, Namespace]]:
+        return [
+            (ctx.tasks[name], make_single_parser(ctx.tasks[name]).parse_args([]))
+            for name in names
+        ]
+
+    together = segments('first', 'second')
+    assert shared_backend(together) == backend
+    assert run_together(ctx.tasks, together, backend) == [
+        Outcome(ctx.tasks['first'], 'first'),
+        Outcome(ctx.tasks['second'], 'second'),
+    ]
+    outcomes = run_together(ctx.tasks, segments('fail', 'hang'), backend)
+    assert [outcome.error for outcome in outcomes] == [
+        'ValueError: boom',
+        'cancelled',
+    ]
+
+
+_TRACE_CLEEKS = '''\
+from cleek import span, task
+
+
+@task
+def setup() -> None:
+    pass
+
+
+@task(depends=[setup])
+def build() -> None:
+    with span('compile'):
+        sum(range(1000))
+'''
+
+
+def test_time_and_trace(clk: Clk, tmp_path: Path) -> None:
+    import json
+
+    (tmp_path / 'cleeks.py').write_text(_TRACE_CLEEKS)
+    trace = tmp_path / 'trace.json'
+
+    proc = clk('--time', '--trace', str(trace), 'build')
+    assert proc.returncode == 0
+    for phase in ('total', 'discovery', 'exec cleeks', 'run: build'):
+        assert phase in proc.stderr
+    assert 'Peak RSS' in proc.stderr
+
+    events = {
+        event['name']: event
+        for event in json.loads(trace.read_text())['traceEvents']
+    }
+    assert {'total', 'run: setup', 'run: build', 'compile'} <= set(events)
+    run, compile = events['run: build'], events['compile']
+    assert all(event['ph'] == 'X' for event in events.values())
+    assert run['ts'] <= compile['ts']
+    assert compile['ts'] + compile['dur'] <= run['ts'] + run['dur']
+    assert compile['args']['peak_rss'] > 0
+
+
+_CONCURRENT_TRACE_CLEEKS = '''\
+import time
+import trio
+from cleek import task
+
+
+@task
+async def fetch() -> None:
+    await trio.sleep(0.05)
+
+
+@task
+async def clone() -> None:
+    await trio.sleep(0.05)
+
+
+@task
+def compile() -> None:
+    time.sleep(0.05)
+
+
+@task
+def link() -> None:
+    time.sleep(0.05)
+
+
+@task(depends=[fetch, clone, compile, link])
+def build() -> None:
+    pass
+'''
+
+
+def test_trace_concurrent_tasks(clk: Clk, tmp_path: Path) -> None:
+    from itertools import combinations
+    import json
+
+    (tmp_path / 'cleeks.py').write_text(_CONCURRENT_TRACE_CLEEKS)
+    trace = tmp_path / 'trace.json'
+
+    assert clk('--trace', str(trace), '-j', '4', 'build').returncode == 0
+    events = json.loads(trace.read_text())['traceEvents']
+    runs = {
+        event['name']: event
+        for event in events
+        if event['name'].startswith('run: ')
+    }
+    names = ('fetch', 'clone', 'compile', 'link')
+    assert len({runs[f'run: {name}']['tid'] for name in names}) == 4
+    for first, second in combinations(events, 2):
+        if first['tid'] != second['tid']:
+            continue
+        first, second = sorted((first, second), key=lambda e: e['ts'])
+        first_end = first['ts'] + first['dur']
+        # Spans on one track either nest or follow each other.
+        assert second['ts'] >= first_end or (
+            second['ts'] + second['dur'] <= first_end
+        )
+
+
+_PROFILE_CLEEKS = '''\
+import time
+from cleek import task
+
+
+def spin(seconds: float) -> None:
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+@task
+def slow(seconds: float = 0.05) -> None:
+    spin(seconds)
+'''
+
+
+def test_profile(clk: Clk, tmp_path: Path) -> None:
+    import pstats
+
+    (tmp_path / 'cleeks.py').write_text(_PROFILE_CLEEKS)
+    output = tmp_path / 'prof'
+
+    proc = clk('--profile', '--profile-output', str(output), 'slow')
+    assert proc.returncode == 0
+    stats = pstats.Stats(str(output.with_suffix('.pstats')))
+    names = {name for _, _, name in stats.stats}  # type: ignore[attr-defined]
+    assert {'slow', 'spin'} <= names
+    cleek_dir = str(Path(__file__).parent / 'cleek')
+    assert not any(
+        filename.startswith(cleek_dir)
+        for filename, _, _ in stats.stats  # type: ignore[attr-defined]
+    )
+    collapsed = output.with_suffix('.collapsed').read_text().splitlines()
+    assert all(line.startswith('slow (cleeks.py:') for line in collapsed)
+    assert any(';spin (cleeks.py:' in line for line in collapsed)
+
+    output.with_suffix('.collapsed').unlink()
+    proc = clk('--profile=sample', '--profile-output', str(output), 'slow')
+    assert proc.returncode == 0
+    assert 'spin (cleeks.py:' in proc.stderr
+    for line in output.with_suffix('.collapsed').read_text().splitlines():
+        assert line.startswith('slow (cleeks.py:')
+
+
+_CONCURRENT_PROFILE_CLEEKS = _PROFILE_CLEEKS + '''
+
+@task(depends=[slow])
+def after() -> None:
+    spin(0.05)
+
+
+@task(depends=[slow])
+async def later() -> None:
+    spin(0.05)
+'''
+
+
+def test_profile_concurrent(clk: Clk, tmp_path: Path) -> None:
+    (tmp_path / 'cleeks.py').write_text(_CONCURRENT_PROFILE_CLEEKS)
+    output = tmp_path / 'prof'
+    collapsed = output.with_suffix('.collapsed')
+
+    for args in (('-j', '2', 'after'), ('--parallel', 'after', '--', 'slow')):
+        proc = clk('--profile', *args)
+        assert proc.returncode == 2
+        assert 'use --profile=sample' in proc.stderr
+
+    for args in (
+        ('-j', '2', 'after'),
+        ('--parallel', 'after', '--', 'slow'),
+        ('--parallel', 'later', '--', 'later'),
+    ):
+        proc = clk('--profile=sample', '--profile-output', str(output), *args)
+        assert proc.returncode == 0
+        stacks = collapsed.read_text()
+        assert 'spin (cleeks.py:' in stacks
+        assert args[-1] in stacks
+        collapsed.unlink()
+
+
+def test_parse_dispatch_profile() -> None:
+    from cleek._parsers import make_dispatch_parser, parse_dispatch_args
+
+    parser = make_dispatch_parser()
+    ns, args = parse_dispatch_args(parser, ['--profile', 'slow', '-s', '1'])
+    assert (ns.profile, ns.task, args) == ('cprofile', 'slow', ['-s', '1'])
+    ns, args = parse_dispatch_args(parser, ['--profile=sample', 'slow'])
+    assert (ns.profile, ns.task, args) == ('sample', 'slow', [])
+    with pytest.raises(SystemExit):
+        parse_dispatch_args(parser, ['--profile=bogus', 'slow'])
+    ns, args = parse_dispatch_args(parser, ['build', '--profile'])
+    assert (ns.profile, ns.task, args) == (None, 'build', ['--profile'])
+    ns, args = parse_dispatch_args(parser, ['--profile', 'build', '--profile'])
+    assert (ns.profile, ns.task, args) == ('cprofile', 'build', ['--profile'])
+
+
+_MEM_CLEEKS = '''\
+from cleek import task
+
+kept = []
+
+
+@task
+def grow(count: int = 10) -> None:
+    kept.extend(bytearray(100_000) for _ in range(count))
+
+
+@task(depends=[grow])
+def more() -> None:
+    kept.append(bytearray(300_000))
+'''
+
+
+def test_mem(clk: Clk, tmp_path: Path) -> None:
+    (tmp_path / 'cleeks.py').write_text(_MEM_CLEEKS)
+    old, new = tmp_path / 'old.snap', tmp_path / 'new.snap'
+
+    proc = clk('--mem', '--mem-snapshot', str(old), 'grow')
+    assert proc.returncode == 0
+    assert proc.stderr.startswith('Peak traced memory:')
+    lines = proc.stderr.splitlines()
+    top_line = lines[lines.index('Top 10 lines:') + 1]
+    assert top_line.endswith('cleeks.py:8') and 'KiB' in top_line
+    top_file = lines[lines.index('Top 10 files:') + 1]
+    assert top_file.endswith('cleeks.py')
+
+    for args in (('-j', '2', 'more'), ('--parallel', 'more', '--', 'more')):
+        proc = clk('--mem', '--mem-interval', '0.01', *args)
+        assert proc.returncode == 0
+        assert proc.stderr.startswith('Peak traced memory:')
+        assert 'cleeks.py:8' in proc.stderr
+
+    clk('--mem', '--mem-snapshot', str(new), 'grow', '-c', '20')
+    proc = clk('--mem-compare', str(old), str(new))
+    assert proc.returncode == 0
+    lines = proc.stdout.splitlines()
+    assert lines[0].startswith('Total change:') and 'KiB' in lines[0]
+    top_line = lines[lines.index('Top 10 lines (change, size):') + 1]
+    assert top_line.endswith('cleeks.py:8')
+
+
+_ASYNC_STATS_CLEEKS = '''\
+import time
+import trio
+from cleek import task
+
+
+@task
+async def crawl() -> None:
+    async def fetch() -> None:
+        await trio.sleep(0.01)
+
+    async def hog() -> None:
+        time.sleep(0.05)
+
+    async with trio.open_nursery() as nursery:
+        nursery.start_soon(fetch)
+        nursery.start_soon(hog)
+'''
+
+
+def test_async_stats(clk: Clk, tmp_path: Path) -> None:
+    import json
+
+    (tmp_path / 'cleeks.py').write_text(_ASYNC_STATS_CLEEKS)
+    output = tmp_path / 'stats.jsonl'
+
+    proc = clk('--async-stats', 'crawl', env={'COLUMNS': '200'})
+    assert proc.returncode == 0
+    assert 'Longest step' in proc.stderr
+    assert 'in cleeks.crawl.<locals>.hog' in proc.stderr
+
+    proc = clk('--async-stats-output', str(output), 'crawl')
+    assert proc.returncode == 0
+    assert proc.stderr == ''
+    records = [json.loads(line) for line in output.read_text().splitlines()]
+    assert {record['event'] for record in records} >= {
+        'spawn',
+        'step',
+        'summary',
+    }
+    summary = records[-1]
+    assert summary['event'] == 'summary'
+    assert summary['runs'] == 1
+    assert summary['longest_step_task'] == 'cleeks.crawl.<locals>.hog'
+    assert summary['longest_step'] >= 0.05
+    assert summary['tasks']['cleeks.crawl.<locals>.fetch']['max_latency'] > 0
+
+
+_BENCH_CLEEKS = '''\
+import cleek
+
+
+@cleek.bench(repeats=3, number=100)
+def sort_small() -> None:
+    sorted(range(100, 0, -1))
+
+
+@cleek.bench(repeats=3)
+def join_strings() -> None:
+    ''.join(map(str, range(100)))
+'''
+
+
+def test_bench(clk: Clk, tmp_path: Path) -> None:
+    import json
+
+    (tmp_path / 'cleeks.py').write_text(_BENCH_CLEEKS)
+    output = tmp_path / 'bench.json'
+
+    proc = clk('--bench', '--bench-output', str(output))
+    assert proc.returncode == 0
+    assert 'sort-small' in proc.stdout and 'join-strings' in proc.stdout
+    results = json.loads(output.read_text())['benchmarks']
+    assert list(results) == ['sort-small', 'join-strings']
+    sort_small = results['sort-small']
+    assert sort_small['loops'] == 100
+    assert sort_small['repeats'] == 3
+    assert 0 < sort_small['min'] <= sort_small['median'] <= sort_small['p95']
+    assert results['join-strings']['loops'] >= 1
+
+    proc = clk('--bench', 'join-*', '--bench-output', str(output))
+    assert proc.returncode == 0
+    assert list(json.loads(output.read_text())['benchmarks']) == [
+        'join-strings'
+    ]
+
+    baseline = tmp_path / 'baseline.json'
+    for median, returncode in ((1e-12, 1), (1.0, 0)):
+        baseline.write_text(
+            json.dumps({'benchmarks': {'sort-small': {'median': median}}})
+        )
+        proc = clk('--bench', 'sort-*', '--bench-baseline', str(baseline))
+        assert proc.returncode == returncode
+        assert ('sort-small regressed' in proc.stderr) == bool(returncode)
+
+    assert clk('--bench', 'missing').returncode == 1
+
+
+def test_bench_registration() -> None:
+    ctx = Context()
+
+    @ctx.bench
+    def fast() -> None:
+        pass
+
+    assert ctx.benches['fast'].impl is fast
+    assert ctx.benches['fast'].repeats == 10
+    with pytest.raises(ValueError):
+        ctx.bench(fast)
+    with pytest.raises(ValueError):
+        ctx.bench('other', repeats=0)
+
+    async def slow() -> None:
+        pass
+
+    with pytest.raises(ValueError):
+        ctx.bench(slow)